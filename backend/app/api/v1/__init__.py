@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1 import auth, dashboard, machines, services, payments, logs, analytics, sync, alerts, config, locations, razorpay, superadmin
+from app.api.v1 import auth, dashboard, machines, services, payments, logs, analytics, export_jobs, sync, alerts, config, locations, razorpay, superadmin
 
 router = APIRouter()
 
@@ -12,6 +12,7 @@ router.include_router(services.router, tags=["Services"])
 router.include_router(payments.router, tags=["Payments"])
 router.include_router(logs.router, tags=["Logs"])
 router.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+router.include_router(export_jobs.router, prefix="/analytics/export-jobs", tags=["Analytics"])
 router.include_router(sync.router, prefix="/sync", tags=["Sync"])
 router.include_router(alerts.router, prefix="/alerts", tags=["Alerts"])
 router.include_router(config.router, prefix="/config", tags=["Config"])
@@ -9,6 +9,7 @@ from app.models.alert import SystemAlert, AlertSeverity
 from app.models.machine import Machine
 from app.models.user import User
 from app.dependencies import get_current_user
+from app.utils.pagination import paginate_keyset
 from app.schemas.common import SuccessResponse, MessageResponse
 
 router = APIRouter()
@@ -30,7 +31,7 @@ def _alert_to_dict(alert: SystemAlert) -> dict:
 
 
 @router.get("/", response_model=SuccessResponse[dict])
-async def list_alerts(
+def list_alerts(
     severity: Optional[str] = Query(None, pattern="^(critical|warning|info)$"),
     resolved: Optional[bool] = Query(None),
     machine_id: Optional[str] = Query(None),
@@ -38,6 +39,7 @@ async def list_alerts(
     end_date: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page; overrides page"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -80,8 +82,11 @@ async def list_alerts(
         except ValueError:
             pass
 
-    total = query.count()
-    alerts = query.order_by(SystemAlert.created_at.desc()).offset((page - 1) * limit).limit(limit).all()
+    # Totals only for legacy page=N requests; cursor paging skips the COUNT
+    total = query.count() if not cursor else None
+    alerts, next_cursor, prev_cursor = paginate_keyset(
+        query, SystemAlert.created_at, SystemAlert.id, limit, cursor=cursor, page=page
+    )
 
     unresolved_count = db.query(SystemAlert).filter(
         SystemAlert.machine_id.in_(admin_machine_ids),
@@ -94,9 +99,11 @@ async def list_alerts(
             "alerts": [_alert_to_dict(a) for a in alerts],
             "pagination": {
                 "current_page": page,
-                "total_pages": max(1, (total + limit - 1) // limit),
+                "total_pages": max(1, (total + limit - 1) // limit) if total is not None else None,
                 "total_items": total,
                 "items_per_page": limit,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
             },
             "unresolved_count": unresolved_count,
         },
@@ -104,7 +111,7 @@ async def list_alerts(
 
 
 @router.patch("/{alert_id}/resolve", response_model=SuccessResponse[dict])
-async def resolve_alert(
+def resolve_alert(
     alert_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -143,7 +150,7 @@ async def resolve_alert(
 
 
 @router.delete("/{alert_id}", response_model=MessageResponse)
-async def delete_alert(
+def delete_alert(
     alert_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -172,7 +179,7 @@ async def delete_alert(
 
 
 @router.get("/unresolved-count", response_model=SuccessResponse[dict])
-async def get_unresolved_count(
+def get_unresolved_count(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -2,22 +2,34 @@
 Analytics API endpoints.
 """
 from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, extract
+from sqlalchemy import func, case, extract, literal_column, select, union
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Literal
-import csv
-import io
-import pytz
+import itertools
+import json
 
+from app.core.config import settings
 from app.database import get_db
 from app.dependencies import get_current_user
 from app.models.user import User
 from app.models.machine import Machine
 from app.models.payment import Payment
+from app.models.payment_rollup import PaymentDailyRollup
 from app.models.log import Log
-
-IST = pytz.timezone('Asia/Kolkata')
+from app.utils.ist import IST, ist_date_expr, ist_day_start_utc, ist_period_expr, period_start, period_label
+from app.utils.payment_rollups import rollups_complete
+from app.utils.report_accumulator import PaymentReportAccumulator
+from app.utils.report_cache import get_cached_report, is_closed_day, report_scope, store_report
+from app.utils.exports import (
+    EXPORT_COLUMNS,
+    EXPORT_FORMATS,
+    csv_chunks,
+    export_statement,
+    require_export_format,
+    stream_export,
+)
 
 
 def _ist_day_bounds(date):
@@ -42,6 +54,21 @@ def _to_ist(dt):
     return dt.astimezone(IST)
 
 
+def _day_payment_rows(db, start_time, end_time, machine_id=None):
+    """The columns the day reports read, oldest first, fetched in batches rather than as ORM objects."""
+    stmt = select(
+        Payment.bill_number, Payment.amount, Payment.method, Payment.status, Payment.created_at
+    ).where(
+        Payment.created_at >= start_time,
+        Payment.created_at <= end_time
+    )
+    if machine_id:
+        stmt = stmt.where(Payment.machine_id == machine_id)
+    return db.execute(
+        stmt.order_by(Payment.created_at).execution_options(yield_per=settings.EXPORT_FETCH_SIZE)
+    )
+
+
 def _effective_machine_id(current_user, machine_id):
     """Machine tokens are always scoped to their own machine; admin tokens
     may pass an explicit machine_id (or None for all machines)."""
@@ -62,9 +89,108 @@ from app.schemas.analytics import (
 
 router = APIRouter()
 
+# Rolling windows served from payment_daily_rollups (whole IST days)
+ROLLUP_PERIOD_DAYS = {"month": 30, "year": 365}
+
+
+def _revenue_from_rollups(db: Session, days: int, machine_id: Optional[str], group_by: str) -> RevenueAnalyticsResponse:
+    """
+    Revenue analytics for the last `days` IST days, read from the daily
+    rollups (from `payments` until the rollup backfill has completed).
+    """
+    first_day = datetime.now(IST).date() - timedelta(days=days - 1)
+    if not rollups_complete(db):
+        return _revenue_from_payments(db, ist_day_start_utc(first_day), datetime.now(timezone.utc), machine_id, group_by)
+    base = db.query(PaymentDailyRollup).filter(
+        PaymentDailyRollup.day >= first_day,
+        PaymentDailyRollup.status == 'success'
+    )
+    if machine_id:
+        base = base.filter(PaymentDailyRollup.machine_id == machine_id)
+
+    revenue_sum = func.coalesce(func.sum(PaymentDailyRollup.amount), 0)
+    count_sum = func.coalesce(func.sum(PaymentDailyRollup.txn_count), 0)
+
+    # At most one row per day: fold days into weeks/months here
+    period_data = {}
+    for day, revenue, count in base.with_entities(PaymentDailyRollup.day, revenue_sum, count_sum) \
+            .group_by(PaymentDailyRollup.day).all():
+        key = period_label(period_start(day, group_by), group_by)
+        bucket = period_data.setdefault(key, [0.0, 0])
+        bucket[0] += float(revenue)
+        bucket[1] += int(count)
+    revenue_by_period = [
+        RevenuePeriod(period=key, revenue=revenue, transaction_count=count)
+        for key, (revenue, count) in sorted(period_data.items())
+    ]
+
+    top_rows = base.with_entities(
+        PaymentDailyRollup.machine_id, Machine.name, revenue_sum, count_sum
+    ).join(Machine, PaymentDailyRollup.machine_id == Machine.id).group_by(
+        PaymentDailyRollup.machine_id, Machine.name
+    ).order_by(revenue_sum.desc()).limit(5).all()
+
+    return _revenue_response(
+        revenue_by_period,
+        base.with_entities(PaymentDailyRollup.method, revenue_sum).group_by(PaymentDailyRollup.method).all(),
+        top_rows
+    )
+
+
+def _revenue_from_payments(db: Session, start, end, machine_id: Optional[str], group_by: str) -> RevenueAnalyticsResponse:
+    """Revenue analytics over raw payments in [start, end], grouped in SQL."""
+    base = db.query(Payment).filter(
+        Payment.created_at >= start,
+        Payment.created_at <= end,
+        Payment.status == 'success'
+    )
+    if machine_id:
+        base = base.filter(Payment.machine_id == machine_id)
+
+    revenue_sum = func.coalesce(func.sum(Payment.amount), 0)
+    count = func.count(Payment.id)
+
+    period_rows = base.with_entities(
+        ist_period_expr(db, Payment.created_at, group_by).label("period"), revenue_sum, count
+    ).group_by(literal_column("period")).order_by(literal_column("period")).all()
+    revenue_by_period = [
+        RevenuePeriod(period=period_label(period, group_by), revenue=float(revenue), transaction_count=int(txns))
+        for period, revenue, txns in period_rows
+    ]
+
+    top_rows = base.with_entities(
+        Payment.machine_id, Machine.name, revenue_sum, count
+    ).join(Machine, Payment.machine_id == Machine.id).group_by(
+        Payment.machine_id, Machine.name
+    ).order_by(revenue_sum.desc()).limit(5).all()
+
+    return _revenue_response(
+        revenue_by_period,
+        base.with_entities(Payment.method, revenue_sum).group_by(Payment.method).all(),
+        top_rows
+    )
+
+
+def _revenue_response(revenue_by_period, method_rows, top_rows) -> RevenueAnalyticsResponse:
+    # Every successful payment has a method, so the method rows also give the totals
+    revenue_by_method = {method: float(revenue) for method, revenue in method_rows}
+    total_revenue = sum(revenue_by_method.values())
+    total_transactions = sum(p.transaction_count for p in revenue_by_period)
+    return RevenueAnalyticsResponse(
+        total_revenue=total_revenue,
+        total_transactions=total_transactions,
+        average_transaction=total_revenue / total_transactions if total_transactions > 0 else 0,
+        revenue_by_period=revenue_by_period,
+        revenue_by_method=revenue_by_method,
+        top_machines=[
+            TopMachine(machine_id=str(mid), machine_name=name, revenue=float(revenue), transaction_count=int(txns))
+            for mid, name, revenue, txns in top_rows
+        ]
+    )
+
 
 @router.get("/revenue", response_model=SuccessResponse[RevenueAnalyticsResponse])
-async def get_revenue_analytics(
+def get_revenue_analytics(
     period: Optional[Literal["day", "week", "month", "year"]] = Query("month"),
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
@@ -73,7 +199,19 @@ async def get_revenue_analytics(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get detailed revenue analytics."""
+    """
+    Get detailed revenue analytics.
+
+    revenue_by_period is bucketed by IST day, week (keyed by its Monday) or
+    month (keyed YYYY-MM) according to group_by.
+    """
+
+    # Month/year windows are whole days: read the daily rollups, not payments
+    if not (start_date and end_date) and period in ROLLUP_PERIOD_DAYS:
+        return {
+            "success": True,
+            "data": _revenue_from_rollups(db, ROLLUP_PERIOD_DAYS[period], machine_id, group_by)
+        }
     
     # Calculate date range
     now = datetime.now(timezone.utc)
@@ -83,101 +221,24 @@ async def get_revenue_analytics(
     else:
         if period == "day":
             start = now - timedelta(days=1)
-        elif period == "week":
+        else:  # week
             start = now - timedelta(weeks=1)
-        elif period == "month":
-            start = now - timedelta(days=30)
-        else:  # year
-            start = now - timedelta(days=365)
         end = now
-    
-    # Base query
-    query = db.query(Payment).filter(
-        Payment.created_at >= start,
-        Payment.created_at <= end,
-        Payment.status == 'success'
-    )
-    
-    if machine_id:
-        query = query.filter(Payment.machine_id == machine_id)
-    
-    payments = query.all()
-    
-    # Calculate total metrics
-    total_revenue = sum(float(p.amount) for p in payments)
-    total_transactions = len(payments)
-    average_transaction = total_revenue / total_transactions if total_transactions > 0 else 0
-    
-    # Revenue by period
-    revenue_by_period = []
-    if group_by == "day":
-        # Group by day
-        period_data = {}
-        for payment in payments:
-            day_key = payment.created_at.date().isoformat()
-            if day_key not in period_data:
-                period_data[day_key] = {"revenue": 0, "count": 0}
-            period_data[day_key]["revenue"] += float(payment.amount)
-            period_data[day_key]["count"] += 1
-        
-        revenue_by_period = [
-            RevenuePeriod(
-                period=day,
-                revenue=data["revenue"],
-                transaction_count=data["count"]
-            )
-            for day, data in sorted(period_data.items())
-        ]
-    
-    # Revenue by method
-    revenue_by_method = {}
-    for payment in payments:
-        method = payment.method
-        if method not in revenue_by_method:
-            revenue_by_method[method] = 0
-        revenue_by_method[method] += float(payment.amount)
-    
-    # Top machines
-    machine_revenue = {}
-    for payment in payments:
-        mid = str(payment.machine_id)
-        if mid not in machine_revenue:
-            machine_revenue[mid] = {"revenue": 0, "count": 0}
-        machine_revenue[mid]["revenue"] += float(payment.amount)
-        machine_revenue[mid]["count"] += 1
-    
-    top_machines = []
-    for mid, data in sorted(machine_revenue.items(), key=lambda x: x[1]["revenue"], reverse=True)[:5]:
-        machine = db.query(Machine).filter(Machine.id == mid).first()
-        if machine:
-            top_machines.append(TopMachine(
-                machine_id=mid,
-                machine_name=machine.name,
-                revenue=data["revenue"],
-                transaction_count=data["count"]
-            ))
-    
+
     return {
         "success": True,
-        "data": RevenueAnalyticsResponse(
-            total_revenue=total_revenue,
-            total_transactions=total_transactions,
-            average_transaction=average_transaction,
-            revenue_by_period=revenue_by_period,
-            revenue_by_method=revenue_by_method,
-            top_machines=top_machines
-        )
+        "data": _revenue_from_payments(db, start, end, machine_id, group_by)
     }
 
 
 @router.get("/machines/performance", response_model=SuccessResponse[list[MachinePerformance]])
-async def get_machine_performance(
+def get_machine_performance(
     period: Optional[Literal["day", "week", "month"]] = Query("month"),
     sort_by: Optional[Literal["revenue", "transactions", "uptime"]] = Query("revenue"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get performance metrics for all machines."""
+    """Get performance metrics for the caller's machines."""
     
     # Calculate date range
     now = datetime.now(timezone.utc)
@@ -189,43 +250,53 @@ async def get_machine_performance(
         start = now - timedelta(days=30)
     
     end = now
-    
-    # Get all machines
-    machines = db.query(Machine).all()
-    
+
+    # The caller's machines only (a machine token sees itself)
+    if isinstance(current_user, Machine):
+        scope = select(Machine.id).where(Machine.id == current_user.id)
+    else:
+        scope = select(Machine.id).where(Machine.user_id == current_user.id)
+    machines = db.query(Machine).filter(Machine.id.in_(scope)).all()
+
+    # Revenue and transaction count for every machine in one grouped query
+    revenue_rows = db.query(
+        Payment.machine_id,
+        func.coalesce(func.sum(Payment.amount), 0),
+        func.count(Payment.id)
+    ).filter(
+        Payment.machine_id.in_(scope),
+        Payment.created_at >= start,
+        Payment.created_at <= end,
+        Payment.status == 'success'
+    ).group_by(Payment.machine_id).all()
+    revenue_by_machine = {mid: (float(revenue), int(count)) for mid, revenue, count in revenue_rows}
+
+    # Active (IST) days per machine from payment and log activity in one query
+    activity = union(
+        select(Payment.machine_id.label("machine_id"), ist_date_expr(db, Payment.created_at).label("day")).where(
+            Payment.machine_id.in_(scope),
+            Payment.created_at >= start,
+            Payment.created_at <= end
+        ),
+        select(Log.machine_id.label("machine_id"), ist_date_expr(db, Log.created_at).label("day")).where(
+            Log.machine_id.in_(scope),
+            Log.created_at >= start,
+            Log.created_at <= end
+        )
+    ).subquery()
+    active_days_by_machine = dict(db.execute(
+        select(activity.c.machine_id, func.count(func.distinct(activity.c.day)))
+        .group_by(activity.c.machine_id)
+    ).all())
+
+    total_days = max((end - start).days, 1)
     performance_data = []
     for machine in machines:
-        # Get payments for this machine in the period
-        payments = db.query(Payment).filter(
-            Payment.machine_id == machine.id,
-            Payment.created_at >= start,
-            Payment.created_at <= end,
-            Payment.status == 'success'
-        ).all()
-        
-        revenue = sum(float(p.amount) for p in payments)
-        transaction_count = len(payments)
+        revenue, transaction_count = revenue_by_machine.get(machine.id, (0.0, 0))
         average_transaction = revenue / transaction_count if transaction_count > 0 else 0
-        
-        # Calculate uptime from payment and log activity days in the period
-        payment_day_set = {
-            p.created_at.date()
-            for p in db.query(Payment).filter(
-                Payment.machine_id == machine.id,
-                Payment.created_at >= start,
-                Payment.created_at <= end
-            ).all()
-        }
-        log_day_set = {
-            l.created_at.date()
-            for l in db.query(Log).filter(
-                Log.machine_id == machine.id,
-                Log.created_at >= start,
-                Log.created_at <= end
-            ).all()
-        }
-        active_days = len(payment_day_set | log_day_set)
-        total_days = max((end - start).days, 1)
+
+        # Uptime from payment and log activity days in the period
+        active_days = active_days_by_machine.get(machine.id, 0)
         if active_days > 0:
             uptime_percentage = min(round((active_days / total_days) * 100, 1), 99.9)
         elif machine.status == 'online':
@@ -259,21 +330,21 @@ async def get_machine_performance(
 
 
 @router.get("/export/{export_type}")
-async def export_data(
+def export_data(
     export_type: Literal["payments", "machines", "services", "logs"],
-    format: Literal["csv", "excel", "json"] = Query("csv"),
+    format: Literal["csv", "excel", "json", "parquet", "arrow"] = Query("csv"),
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
     machine_id: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Export data in various formats."""
+    """Export data as CSV, Excel (xlsx), Parquet or Arrow IPC."""
     
-    if format != "csv":
+    if format not in EXPORT_FORMATS:
         raise HTTPException(
             status_code=status.HTTP_501_NOT_IMPLEMENTED,
-            detail=f"Export format '{format}' not yet implemented. Only CSV is supported."
+            detail=f"Export format '{format}' not yet implemented."
         )
     
     # Calculate date range if provided
@@ -284,109 +355,25 @@ async def export_data(
     if end_date:
         end = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
     
-    # Export payments
-    if export_type == "payments":
-        query = db.query(Payment)
-        if start:
-            query = query.filter(Payment.created_at >= start)
-        if end:
-            query = query.filter(Payment.created_at <= end)
-        if machine_id:
-            query = query.filter(Payment.machine_id == machine_id)
-        
-        payments = query.all()
-        
-        # Create CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ID', 'Machine ID', 'Amount', 'Method', 'Status', 'Created At'])
-        
-        for payment in payments:
-            writer.writerow([
-                str(payment.id),
-                str(payment.machine_id),
-                float(payment.amount),
-                payment.method,
-                payment.status,
-                payment.created_at.isoformat()
-            ])
-        
-        from fastapi.responses import StreamingResponse
-        output.seek(0)
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=payments_export.csv"}
-        )
-    
-    elif export_type == "machines":
-        machines = db.query(Machine).all()
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ID', 'Name', 'Location', 'Status', 'Online Collection', 'Offline Collection', 'Last Sync'])
-        
-        for machine in machines:
-            writer.writerow([
-                str(machine.id),
-                machine.name,
-                machine.location,
-                machine.status,
-                float(machine.online_collection),
-                float(machine.offline_collection),
-                machine.last_sync.isoformat() if machine.last_sync else ''
-            ])
-        
-        from fastapi.responses import StreamingResponse
-        output.seek(0)
+    # Rows are fetched in batches and encoded as the client reads them
+    if export_type in EXPORT_COLUMNS:
+        require_export_format(format)
+        extension, media_type = EXPORT_FORMATS[format]
+        stmt = export_statement(export_type, start, end, machine_id)
         return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=machines_export.csv"}
-        )
-    
-    elif export_type == "logs":
-        query = db.query(Log)
-        if start:
-            query = query.filter(Log.created_at >= start)
-        if end:
-            query = query.filter(Log.created_at <= end)
-        if machine_id:
-            query = query.filter(Log.machine_id == machine_id)
-
-        logs = query.all()
-
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ID', 'Machine ID', 'Action', 'Details', 'Type', 'Created At'])
-
-        for log in logs:
-            writer.writerow([
-                str(log.id),
-                str(log.machine_id),
-                log.action,
-                log.details or '',
-                log.type,
-                log.created_at.isoformat()
-            ])
-
-        from fastapi.responses import StreamingResponse
-        output.seek(0)
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": "attachment; filename=logs_export.csv"}
+            stream_export(stmt, export_type, format),
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename={export_type}_export.{extension}"}
         )
 
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_501_NOT_IMPLEMENTED,
-            detail=f"Export type '{export_type}' not yet implemented."
-        )
+    raise HTTPException(
+        status_code=status.HTTP_501_NOT_IMPLEMENTED,
+        detail=f"Export type '{export_type}' not yet implemented."
+    )
 
 
 @router.get("/payments-report/{date_str}")
-async def get_payments_report(
+def get_payments_report(
     date_str: str,
     machine_id: Optional[str] = Query(None),
     db: Session = Depends(get_db),
@@ -404,137 +391,111 @@ async def get_payments_report(
 
     start_time, end_time = _ist_day_bounds(date)
 
-    query = db.query(Payment).filter(
-        Payment.created_at >= start_time,
-        Payment.created_at <= end_time
-    )
     effective_machine = _effective_machine_id(current_user, machine_id)
-    if effective_machine:
-        query = query.filter(Payment.machine_id == effective_machine)
-
-    payments = query.order_by(Payment.created_at).all()
-
-    # Separate by status
-    successful = [p for p in payments if p.status == 'success']
-    failed = [p for p in payments if p.status != 'success']
-
-    # Helper function
-    def sum_by_method(payment_list, method):
-        return sum(float(p.amount) for p in payment_list if p.method.lower() == method)
-
-    def count_by_method(payment_list, method):
-        return len([p for p in payment_list if p.method.lower() == method])
-
-    # Totals
-    success_total = sum(float(p.amount) for p in successful)
-    success_cash = sum_by_method(successful, 'cash')
-    success_upi = sum_by_method(successful, 'upi')
-    success_card = sum_by_method(successful, 'card')
-
-    failed_total = sum(float(p.amount) for p in failed)
-    failed_cash = sum_by_method(failed, 'cash')
-    failed_upi = sum_by_method(failed, 'upi')
-    failed_card = sum_by_method(failed, 'card')
-
-    # Generate CSV report
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Header with report title
-    writer.writerow([f'PAYMENT REPORT - {date.strftime("%d %B %Y")}'])
-    writer.writerow(['Report Generated At', datetime.now(timezone.utc).strftime("%d-%m-%Y %H:%M:%S UTC")])
-    writer.writerow([])
-
-    # Executive Summary
-    writer.writerow(['EXECUTIVE SUMMARY'])
-    writer.writerow(['Metric', 'Value'])
-    writer.writerow(['Total Successful Transactions', len(successful)])
-    writer.writerow(['Total Failed Transactions', len(failed)])
-    writer.writerow(['Total Payments', len(payments)])
-    writer.writerow(['Success Rate', f"{(len(successful) / len(payments) * 100):.1f}%" if payments else "0%"])
-    writer.writerow(['Total Revenue (Successful)', f"₹ {success_total:.2f}"])
-    writer.writerow(['Total Failed Amount', f"₹ {failed_total:.2f}"])
-    writer.writerow([])
-
-    # Payment Method Breakdown
-    writer.writerow(['PAYMENT METHOD BREAKDOWN (SUCCESSFUL)'])
-    writer.writerow(['Method', 'Count', 'Amount', '% of Total'])
-
-    for method, label in [('cash', 'CASH'), ('upi', 'UPI'), ('card', 'CARD')]:
-        count = count_by_method(successful, method)
-        amount = sum_by_method(successful, method)
-        percentage = (amount / success_total * 100) if success_total > 0 else 0
-        if count > 0:
-            writer.writerow([label, count, f"₹ {amount:.2f}", f"{percentage:.1f}%"])
-
-    writer.writerow([])
-
-    # Failed Transactions Summary
-    writer.writerow(['FAILED TRANSACTIONS SUMMARY'])
-    writer.writerow(['Method', 'Count', 'Amount'])
-    for method, label in [('cash', 'CASH'), ('upi', 'UPI'), ('card', 'CARD')]:
-        count = count_by_method(failed, method)
-        amount = sum_by_method(failed, method)
-        if count > 0:
-            writer.writerow([label, count, f"₹ {amount:.2f}"])
-
-    writer.writerow([])
-
-    # Hourly Distribution
-    writer.writerow(['HOURLY TRANSACTION DISTRIBUTION'])
-    writer.writerow(['Hour', 'Transactions', 'Revenue', 'Avg Transaction'])
-
-    hourly = {}
-    for p in successful:
-        hour = _to_ist(p.created_at).hour
-        if hour not in hourly:
-            hourly[hour] = {'count': 0, 'amount': 0.0}
-        hourly[hour]['count'] += 1
-        hourly[hour]['amount'] += float(p.amount)
-
-    for hour in range(24):
-        if hour in hourly:
-            data = hourly[hour]
-            avg = data['amount'] / data['count'] if data['count'] > 0 else 0
-            writer.writerow([f"{hour:02d}:00-{hour:02d}:59", data['count'], f"₹ {data['amount']:.2f}", f"₹ {avg:.2f}"])
-
-    writer.writerow([])
-
-    # Top 10 Transactions
-    writer.writerow(['TOP 10 TRANSACTIONS'])
-    writer.writerow(['Bill Number', 'Amount', 'Method', 'Time'])
-
-    sorted_payments = sorted(successful, key=lambda p: float(p.amount), reverse=True)[:10]
-    for p in sorted_payments:
-        time_str = _to_ist(p.created_at).strftime("%H:%M:%S")
-        writer.writerow([p.bill_number, f"₹ {float(p.amount):.2f}", p.method.upper(), time_str])
-
-    writer.writerow([])
-
-    # Key Metrics Summary
-    writer.writerow(['KEY METRICS'])
-    writer.writerow(['Metric', 'Value'])
-    avg_transaction = success_total / len(successful) if successful else 0
-    writer.writerow(['Average Transaction Value', f"₹ {avg_transaction:.2f}"])
-    writer.writerow(['Highest Single Transaction', f"₹ {max(float(p.amount) for p in successful):.2f}" if successful else "N/A"])
-    writer.writerow(['Lowest Single Transaction', f"₹ {min(float(p.amount) for p in successful):.2f}" if successful else "N/A"])
-
-    if successful:
-        sorted_amounts = sorted([float(p.amount) for p in successful])
-        median = sorted_amounts[len(sorted_amounts)//2]
-        writer.writerow(['Median Transaction Value', f"₹ {median:.2f}"])
-
-    from fastapi.responses import StreamingResponse
-    output.seek(0)
+
+    # A closed day only changes through a late sync, so its report is cached
+    cache_key = (report_scope(effective_machine), date, "payments_report")
+    cacheable = is_closed_day(date)
+    headers = {"Content-Disposition": f"attachment; filename=payment_report_{date_str}.csv"}
+
+    # Rendered per request, in front of the (possibly cached) report body
+    def title_rows():
+        yield [f'PAYMENT REPORT - {date.strftime("%d %B %Y")}']
+        yield ['Report Generated At', datetime.now(timezone.utc).strftime("%d-%m-%Y %H:%M:%S UTC")]
+        yield []
+
+    generation = 0
+    if cacheable:
+        cached, generation = get_cached_report(db, *cache_key)
+        if cached is not None:
+            title = b"".join(csv_chunks(title_rows())).decode("utf-8")
+            return Response(content=title + cached, media_type="text/csv", headers=headers)
+
+    report = PaymentReportAccumulator(top_k=10)
+    for p in _day_payment_rows(db, start_time, end_time, effective_machine):
+        report.add(p)
+    successful, failed = report.successful, report.failed
+    total_payments = report.total_count
+
+    # Generate CSV report; rows are encoded and sent in chunks
+    def report_rows():
+        # Executive Summary
+        yield ['EXECUTIVE SUMMARY']
+        yield ['Metric', 'Value']
+        yield ['Total Successful Transactions', successful.count]
+        yield ['Total Failed Transactions', failed.count]
+        yield ['Total Payments', total_payments]
+        yield ['Success Rate', f"{(successful.count / total_payments * 100):.1f}%" if total_payments else "0%"]
+        yield ['Total Revenue (Successful)', f"₹ {successful.amount:.2f}"]
+        yield ['Total Failed Amount', f"₹ {failed.amount:.2f}"]
+        yield []
+
+        # Payment Method Breakdown
+        yield ['PAYMENT METHOD BREAKDOWN (SUCCESSFUL)']
+        yield ['Method', 'Count', 'Amount', '% of Total']
+
+        for method, label in [('cash', 'CASH'), ('upi', 'UPI'), ('card', 'CARD')]:
+            stats = report.method_stats(method)
+            percentage = (stats.amount / successful.amount * 100) if successful.amount > 0 else 0
+            if stats.count > 0:
+                yield [label, stats.count, f"₹ {stats.amount:.2f}", f"{percentage:.1f}%"]
+
+        yield []
+
+        # Failed Transactions Summary
+        yield ['FAILED TRANSACTIONS SUMMARY']
+        yield ['Method', 'Count', 'Amount']
+        for method, label in [('cash', 'CASH'), ('upi', 'UPI'), ('card', 'CARD')]:
+            stats = report.method_stats(method, success=False)
+            if stats.count > 0:
+                yield [label, stats.count, f"₹ {stats.amount:.2f}"]
+
+        yield []
+
+        # Hourly Distribution
+        yield ['HOURLY TRANSACTION DISTRIBUTION']
+        yield ['Hour', 'Transactions', 'Revenue', 'Avg Transaction']
+
+        for hour in range(24):
+            if hour in report.hourly:
+                data = report.hourly[hour]
+                yield [f"{hour:02d}:00-{hour:02d}:59", data.count, f"₹ {data.amount:.2f}", f"₹ {data.average:.2f}"]
+
+        yield []
+
+        # Top 10 Transactions
+        yield ['TOP 10 TRANSACTIONS']
+        yield ['Bill Number', 'Amount', 'Method', 'Time']
+
+        for p in report.top_payments():
+            time_str = _to_ist(p.created_at).strftime("%H:%M:%S")
+            yield [p.bill_number, f"₹ {float(p.amount):.2f}", p.method.upper(), time_str]
+
+        yield []
+
+        # Key Metrics Summary
+        yield ['KEY METRICS']
+        yield ['Metric', 'Value']
+        yield ['Average Transaction Value', f"₹ {successful.average:.2f}"]
+        yield ['Highest Single Transaction', f"₹ {successful.max:.2f}" if successful.count else "N/A"]
+        yield ['Lowest Single Transaction', f"₹ {successful.min:.2f}" if successful.count else "N/A"]
+
+        if successful.count:
+            yield ['Median Transaction Value', f"₹ {report.median():.2f}"]
+
+    if cacheable:
+        csv_text = b"".join(csv_chunks(report_rows())).decode("utf-8")
+        store_report(db, *cache_key, csv_text, generation)
+        title = b"".join(csv_chunks(title_rows())).decode("utf-8")
+        return Response(content=title + csv_text, media_type="text/csv", headers=headers)
+
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=payment_report_{date_str}.csv"}
+        csv_chunks(itertools.chain(title_rows(), report_rows())), media_type="text/csv", headers=headers
     )
 
 
 @router.get("/transaction-summary/{date_str}", response_model=SuccessResponse[TransactionSummaryResponse])
-async def get_transaction_summary(
+def get_transaction_summary(
     date_str: str,
     machine_id: Optional[str] = Query(None),
     db: Session = Depends(get_db),
@@ -553,68 +514,56 @@ async def get_transaction_summary(
     # IST day boundaries — matches the payments list and the client's calendar day
     start_time, end_time = _ist_day_bounds(date)
 
-    query = db.query(Payment).filter(
-        Payment.created_at >= start_time,
-        Payment.created_at <= end_time
-    )
     effective_machine = _effective_machine_id(current_user, machine_id)
-    if effective_machine:
-        query = query.filter(Payment.machine_id == effective_machine)
-
-    payments = query.order_by(Payment.created_at).all()
 
-    # Separate by status
-    successful = [p for p in payments if p.status == 'success']
-    failed = [p for p in payments if p.status != 'success']
-
-    # Calculate totals
-    def sum_by_method(payment_list, method):
-        return sum(float(p.amount) for p in payment_list if p.method.lower() == method)
-
-    success_total = sum(float(p.amount) for p in successful)
-    failed_total = sum(float(p.amount) for p in failed)
-
-    success_cash = sum_by_method(successful, 'cash')
-    success_upi = sum_by_method(successful, 'upi')
-    success_card = sum_by_method(successful, 'card')
-    failed_cash = sum_by_method(failed, 'cash')
-    failed_upi = sum_by_method(failed, 'upi')
-    failed_card = sum_by_method(failed, 'card')
-
-    # Build payment details
-    payment_details = [
-        PaymentDetail(
+    # A closed day only changes through a late sync, so its report is cached
+    cache_key = (report_scope(effective_machine), date, "transaction_summary")
+    cacheable = is_closed_day(date)
+    generation = 0
+    if cacheable:
+        cached, generation = get_cached_report(db, *cache_key)
+        if cached is not None:
+            return {"success": True, "data": json.loads(cached)}
+
+    # One pass: totals for the summary and the per-bill lines
+    report = PaymentReportAccumulator()
+    payment_details = []
+    for p in _day_payment_rows(db, start_time, end_time, effective_machine):
+        report.add(p)
+        payment_details.append(PaymentDetail(
             bill_number=p.bill_number,
             amount=float(p.amount),
             method=p.method.upper(),
             status=p.status.upper()
-        )
-        for p in payments
-    ]
+        ))
+
+    summary = TransactionSummaryResponse(
+        date=date.isoformat(),
+        start_time=_to_ist(start_time).strftime("%d-%m-%y %H:%M"),
+        end_time=_to_ist(end_time).strftime("%d-%m-%y %H:%M"),
+        payments=payment_details,
+        successful_count=report.successful.count,
+        successful_amount=report.successful.amount,
+        successful_cash=report.method_stats('cash').amount,
+        successful_upi=report.method_stats('upi').amount,
+        successful_card=report.method_stats('card').amount,
+        failed_count=report.failed.count,
+        failed_amount=report.failed.amount,
+        failed_cash=report.method_stats('cash', success=False).amount,
+        failed_upi=report.method_stats('upi', success=False).amount,
+        failed_card=report.method_stats('card', success=False).amount
+    )
+    if cacheable:
+        store_report(db, *cache_key, summary.model_dump_json(), generation)
 
     return {
         "success": True,
-        "data": TransactionSummaryResponse(
-            date=date.isoformat(),
-            start_time=_to_ist(start_time).strftime("%d-%m-%y %H:%M"),
-            end_time=_to_ist(end_time).strftime("%d-%m-%y %H:%M"),
-            payments=payment_details,
-            successful_count=len(successful),
-            successful_amount=success_total,
-            successful_cash=success_cash,
-            successful_upi=success_upi,
-            successful_card=success_card,
-            failed_count=len(failed),
-            failed_amount=failed_total,
-            failed_cash=failed_cash,
-            failed_upi=failed_upi,
-            failed_card=failed_card
-        )
+        "data": summary
     }
 
 
 @router.get("/sales-summary/{date_str}", response_model=SuccessResponse[SalesSummaryResponse])
-async def get_sales_summary(
+def get_sales_summary(
     date_str: str,
     machine_id: Optional[str] = Query(None),
     db: Session = Depends(get_db),
@@ -633,65 +582,61 @@ async def get_sales_summary(
     # IST day boundaries — matches the payments list and the client's calendar day
     start_time, end_time = _ist_day_bounds(date)
 
-    query = db.query(Payment).filter(
-        Payment.created_at >= start_time,
-        Payment.created_at <= end_time
-    )
     effective_machine = _effective_machine_id(current_user, machine_id)
-    if effective_machine:
-        query = query.filter(Payment.machine_id == effective_machine)
 
-    payments = query.order_by(Payment.created_at).all()
+    # A closed day only changes through a late sync, so its report is cached
+    cache_key = (report_scope(effective_machine), date, "sales_summary")
+    cacheable = is_closed_day(date)
+    generation = 0
+    if cacheable:
+        cached, generation = get_cached_report(db, *cache_key)
+        if cached is not None:
+            return {"success": True, "data": json.loads(cached)}
+
+    report = PaymentReportAccumulator(top_k=0)
+    for p in _day_payment_rows(db, start_time, end_time, effective_machine):
+        report.add(p)
 
-    if not payments:
+    if not report.total_count:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No payments found for this date"
         )
 
-    # Separate by status
-    successful = [p for p in payments if p.status == 'success']
-    failed = [p for p in payments if p.status != 'success']
-
-    # Calculate totals
-    def sum_by_method(payment_list, method):
-        return sum(float(p.amount) for p in payment_list if p.method.lower() == method)
-
-    def count_by_method(payment_list, method):
-        return len([p for p in payment_list if p.method.lower() == method])
-
-    total_amount = sum(float(p.amount) for p in successful)
-    failed_upi_total = sum_by_method(failed, 'upi')
-    failed_card_total = sum_by_method(failed, 'card')
-
     # Build method breakdown — always include all three methods so the
     # printed report shows 0.00 rows instead of dropping them.
     methods = ['cash', 'upi', 'card']
     method_breakdown = []
 
     for method in methods:
+        succeeded = report.method_stats(method)
+        failed = report.method_stats(method, success=False)
         method_breakdown.append(
             MethodBreakdown(
                 method=method.upper(),
-                count=count_by_method(successful, method),
-                amount=sum_by_method(successful, method),
-                failed_count=count_by_method(failed, method),
-                failed_amount=sum_by_method(failed, method)
+                count=succeeded.count,
+                amount=succeeded.amount,
+                failed_count=failed.count,
+                failed_amount=failed.amount
             )
         )
 
+    summary = SalesSummaryResponse(
+        date=date.isoformat(),
+        start_time=_to_ist(start_time).strftime("%d-%m-%y %H:%M"),
+        end_time=_to_ist(end_time).strftime("%d-%m-%y %H:%M"),
+        first_bill=report.first_bill,
+        last_bill=report.last_bill,
+        total_count=report.successful.count,
+        total_amount=report.successful.amount,
+        by_method=method_breakdown,
+        failed_upi_amount=report.method_stats('upi', success=False).amount,
+        failed_card_amount=report.method_stats('card', success=False).amount
+    )
+    if cacheable:
+        store_report(db, *cache_key, summary.model_dump_json(), generation)
+
     return {
         "success": True,
-        "data": SalesSummaryResponse(
-            date=date.isoformat(),
-            start_time=_to_ist(start_time).strftime("%d-%m-%y %H:%M"),
-            end_time=_to_ist(end_time).strftime("%d-%m-%y %H:%M"),
-            first_bill=payments[0].bill_number,
-            last_bill=payments[-1].bill_number,
-            total_count=len(successful),
-            total_amount=total_amount,
-            by_method=method_breakdown,
-            failed_upi_amount=failed_upi_total,
-            failed_card_amount=failed_card_total
-        )
+        "data": summary
     }
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import timedelta, datetime, timezone
 from typing import Union
@@ -6,13 +7,17 @@ import httpx
 import json
 
 from app.database import get_db
-from app.core.security import verify_password, create_access_token, create_refresh_token, decode_token, get_password_hash
+from app.core.security import (
+    verify_password_async, create_access_token, create_refresh_token, decode_token,
+    get_password_hash_async, get_password_hash_pooled
+)
 from app.core.config import settings
 from app.core.logger import log_auth_success, log_auth_failure, log_token_refresh, log_logout
 from app.models.user import User, UserRole
 from app.models.machine import Machine
 from app.schemas.auth import LoginRequest, TokenResponse, TokenRefreshRequest, TokenRefreshResponse
 from app.utils.alert_service import resolve_machine_alerts, create_alert_if_not_exists
+from app.utils.heartbeat import heartbeats
 from app.models.alert import AlertSeverity
 from app.schemas.user import UserResponse
 from app.schemas.common import SuccessResponse, ErrorResponse, ErrorDetail, MessageResponse
@@ -24,8 +29,33 @@ router = APIRouter()
 # Force reload
 
 
+def _find_account(db: Session, model, username: str):
+    """
+    Look up a user/machine by username for a login, then end the session so
+    its connection goes back to the pool. The password check that follows can
+    wait in the hashing queue during a login storm, and must not hold a
+    connection the rest of the API needs meanwhile. The returned object is
+    detached with its columns loaded.
+    """
+    account = db.query(model).filter(model.username == username).first()
+    db.close()
+    return account
+
+
+def _first_user(db: Session, *criteria):
+    """db.query(User).filter(*criteria).first(), for run_in_threadpool from async handlers."""
+    return db.query(User).filter(*criteria).first()
+
+
+def _save_user(db: Session, user: User) -> User:
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
 @router.post("/bootstrap-superadmin", response_model=SuccessResponse[dict])
-async def bootstrap_superadmin(body: dict, db: Session = Depends(get_db)):
+def bootstrap_superadmin(body: dict, db: Session = Depends(get_db)):
     """
     One-time endpoint to create the very first superadmin account.
     Returns 403 once any superadmin already exists — cannot be used again.
@@ -50,7 +80,7 @@ async def bootstrap_superadmin(body: dict, db: Session = Depends(get_db)):
     user = User(
         username=username,
         email=email,
-        hashed_password=get_password_hash(password),
+        hashed_password=get_password_hash_pooled(password),
         role=UserRole.SUPERADMIN,
         is_active="true",
     )
@@ -95,10 +125,10 @@ async def login(
     client_ip = request.client.host if request.client else None
     
     # Find user by username
-    user = db.query(User).filter(User.username == credentials.username).first()
+    user = await run_in_threadpool(_find_account, db, User, credentials.username)
     
-    # Verify user exists and password is correct
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    # Verify user exists and password is correct (bcrypt runs on the hashing pool)
+    if not user or not await verify_password_async(credentials.password, user.hashed_password):
         log_auth_failure(credentials.username, "Invalid credentials", client_ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -180,7 +210,7 @@ async def phone_login(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No phone number associated with this Supabase session")
 
     # Find our user by phone
-    user = db.query(User).filter(User.phone == phone).first()
+    user = await run_in_threadpool(_first_user, db, User.phone == phone)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No admin account found for this phone number. Contact your administrator.")
 
@@ -213,7 +243,7 @@ async def phone_login(
 
 
 @router.post("/firebase-login", response_model=SuccessResponse[dict])
-async def firebase_login(
+def firebase_login(
     request_data: dict,
     db: Session = Depends(get_db)
 ):
@@ -315,7 +345,7 @@ async def self_register(request: Request, request_data: dict, db: Session = Depe
     if len(digits) == 10:
         phone = f"+91{digits}"
 
-    if db.query(User).filter(User.email == email).first():
+    if await run_in_threadpool(_first_user, db, User.email == email):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
     # Create Clerk user via management API so no browser Clerk SDK / Turnstile is needed.
@@ -365,24 +395,24 @@ async def self_register(request: Request, request_data: dict, db: Session = Depe
             )
 
     # Auto-generate a unique username from the email local part
-    base = re.sub(r"[^a-z0-9_]", "_", email.split("@")[0].lower())[:30]
-    username = base
-    suffix = 1
-    while db.query(User).filter(User.username == username).first():
-        username = f"{base}_{suffix}"
-        suffix += 1
+    def unique_username() -> str:
+        base = re.sub(r"[^a-z0-9_]", "_", email.split("@")[0].lower())[:30]
+        username = base
+        suffix = 1
+        while db.query(User).filter(User.username == username).first():
+            username = f"{base}_{suffix}"
+            suffix += 1
+        return username
 
     user = User(
-        username=username,
+        username=await run_in_threadpool(unique_username),
         email=email,
         phone=phone,
-        hashed_password=get_password_hash(_secrets.token_hex(32)),
+        hashed_password=await get_password_hash_async(_secrets.token_hex(32)),
         role=UserRole.ADMIN,
         is_active="true",
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    await run_in_threadpool(_save_user, db, user)
 
     return {
         "success": True,
@@ -397,7 +427,7 @@ async def self_register(request: Request, request_data: dict, db: Session = Depe
 
 @router.post("/check-email", response_model=SuccessResponse[dict])
 @limiter.limit("10/minute")
-async def check_email(request: Request, request_data: dict, db: Session = Depends(get_db)):
+def check_email(request: Request, request_data: dict, db: Session = Depends(get_db)):
     """
     Pre-flight check before sending a Clerk magic link.
     Returns 200 if the email belongs to an active admin, 404 otherwise.
@@ -508,7 +538,7 @@ async def clerk_login(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Clerk user lookup failed: {e}")
 
     # Find admin by email in our DB
-    user = db.query(User).filter(User.email == email).first()
+    user = await run_in_threadpool(_first_user, db, User.email == email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -573,10 +603,10 @@ async def machine_login(
     client_ip = request.client.host if request.client else None
     
     # Find machine by username
-    machine = db.query(Machine).filter(Machine.username == credentials.username).first()
+    machine = await run_in_threadpool(_find_account, db, Machine, credentials.username)
     
-    # Verify machine exists and password is correct
-    if not machine or not verify_password(credentials.password, machine.hashed_password):
+    # Verify machine exists and password is correct (bcrypt runs on the hashing pool)
+    if not machine or not await verify_password_async(credentials.password, machine.hashed_password):
         log_auth_failure(credentials.username, "Invalid machine credentials", client_ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -606,17 +636,9 @@ async def machine_login(
         data={"sub": str(machine.id), "type": "machine"}
     )
     
-    # Update machine status to online and last_sync
-    machine.status = "online"
-    machine.last_sync = datetime.now(timezone.utc)
-
-    try:
-        db.commit()
-    except Exception:
-        db.rollback()
-
-    # Resolve any existing offline/maintenance alerts now that machine is online
-    resolve_machine_alerts(db, str(machine.id))
+    # Mark machine online; the heartbeat flush persists it and resolves any
+    # existing offline/maintenance alerts.
+    await run_in_threadpool(heartbeats.touch, machine, "online")
     
     # Log successful authentication
     log_auth_success(machine.username, client_ip)
@@ -642,7 +664,7 @@ async def machine_login(
 
 @router.post("/refresh", response_model=SuccessResponse[TokenRefreshResponse])
 
-async def refresh_token(
+def refresh_token(
     request: TokenRefreshRequest,
     db: Session = Depends(get_db)
 ):
@@ -743,7 +765,7 @@ async def refresh_token(
 
 
 @router.post("/logout", response_model=MessageResponse)
-async def logout(
+def logout(
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -769,7 +791,7 @@ async def logout(
 
 
 @router.get("/me", response_model=SuccessResponse[dict])
-async def get_current_user_info(
+def get_current_user_info(
     current_user: Union[User, Machine] = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -778,16 +800,9 @@ async def get_current_user_info(
     For machine tokens, also marks the machine as online.
     """
     if isinstance(current_user, Machine):
-        # Update machine status to online whenever the app calls /me
-        current_user.status = "online"
-        current_user.last_sync = datetime.now(timezone.utc)
-        try:
-            db.commit()
-        except Exception:
-            db.rollback()
-
-        # Resolve any existing offline/maintenance alerts
-        resolve_machine_alerts(db, str(current_user.id))
+        # Mark machine online whenever the app calls /me (coalesced; the
+        # heartbeat flush also resolves offline/maintenance alerts)
+        heartbeats.touch(current_user, "online")
 
         return {
             "success": True,
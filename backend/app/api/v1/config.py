@@ -19,7 +19,7 @@ router = APIRouter()
 
 
 @router.get("/machine/{machine_id}", tags=["Config"])
-async def get_bill_config(
+def get_bill_config(
     machine_id: str,
     db: Session = Depends(get_db),
     _current=Depends(get_current_user),
@@ -61,7 +61,7 @@ async def get_bill_config(
 
 
 @router.put("/machine/{machine_id}", tags=["Config"])
-async def upsert_bill_config(
+def upsert_bill_config(
     machine_id: str,
     payload: BillConfigUpdate,
     db: Session = Depends(get_db),
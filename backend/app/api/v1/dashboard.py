@@ -1,23 +1,98 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_, case
-from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, and_, case, literal_column, select, true
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional
 
 from app.database import get_db
 from app.models.user import User
 from app.models.machine import Machine
 from app.models.payment import Payment
-from app.models.alert import SystemAlert, AlertSeverity
+from app.models.payment_rollup import PaymentDailyRollup
+from app.models.alert import SystemAlert
 from app.dependencies import get_current_user
 from app.schemas.common import SuccessResponse
-from app.utils.alert_service import create_alert_if_not_exists, resolve_machine_alerts
+from app.utils.ist import IST, ist_date_expr, ist_day_start_utc
+from app.utils.payment_rollups import rollups_complete
 
 router = APIRouter()
 
 
+def _dashboard_stats_query(db: Session, user_id, today, month_start):
+    """
+    Machine counts by status plus today's and this month's successful totals,
+    in one statement: two single-row conditional aggregates (one over the
+    admin's machines, one over their rollups) cross-joined together. Until
+    the rollup backfill has completed the totals come from `payments`.
+    """
+    machines = db.query(
+        func.count(Machine.id).label('total_machines'),
+        func.count(Machine.id).filter(Machine.status == 'online').label('online_machines'),
+        func.count(Machine.id).filter(Machine.status == 'offline').label('offline_machines'),
+        func.count(Machine.id).filter(Machine.status == 'maintenance').label('maintenance_machines')
+    ).filter(Machine.user_id == user_id).subquery()
+
+    if not rollups_complete(db):
+        is_today = Payment.created_at >= ist_day_start_utc(today)
+        payments = db.query(
+            func.count(Payment.id).filter(is_today).label('count_today'),
+            func.coalesce(func.sum(Payment.amount).filter(is_today), 0).label('total_today'),
+            func.count(Payment.id).label('count_month'),
+            func.coalesce(func.sum(Payment.amount), 0).label('total_month')
+        ).join(Machine, Payment.machine_id == Machine.id).filter(
+            Machine.user_id == user_id,
+            Payment.created_at >= ist_day_start_utc(month_start),
+            Payment.status == 'success'
+        ).subquery()
+        return db.query(machines, payments).select_from(machines).join(payments, true()).one()
+
+    is_today = PaymentDailyRollup.day >= today
+    payments = db.query(
+        func.coalesce(func.sum(PaymentDailyRollup.txn_count).filter(is_today), 0).label('count_today'),
+        func.coalesce(func.sum(PaymentDailyRollup.amount).filter(is_today), 0).label('total_today'),
+        func.coalesce(func.sum(PaymentDailyRollup.txn_count), 0).label('count_month'),
+        func.coalesce(func.sum(PaymentDailyRollup.amount), 0).label('total_month')
+    ).join(Machine, PaymentDailyRollup.machine_id == Machine.id).filter(
+        Machine.user_id == user_id,
+        PaymentDailyRollup.day >= month_start,
+        PaymentDailyRollup.status == 'success'
+    ).subquery()
+
+    return db.query(machines, payments).select_from(machines).join(payments, true()).one()
+
+
+def _daily_success_totals(db: Session, user_id, first_day):
+    """{IST date: (revenue, count)} of successful payments on the admin's machines."""
+    if not rollups_complete(db):
+        # Rollup backfill still running: group the payments themselves
+        rows = db.query(
+            ist_date_expr(db, Payment.created_at).label('day'),
+            func.coalesce(func.sum(Payment.amount), 0),
+            func.count(Payment.id)
+        ).join(Machine, Payment.machine_id == Machine.id).filter(
+            Machine.user_id == user_id,
+            Payment.created_at >= ist_day_start_utc(first_day),
+            Payment.status == 'success'
+        ).group_by(literal_column('day')).all()
+        return {
+            day if isinstance(day, date) else date.fromisoformat(day): (float(revenue), int(count))
+            for day, revenue, count in rows
+        }
+
+    rows = db.query(
+        PaymentDailyRollup.day,
+        func.coalesce(func.sum(PaymentDailyRollup.amount), 0),
+        func.coalesce(func.sum(PaymentDailyRollup.txn_count), 0)
+    ).join(Machine, PaymentDailyRollup.machine_id == Machine.id).filter(
+        Machine.user_id == user_id,
+        PaymentDailyRollup.day >= first_day,
+        PaymentDailyRollup.status == 'success'
+    ).group_by(PaymentDailyRollup.day).all()
+    return {day: (float(revenue), int(count)) for day, revenue, count in rows}
+
+
 @router.get("/stats", response_model=SuccessResponse[dict])
-async def get_dashboard_stats(
+def get_dashboard_stats(
     period: Optional[str] = Query("today", pattern="^(today|week|month|year)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -31,46 +106,22 @@ async def get_dashboard_stats(
     Returns:
         Dashboard statistics including machine counts and payment totals
     """
-    # Get machine counts by status (filtered by current admin)
-    total_machines = db.query(func.count(Machine.id)).filter(Machine.user_id == current_user.id).scalar() or 0
-    online_machines = db.query(func.count(Machine.id)).filter(Machine.user_id == current_user.id, Machine.status == 'online').scalar() or 0
-    offline_machines = db.query(func.count(Machine.id)).filter(Machine.user_id == current_user.id, Machine.status == 'offline').scalar() or 0
-    maintenance_machines = db.query(func.count(Machine.id)).filter(Machine.user_id == current_user.id, Machine.status == 'maintenance').scalar() or 0
-    
-    # Calculate date ranges
-    now = datetime.now()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    # Calculate date ranges (IST calendar days, matching the rollups)
+    today = datetime.now(IST).date()
+    month_start = today.replace(day=1)
     
-    # Get today's payment stats (filtered by admin's machines)
-    today_stats = db.query(
-        func.count(Payment.id).label('count'),
-        func.coalesce(func.sum(Payment.amount), 0).label('total')
-    ).join(Machine, Payment.machine_id == Machine.id).filter(
-        and_(
-            Machine.user_id == current_user.id,
-            Payment.created_at >= today_start,
-            Payment.status == 'success'
-        )
-    ).first()
-    
-    today_collection = float(today_stats.total) if today_stats else 0.00
-    total_transactions_today = today_stats.count if today_stats else 0
+    # Machine counts and payment totals (filtered by current admin) in one round trip
+    stats = _dashboard_stats_query(db, current_user.id, today, month_start)
     
-    # Get monthly payment stats (filtered by admin's machines)
-    month_stats = db.query(
-        func.count(Payment.id).label('count'),
-        func.coalesce(func.sum(Payment.amount), 0).label('total')
-    ).join(Machine, Payment.machine_id == Machine.id).filter(
-        and_(
-            Machine.user_id == current_user.id,
-            Payment.created_at >= month_start,
-            Payment.status == 'success'
-        )
-    ).first()
+    total_machines = int(stats.total_machines)
+    online_machines = int(stats.online_machines)
+    offline_machines = int(stats.offline_machines)
+    maintenance_machines = int(stats.maintenance_machines)
     
-    monthly_collection = float(month_stats.total) if month_stats else 0.00
-    total_transactions_month = month_stats.count if month_stats else 0
+    today_collection = float(stats.total_today)
+    total_transactions_today = int(stats.count_today)
+    monthly_collection = float(stats.total_month)
+    total_transactions_month = int(stats.count_month)
     
     # Calculate average transaction value
     average_transaction_value = (
@@ -96,7 +147,7 @@ async def get_dashboard_stats(
 
 
 @router.get("/revenue/weekly", response_model=SuccessResponse[list])
-async def get_weekly_revenue(
+def get_weekly_revenue(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -106,32 +157,14 @@ async def get_weekly_revenue(
     Returns:
         List of daily revenue with transaction counts
     """
-    # Calculate date range (last 7 days including today)
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Calculate date range (last 7 IST days including today)
+    today = datetime.now(IST).date()
     week_ago = today - timedelta(days=6)
     
-    # Query payments grouped by date (filtered by admin's machines)
-    daily_stats = db.query(
-        func.date(Payment.created_at).label('date'),
-        func.coalesce(func.sum(Payment.amount), 0).label('revenue'),
-        func.count(Payment.id).label('transaction_count')
-    ).join(Machine, Payment.machine_id == Machine.id).filter(
-        and_(
-            Machine.user_id == current_user.id,
-            Payment.created_at >= week_ago,
-            Payment.status == 'success'
-        )
-    ).group_by(
-        func.date(Payment.created_at)
-    ).all()
-    
-    # Create a map of dates to stats
+    # Daily totals from the rollups (filtered by admin's machines)
     stats_map = {
-        stat.date: {
-            'revenue': float(stat.revenue),
-            'transaction_count': stat.transaction_count
-        }
-        for stat in daily_stats
+        day: {'revenue': revenue, 'transaction_count': count}
+        for day, (revenue, count) in _daily_success_totals(db, current_user.id, week_ago).items()
     }
     
     # Generate complete 7-day data (fill missing days with zeros)
@@ -143,7 +176,7 @@ async def get_weekly_revenue(
         date_str = date.strftime('%Y-%m-%d')
         day_name = day_names[date.weekday() + 1 if date.weekday() < 6 else 0]  # Adjust for Monday start
         
-        stats = stats_map.get(date.date(), {'revenue': 0.00, 'transaction_count': 0})
+        stats = stats_map.get(date, {'revenue': 0.00, 'transaction_count': 0})
         
         result.append({
             "date": date_str,
@@ -159,7 +192,7 @@ async def get_weekly_revenue(
 
 
 @router.get("/alerts", response_model=SuccessResponse[list])
-async def get_system_alerts(
+def get_system_alerts(
     limit: int = Query(5, ge=1, le=50),
     severity: Optional[str] = Query(None, pattern="^(critical|warning|info)$"),
     start_date: Optional[str] = Query(None),
@@ -170,44 +203,14 @@ async def get_system_alerts(
     """
     Get system alerts for the dashboard widget.
 
-    Scans machine statuses, auto-creates persistent DB alerts for any issues
-    found, and returns a filtered list of unresolved alerts.
+    Returns a filtered list of unresolved alerts for the admin's machines.
+    Alerts are generated by the background evaluator
+    (app/utils/alert_evaluator.py); this endpoint only reads them.
     """
     now = datetime.now(timezone.utc)
-    machines = db.query(Machine).filter(Machine.user_id == current_user.id).all()
-
-    # Auto-create DB alerts for machines in a bad state
-    for machine in machines:
-        last_sync = machine.last_sync
-        if last_sync and last_sync.tzinfo is None:
-            last_sync = last_sync.replace(tzinfo=timezone.utc)
-
-        hours_since_sync = (
-            (now - last_sync).total_seconds() / 3600 if last_sync else None
-        )
-
-        if machine.status == 'offline':
-            if hours_since_sync is None:
-                msg = "Machine has never synced"
-            else:
-                msg = f"Machine offline for {int(hours_since_sync)}h"
-            create_alert_if_not_exists(
-                db, str(machine.id), AlertSeverity.CRITICAL, "Machine Offline", msg
-            )
-        elif machine.status == 'maintenance':
-            create_alert_if_not_exists(
-                db, str(machine.id), AlertSeverity.WARNING, "Maintenance Mode",
-                "Machine is in maintenance mode"
-            )
-        elif machine.status == 'online' and hours_since_sync is not None and hours_since_sync > 0.5:
-            mins = int(hours_since_sync * 60)
-            create_alert_if_not_exists(
-                db, str(machine.id), AlertSeverity.WARNING, "Sync Delayed",
-                f"Last sync was {mins}m ago"
-            )
 
     # Query unresolved alerts for this admin's machines
-    admin_machine_ids = [m.id for m in machines]
+    admin_machine_ids = select(Machine.id).where(Machine.user_id == current_user.id)
     query = db.query(SystemAlert).options(
         joinedload(SystemAlert.machine)
     ).filter(
@@ -266,7 +269,7 @@ async def get_system_alerts(
 
 # Legacy endpoints for backward compatibility (will be deprecated)
 @router.get("/machines", response_model=SuccessResponse[list])
-async def get_machines_legacy(
+def get_machines_legacy(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -296,7 +299,7 @@ async def get_machines_legacy(
 
 
 @router.get("/payments/chart", response_model=SuccessResponse[list])
-async def get_payments_chart_legacy(
+def get_payments_chart_legacy(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -304,33 +307,22 @@ async def get_payments_chart_legacy(
     Get payment data for charts (legacy endpoint).
     Use GET /v1/dashboard/revenue/weekly instead.
     """
-    # Calculate date range (last 7 days)
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Calculate date range (last 7 IST days)
+    today = datetime.now(IST).date()
     week_ago = today - timedelta(days=6)
     
-    # Query payments grouped by date (filtered by admin's machines)
-    daily_stats = db.query(
-        func.date(Payment.created_at).label('date'),
-        func.coalesce(func.sum(Payment.amount), 0).label('amount')
-    ).join(Machine, Payment.machine_id == Machine.id).filter(
-        and_(
-            Machine.user_id == current_user.id,
-            Payment.created_at >= week_ago,
-            Payment.status == 'success'
-        )
-    ).group_by(
-        func.date(Payment.created_at)
-    ).all()
-    
-    # Create a map of dates to amounts
-    stats_map = {stat.date: float(stat.amount) for stat in daily_stats}
+    # Daily amounts from the rollups (filtered by admin's machines)
+    stats_map = {
+        day: revenue
+        for day, (revenue, _count) in _daily_success_totals(db, current_user.id, week_ago).items()
+    }
     
     # Generate complete 7-day data
     result = []
     for i in range(7):
         date = week_ago + timedelta(days=i)
         date_str = date.strftime('%Y-%m-%dT%H:%M:%S')
-        amount = stats_map.get(date.date(), 0.00)
+        amount = stats_map.get(date, 0.00)
         
         result.append({
             "created_at": date_str,
@@ -0,0 +1,233 @@
+"""
+Background export jobs: queue an export, poll it, download the artifact.
+
+    POST /analytics/export-jobs/                 -> 202, job queued
+    GET  /analytics/export-jobs/{job_id}          -> status
+    GET  /analytics/export-jobs/{job_id}/download -> file (Range supported)
+"""
+import os
+import re
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import get_db
+from app.dependencies import get_current_user
+from app.models.export_job import ExportJob
+from app.models.machine import Machine
+from app.models.user import User
+from app.schemas.common import SuccessResponse
+from app.schemas.export_job import ExportJobCreate, ExportJobResponse
+from app.utils.export_jobs import (
+    active_job_count,
+    artifact_store,
+    export_jobs,
+    purge_expired_jobs,
+)
+from app.utils.exports import EXPORT_FORMATS, require_export_format
+
+router = APIRouter()
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _tenant_id(current_user):
+    """Jobs belong to the admin account; machine tokens act for their owner."""
+    if isinstance(current_user, Machine):
+        return current_user.user_id
+    return current_user.id
+
+
+def _job_to_response(job: ExportJob) -> ExportJobResponse:
+    return ExportJobResponse(
+        id=str(job.id),
+        export_type=job.export_type,
+        format=job.format,
+        status=job.status,
+        start_date=job.start_date,
+        end_date=job.end_date,
+        machine_id=str(job.machine_id) if job.machine_id else None,
+        artifact_size=job.artifact_size,
+        download_url=f"/v1/analytics/export-jobs/{job.id}/download" if job.status == "done" else None,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+def _get_job(db: Session, job_id: str, current_user) -> ExportJob:
+    try:
+        job_uuid = uuid.UUID(job_id)
+    except ValueError:
+        job_uuid = None
+    job = db.query(ExportJob).filter(
+        ExportJob.id == job_uuid,
+        ExportJob.tenant_id == _tenant_id(current_user)
+    ).first() if job_uuid else None
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    return job
+
+
+def _range_response(path: str, size: int, range_header: str, media_type: str, filename: str):
+    """
+    Serve one byte range of the artifact (206), or 416 when it lies outside
+    the file. Multi-range requests get the whole file, which RFC 9110 allows.
+    """
+    match = _RANGE_RE.match(range_header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+
+    def read_range():
+        remaining = end - start + 1
+        with open(path, "rb") as f:
+            f.seek(start)
+            while remaining > 0:
+                chunk = f.read(min(settings.EXPORT_CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    return StreamingResponse(
+        read_range(),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers={
+            "Content-Range": f"bytes {start}-{end}/{size}",
+            "Content-Length": str(end - start + 1),
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f"attachment; filename={filename}",
+        }
+    )
+
+
+@router.post("/", response_model=SuccessResponse[ExportJobResponse], status_code=status.HTTP_202_ACCEPTED)
+def create_export_job(
+    job_data: ExportJobCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Queue a background export. Poll the returned job until it is done, then download it."""
+    require_export_format(job_data.format)
+    tenant_id = _tenant_id(current_user)
+
+    machine_id = job_data.machine_id
+    if isinstance(current_user, Machine):
+        machine_id = str(current_user.id)
+    elif machine_id:
+        try:
+            machine_uuid = uuid.UUID(machine_id)
+        except ValueError:
+            machine_uuid = None
+        owned = machine_uuid and db.query(Machine.id).filter(
+            Machine.id == machine_uuid,
+            Machine.user_id == tenant_id
+        ).first()
+        if not owned:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Machine not found"
+            )
+
+    purge_expired_jobs(db)
+    if active_job_count(db, tenant_id) >= settings.EXPORT_JOB_TENANT_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many export jobs in progress (limit {settings.EXPORT_JOB_TENANT_MAX_PENDING}). Try again when one finishes."
+        )
+
+    job = ExportJob(
+        tenant_id=tenant_id,
+        requested_by=str(current_user.id),
+        export_type=job_data.export_type,
+        format=job_data.format,
+        start_date=job_data.start_date,
+        end_date=job_data.end_date,
+        machine_id=uuid.UUID(machine_id) if machine_id else None,
+        status="queued",
+    )
+    try:
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create export job: {str(e)}"
+        )
+
+    export_jobs.submit(job.id, tenant_id)
+    return {
+        "success": True,
+        "data": _job_to_response(job)
+    }
+
+
+@router.get("/{job_id}", response_model=SuccessResponse[ExportJobResponse])
+def get_export_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get export job status."""
+    return {
+        "success": True,
+        "data": _job_to_response(_get_job(db, job_id, current_user))
+    }
+
+
+@router.get("/{job_id}/download")
+def download_export_job(
+    job_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Download a finished export. Honours single `Range: bytes=...` requests for resuming."""
+    job = _get_job(db, job_id, current_user)
+    if job.status != "done" or not job.artifact_key or not artifact_store.exists(job.artifact_key):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT if job.status in ("queued", "running") else status.HTTP_410_GONE,
+            detail=f"Export is {job.status}" if job.status != "done" else "Export file has expired"
+        )
+
+    path = artifact_store.path(job.artifact_key)
+    size = os.path.getsize(path)
+    extension, media_type = EXPORT_FORMATS[job.format]
+    filename = f"{job.export_type}_export.{extension}"
+
+    if range_header:
+        partial = _range_response(path, size, range_header, media_type, filename)
+        if partial is not None:
+            return partial
+
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=filename,
+        headers={"Accept-Ranges": "bytes"}
+    )
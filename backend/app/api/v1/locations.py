@@ -35,7 +35,7 @@ class LocationResponse(BaseModel):
 
 
 @router.get("/", response_model=dict)
-async def list_locations(
+def list_locations(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -56,7 +56,7 @@ async def list_locations(
 
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def create_location(
+def create_location(
     payload: LocationCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -83,7 +83,7 @@ async def create_location(
 
 
 @router.put("/{location_id}", response_model=dict)
-async def update_location(
+def update_location(
     location_id: str,
     payload: LocationUpdate,
     db: Session = Depends(get_db),
@@ -116,7 +116,7 @@ async def update_location(
 
 
 @router.delete("/{location_id}", response_model=dict)
-async def delete_location(
+def delete_location(
     location_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -8,17 +8,20 @@ from app.models.log import Log
 from app.models.machine import Machine
 from app.schemas.log import LogCreate, LogResponse, LogListResponse
 from app.dependencies import get_current_user
+from app.utils.pagination import paginate_keyset
+from app.utils.machine_names import resolve_machine_names
 from app.models.user import User
 from app.schemas.common import SuccessResponse
 
 router = APIRouter()
 
 @router.get("/machines/{machine_id}/logs", response_model=SuccessResponse[LogListResponse])
-async def get_machine_logs(
+def get_machine_logs(
     machine_id: str,
     type_filter: Optional[str] = Query(None, alias="type"),
     page: int = 1,
     limit: int = 50,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -32,14 +35,16 @@ async def get_machine_logs(
     if type_filter:
         query = query.filter(Log.type == type_filter)
     
-    # Pagination
-    total_items = query.count()
-    total_pages = (total_items + limit - 1) // limit
-    
-    logs = query.order_by(desc(Log.created_at))\
-        .offset((page - 1) * limit)\
-        .limit(limit)\
-        .all()
+    # Pagination: cursor requests skip the COUNT so deep pages stay cheap;
+    # totals are only reported for legacy page=N requests.
+    total_items = total_pages = None
+    if not cursor:
+        total_items = query.count()
+        total_pages = (total_items + limit - 1) // limit
+
+    logs, next_cursor, prev_cursor = paginate_keyset(
+        query, Log.created_at, Log.id, limit, cursor=cursor, page=page
+    )
     
     return {
         "success": True,
@@ -59,13 +64,15 @@ async def get_machine_logs(
                 "current_page": page,
                 "total_pages": total_pages,
                 "total_items": total_items,
-                "items_per_page": limit
+                "items_per_page": limit,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor
             }
         }
     }
 
 @router.post("/machines/{machine_id}/logs", response_model=SuccessResponse[LogResponse], status_code=status.HTTP_201_CREATED)
-async def create_machine_log(
+def create_machine_log(
     machine_id: str,
     log_data: LogCreate,
     db: Session = Depends(get_db),
@@ -105,7 +112,7 @@ async def create_machine_log(
     }
 
 @router.get("/logs/recent", response_model=SuccessResponse[List[LogResponse]])
-async def get_recent_logs(
+def get_recent_logs(
     limit: int = 10,
     type_filter: Optional[str] = Query(None, alias="type"),
     db: Session = Depends(get_db),
@@ -120,13 +127,12 @@ async def get_recent_logs(
         .limit(limit)\
         .all()
         
-    # We need to manually fetch machine names usually, but generic relation or join works
-    # Here logs are joined with machine to ensure existence, but we need machine name for response
+    # Logs are joined with machine to ensure existence; names resolved in one query
+    machine_names = resolve_machine_names(db, (log.machine_id for log in logs))
     
     results = []
     for log in logs:
-        # Simple fetch or if joined properly
-        machine_name = db.query(Machine.name).filter(Machine.id == log.machine_id).scalar()
+        machine_name = machine_names.get(str(log.machine_id))
         results.append(
             LogResponse(
                 id=str(log.id),
@@ -13,17 +13,20 @@ from app.models.payment import Payment
 from app.models.service import Service
 from app.models.upi_change_request import UpiChangeRequest
 from app.dependencies import get_current_user
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_pooled
 from app.schemas.machine import MachineCreate, MachineUpdate, MachineResponse, MachineStatusUpdate
 from app.schemas.common import SuccessResponse, MessageResponse
 from app.utils.alert_service import create_alert_if_not_exists, resolve_machine_alerts
+from app.utils.catalog_service import bump_catalog_version
+from app.utils.heartbeat import heartbeats
+from app.utils.principal_cache import principals
 from app.models.alert import AlertSeverity
 
 router = APIRouter()
 
 
 @router.post("/", response_model=SuccessResponse[MachineResponse], status_code=status.HTTP_201_CREATED)
-async def create_machine(
+def create_machine(
     machine_data: MachineCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -64,7 +67,7 @@ async def create_machine(
     username = f"{prefix}{new_number:03d}"  # e.g., admin001
     
     # Hash password
-    hashed_password = get_password_hash(machine_data.password)
+    hashed_password = get_password_hash_pooled(machine_data.password)
     
     # Create machine
     machine = Machine(
@@ -110,7 +113,7 @@ async def create_machine(
 
 
 @router.get("/", response_model=SuccessResponse[dict])
-async def get_machines(
+def get_machines(
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Items per page"),
     status: Optional[str] = Query(None, pattern="^(online|offline|maintenance)$", description="Filter by status"),
@@ -215,7 +218,7 @@ async def get_machines(
 
 
 @router.get("/{machine_id}", response_model=SuccessResponse[MachineResponse])
-async def get_machine(
+def get_machine(
     machine_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -278,7 +281,7 @@ async def get_machine(
 
 
 @router.put("/{machine_id}", response_model=SuccessResponse[MachineResponse])
-async def update_machine(
+def update_machine(
     machine_id: str,
     machine_data: MachineUpdate,
     db: Session = Depends(get_db),
@@ -333,7 +336,7 @@ async def update_machine(
         machine.username = machine_data.username
     
     if machine_data.password is not None:
-        machine.hashed_password = get_password_hash(machine_data.password)
+        machine.hashed_password = get_password_hash_pooled(machine_data.password)
 
     # upi_id changes must go through the superadmin approval flow (/machines/{id}/upi-request)
     # Any upi_id supplied here is intentionally ignored.
@@ -349,6 +352,8 @@ async def update_machine(
     new_status = machine_data.status
     if new_status is not None:
         machine.status = new_status
+        # An explicit status wins over a buffered heartbeat
+        heartbeats.discard(machine.id)
 
     try:
         db.commit()
@@ -359,6 +364,7 @@ async def update_machine(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Failed to update machine: {str(e)}"
         )
+    principals.invalidate([machine.id])
 
     # Handle alerts based on new status
     if new_status == 'offline':
@@ -396,7 +402,7 @@ async def update_machine(
 
 
 @router.patch("/{machine_id}/status", response_model=SuccessResponse[MachineResponse])
-async def update_machine_status(
+def update_machine_status(
     machine_id: str,
     status_data: MachineStatusUpdate,
     db: Session = Depends(get_db),
@@ -435,6 +441,10 @@ async def update_machine_status(
     
     if status_data.last_sync is not None:
         machine.last_sync = status_data.last_sync
+
+    if status_data.status is not None or status_data.last_sync is not None:
+        # An explicit status wins over a buffered heartbeat
+        heartbeats.discard(machine.id)
     
     if status_data.online_collection is not None:
         machine.online_collection = status_data.online_collection
@@ -451,6 +461,7 @@ async def update_machine_status(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Failed to update machine status: {str(e)}"
         )
+    principals.invalidate([machine.id])
     
     return {
         "success": True,
@@ -474,7 +485,7 @@ async def update_machine_status(
 
 
 @router.delete("/{machine_id}", response_model=MessageResponse)
-async def delete_machine(
+def delete_machine(
     machine_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -504,6 +515,8 @@ async def delete_machine(
     try:
         db.delete(machine)
         db.commit()
+        heartbeats.discard(machine_id)
+        principals.invalidate([machine_id])
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -519,7 +532,7 @@ async def delete_machine(
 # ─── UPI change request ───────────────────────────────────────────────────────
 
 @router.post("/{machine_id}/upi-request", response_model=SuccessResponse[dict], status_code=status.HTTP_201_CREATED)
-async def request_upi_change(
+def request_upi_change(
     machine_id: str,
     body: dict,
     db: Session = Depends(get_db),
@@ -734,7 +747,7 @@ def _parse_csv_bytes(content: bytes) -> tuple[list[dict], str]:
 
 
 @router.post("/{machine_id}/services/bulk-import")
-async def bulk_import_services(
+def bulk_import_services(
     machine_id: str,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
@@ -748,7 +761,8 @@ async def bulk_import_services(
     if not machine:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Machine not found")
 
-    content = await file.read()
+    # Plain def handler (runs in the threadpool), so read the spooled file directly
+    content = file.file.read()
     filename = (file.filename or "").lower()
 
     try:
@@ -773,6 +787,7 @@ async def bulk_import_services(
         )
 
     created, skipped = [], []
+    catalog_version = None
     for i, row in enumerate(rows, start=2):
         raw_name = row.get("_name")
         raw_price = row.get("_price")
@@ -788,7 +803,11 @@ async def bulk_import_services(
             skipped.append({"row": i, "reason": f"Invalid price for '{name}' (got: {raw_price!r})"})
             continue
 
-        db.add(Service(machine_id=machine_id, name=name, price=price, status="active"))
+        # One catalog version for the whole import, taken on the first valid row
+        if catalog_version is None:
+            catalog_version = bump_catalog_version(db, machine_id)
+        db.add(Service(machine_id=machine_id, name=name, price=price, status="active",
+                       catalog_version=catalog_version))
         created.append(name)
 
     if not created:
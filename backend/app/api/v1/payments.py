@@ -5,12 +5,17 @@ from typing import Optional
 from datetime import datetime, timedelta, timezone
 import pytz
 
+from app.core.config import settings
 from app.database import get_db
 from app.models.user import User
 from app.models.machine import Machine
 from app.models.payment import Payment
 from app.models.bill_counter import BillCounter
 from app.dependencies import get_current_user, assert_machine_owns
+from app.utils.pagination import paginate_keyset
+from app.utils.bill_numbers import normalize_bill_number, split_bill_number, max_used_bill_number
+from app.utils.payment_rollups import RollupDelta, record_payments
+from app.utils.machine_names import resolve_machine_names, resolve_machine_name
 from app.schemas.payment import (
     PaymentCreate, PaymentUpdate, PaymentResponse,
     PaymentWithMachineResponse, PaymentSummary, PaymentListResponse,
@@ -21,33 +26,50 @@ from app.schemas.common import SuccessResponse, MessageResponse
 router = APIRouter()
 
 
-def calculate_payment_summary(payments: list[Payment]) -> PaymentSummary:
-    """Calculate summary statistics for a list of payments."""
-    total_amount = sum(float(p.amount) for p in payments)
-    total_count = len(payments)
-    
-    upi_amount = sum(float(p.amount) for p in payments if p.method == "UPI")
-    card_amount = sum(float(p.amount) for p in payments if p.method == "Card")
-    cash_amount = sum(float(p.amount) for p in payments if p.method == "Cash")
-    
-    success_count = sum(1 for p in payments if p.status == "success")
-    pending_count = sum(1 for p in payments if p.status == "pending")
-    failed_count = sum(1 for p in payments if p.status == "failed")
-    
+def calculate_payment_summary(query) -> PaymentSummary:
+    """
+    Calculate summary statistics for a filtered Payment query.
+
+    Runs a single GROUP BY method, status aggregate in the database, so the
+    cost is a handful of result rows regardless of how many payments match.
+    """
+    groups = (
+        query.with_entities(
+            Payment.method,
+            Payment.status,
+            func.count(Payment.id),
+            func.coalesce(func.sum(Payment.amount), 0)
+        )
+        .order_by(None)
+        .group_by(Payment.method, Payment.status)
+        .all()
+    )
+
+    amount_by_method: dict[str, float] = {}
+    count_by_status: dict[str, int] = {}
+    total_amount = 0.0
+    total_count = 0
+    for method, payment_status, count, amount in groups:
+        amount = float(amount)
+        total_amount += amount
+        total_count += count
+        amount_by_method[method] = amount_by_method.get(method, 0.0) + amount
+        count_by_status[payment_status] = count_by_status.get(payment_status, 0) + count
+
     return PaymentSummary(
         total_amount=total_amount,
         total_count=total_count,
-        upi_amount=upi_amount,
-        card_amount=card_amount,
-        cash_amount=cash_amount,
-        success_count=success_count,
-        pending_count=pending_count,
-        failed_count=failed_count
+        upi_amount=amount_by_method.get("UPI", 0.0),
+        card_amount=amount_by_method.get("Card", 0.0),
+        cash_amount=amount_by_method.get("Cash", 0.0),
+        success_count=count_by_status.get("success", 0),
+        pending_count=count_by_status.get("pending", 0),
+        failed_count=count_by_status.get("failed", 0)
     )
 
 
 @router.get("/machines/{machine_id}/payments")
-async def get_payments_by_machine(
+def get_payments_by_machine(
     machine_id: str,
     period: Optional[str] = Query(None, pattern="^(day|week|month|year)$"),
     method: Optional[str] = Query(None, pattern="^(UPI|Card|Cash)$"),
@@ -55,6 +77,7 @@ async def get_payments_by_machine(
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page; overrides page"),
     limit: int = Query(200, ge=1, le=500),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -130,15 +153,14 @@ async def get_payments_by_machine(
     if status_filter:
         query = query.filter(Payment.status == status_filter)
     
-    # Get total count
-    total = query.count()
-    
-    # Get all payments for summary (before pagination)
-    all_payments = query.all()
-    summary = calculate_payment_summary(all_payments)
+    # Summary in one aggregate; its total_count doubles as the pagination total
+    summary = calculate_payment_summary(query)
+    total = summary.total_count
     
-    # Apply pagination
-    payments = query.order_by(Payment.created_at.desc()).offset((page - 1) * limit).limit(limit).all()
+    # Apply pagination (keyset when a cursor is given, OFFSET for legacy page=N)
+    payments, next_cursor, prev_cursor = paginate_keyset(
+        query, Payment.created_at, Payment.id, limit, cursor=cursor, page=page
+    )
     if start_date or period:
         print(f"📊 GET payments: machine={machine_id}, period={period}, start={start_date}, end={end_date}, found={len(payments)} payments")
     
@@ -162,7 +184,9 @@ async def get_payments_by_machine(
                 "current_page": page,
                 "total_pages": (total + limit - 1) // limit,
                 "total_items": total,
-                "items_per_page": limit
+                "items_per_page": limit,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor
             },
             "summary": summary
         }
@@ -170,7 +194,7 @@ async def get_payments_by_machine(
 
 
 @router.get("/payments")
-async def get_all_payments(
+def get_all_payments(
     period: Optional[str] = Query(None, pattern="^(day|week|month|year)$"),
     method: Optional[str] = Query(None, pattern="^(UPI|Card|Cash)$"),
     status_filter: Optional[str] = Query(None, alias="status", pattern="^(success|pending|failed)$"),
@@ -178,6 +202,7 @@ async def get_all_payments(
     end_date: Optional[str] = Query(None),
     machine_id: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page; overrides page"),
     # High default: the client's day-summary screen sums this list without
     # paginating, so a low limit silently truncated busy days to the newest
     # 50 payments while the printed summaries (unpaginated) showed the
@@ -254,22 +279,19 @@ async def get_all_payments(
     if status_filter:
         query = query.filter(Payment.status == status_filter)
 
-    # Get total count
-    total = query.count()
-
-    # Get all payments for summary (before pagination)
-    all_payments = query.all()
-    summary = calculate_payment_summary(all_payments)
+    # Summary in one aggregate; its total_count doubles as the pagination total
+    summary = calculate_payment_summary(query)
+    total = summary.total_count
 
-    # Apply pagination
-    payments = query.order_by(Payment.created_at.desc()).offset((page - 1) * limit).limit(limit).all()
+    # Apply pagination (keyset when a cursor is given, OFFSET for legacy page=N)
+    payments, next_cursor, prev_cursor = paginate_keyset(
+        query, Payment.created_at, Payment.id, limit, cursor=cursor, page=page
+    )
     if start_date or period:
         print(f"📊 GET payments: machine={machine_id}, period={period}, start={start_date}, end={end_date}, found={len(payments)} payments")
 
     # Get machine names
-    machine_ids = list(set(str(p.machine_id) for p in payments))
-    machines = db.query(Machine).filter(Machine.id.in_(machine_ids)).all()
-    machine_map = {str(m.id): m.name for m in machines}
+    machine_map = resolve_machine_names(db, (p.machine_id for p in payments))
     
     return {
         "success": True,
@@ -291,7 +313,9 @@ async def get_all_payments(
                 "current_page": page,
                 "total_pages": (total + limit - 1) // limit,
                 "total_items": total,
-                "items_per_page": limit
+                "items_per_page": limit,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor
             },
             "summary": summary
         }
@@ -299,7 +323,7 @@ async def get_all_payments(
 
 
 @router.get("/payments/next-bill-number", response_model=SuccessResponse[BillNumberReserveResponse])
-async def peek_next_bill_number(
+def peek_next_bill_number(
     machine_id: str = Query(...),
     posid: Optional[str] = Query(None),
     db: Session = Depends(get_db),
@@ -331,20 +355,22 @@ async def peek_next_bill_number(
         Payment.bill_number == f"{posid_clean}/{number}",
     ).first()
     if already_used:
-        number = _max_used_bill_number(db, machine_id, posid_clean) + 1
+        number = max_used_bill_number(db, machine_id, posid_clean) + 1
 
     return {
         "success": True,
         "data": BillNumberReserveResponse(
             bill_number=f"{posid_clean}/{number}",
             number=number,
-            posid=posid_clean
+            posid=posid_clean,
+            lease_start=number,
+            lease_end=number
         )
     }
 
 
 @router.get("/payments/{payment_id}", response_model=SuccessResponse[PaymentWithMachineResponse])
-async def get_payment(
+def get_payment(
     payment_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -358,15 +384,13 @@ async def get_payment(
             detail="Payment not found"
         )
     
-    # Get machine name
-    machine = db.query(Machine).filter(Machine.id == payment.machine_id).first()
     
     return {
         "success": True,
         "data": PaymentWithMachineResponse(
             id=str(payment.id),
             machine_id=str(payment.machine_id),
-            machine_name=machine.name if machine else "Unknown",
+            machine_name=resolve_machine_name(db, payment.machine_id),
             bill_number=payment.bill_number,
             amount=float(payment.amount),
             method=payment.method,
@@ -376,36 +400,8 @@ async def get_payment(
     }
 
 
-def _normalize_bill_number(bill_number: str) -> str:
-    """
-    Normalize POSID/000123 → POSID/123.
-    Different app versions format the numeric suffix differently (some zero-pad to 6 digits,
-    newer ones don't). Stripping leading zeros before storing means both formats map to the
-    same string, so the unique index on (machine_id, bill_number) catches cross-device
-    duplicates even when two phones are logged into the same machine account.
-    """
-    import re
-    m = re.match(r'^(.+/)0*(\d+)$', bill_number)
-    return f"{m.group(1)}{m.group(2)}" if m else bill_number
-
-
-def _max_used_bill_number(db: Session, machine_id, posid: str) -> int:
-    """Highest numeric suffix already recorded for this machine+POSID."""
-    import re
-    max_used = 0
-    rows = db.query(Payment.bill_number).filter(
-        Payment.machine_id == machine_id,
-        Payment.bill_number.like(f"{posid}/%"),
-    ).all()
-    for (bn,) in rows:
-        m = re.match(r'^(.+?)/(\d+)$', bn)
-        if m and m.group(1) == posid:
-            max_used = max(max_used, int(m.group(2)))
-    return max_used
-
-
 @router.post("/payments/reserve-bill-number", response_model=SuccessResponse[BillNumberReserveResponse])
-async def reserve_bill_number(
+def reserve_bill_number(
     request: BillNumberReserveRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -419,9 +415,22 @@ async def reserve_bill_number(
     A reserved number that is never used (declined card) stays as a gap —
     it is never re-issued, so numbers can never collide across devices,
     reinstalls, or stale local caches.
+
+    Lease mode (count > 1) reserves a block of consecutive numbers in the
+    same locked transaction, so a busy terminal pays one round trip per
+    block instead of per bill. The block is valid until lease_expires_at;
+    numbers not spent by then are simply gaps, and the terminal reserves a
+    new block.
     """
     assert_machine_owns(current_user, str(request.machine_id))
 
+    block_size = request.count
+    if block_size > settings.BILL_LEASE_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"count must be at most {settings.BILL_LEASE_MAX_SIZE}"
+        )
+
     machine = db.query(Machine).filter(Machine.id == request.machine_id).first()
     if not machine:
         raise HTTPException(
@@ -455,22 +464,41 @@ async def reserve_bill_number(
     elif counter.next_number != expected_next:
         counter.next_number = expected_next
 
+    # A live block lease pins the floor: never hand out numbers a terminal
+    # may still be spending, even if the admin knob was moved down meanwhile.
+    now = datetime.now(timezone.utc)
+    lease_expires_at = counter.lease_expires_at
+    if lease_expires_at is not None and lease_expires_at.tzinfo is None:
+        lease_expires_at = lease_expires_at.replace(tzinfo=timezone.utc)
+    if counter.leased_through is not None and lease_expires_at and lease_expires_at > now:
+        counter.next_number = max(counter.next_number, counter.leased_through + 1)
+
     number = counter.next_number
 
     # Data safety net: NEVER re-issue a number an existing payment already
     # uses (stale counter, POSID switched back to an old series, counter set
-    # below used numbers). Cheap indexed lookup normally; on conflict, jump
-    # past the highest used number for this POSID.
+    # below used numbers). Cheap indexed lookup on the block normally; on
+    # conflict, jump past the highest used number for this POSID.
     already_used = db.query(Payment.id).filter(
         Payment.machine_id == request.machine_id,
-        Payment.bill_number == f"{posid}/{number}",
+        Payment.posid == posid,
+        Payment.bill_seq >= number,
+        Payment.bill_seq < number + block_size,
     ).first()
     if already_used:
-        number = _max_used_bill_number(db, request.machine_id, posid) + 1
+        number = max_used_bill_number(db, request.machine_id, posid) + 1
 
-    counter.next_number = number + 1
-    # machines.bill_counter keeps LAST USED semantics (login recovery).
-    machine.bill_counter = max(machine.bill_counter or 0, number)
+    last_number = number + block_size - 1
+    counter.next_number = last_number + 1
+    # machines.bill_counter keeps LAST USED semantics (login recovery); a
+    # leased block counts as used, so bill_counter + 1 == next_number holds.
+    machine.bill_counter = max(machine.bill_counter or 0, last_number)
+
+    expires_at = None
+    if block_size > 1:
+        expires_at = now + timedelta(seconds=settings.BILL_LEASE_TTL_SECONDS)
+        counter.leased_through = last_number
+        counter.lease_expires_at = expires_at
 
     try:
         db.commit()
@@ -486,13 +514,16 @@ async def reserve_bill_number(
         "data": BillNumberReserveResponse(
             bill_number=f"{posid}/{number}",
             number=number,
-            posid=posid
+            posid=posid,
+            lease_start=number,
+            lease_end=last_number,
+            lease_expires_at=expires_at
         )
     }
 
 
 @router.post("/payments", response_model=SuccessResponse[PaymentResponse], status_code=status.HTTP_201_CREATED)
-async def create_payment(
+def create_payment(
     payment_data: PaymentCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -510,24 +541,16 @@ async def create_payment(
 
     # Normalize bill number: strip leading zeros from numeric suffix so that
     # "WSSBI-AP/000330" and "WSSBI-AP/330" are treated as the same bill.
-    normalized_bill = _normalize_bill_number(payment_data.bill_number)
+    normalized_bill = normalize_bill_number(payment_data.bill_number)
 
     # Extract POSID and number from bill_number (e.g., "WSSBI-AP/333" -> "WSSBI-AP", 333)
-    import re
-    bill_match = re.match(r'^(.+?)/(\d+)$', normalized_bill)
-    if not bill_match:
+    bill_parts = split_bill_number(normalized_bill)
+    if not bill_parts:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid bill number format: {normalized_bill}"
         )
-    posid, bill_num_str = bill_match.groups()
-    try:
-        bill_num = int(bill_num_str)
-    except ValueError:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid bill number: {normalized_bill}"
-        )
+    posid, bill_num = bill_parts
 
     # Get or create bill counter for this machine/POSID
     counter = db.query(BillCounter).filter(
@@ -557,7 +580,12 @@ async def create_payment(
             if existing:
                 now_utc = datetime.now(timezone.utc)
                 if existing.created_at.date() != now_utc.date():
+                    # Moving the payment to today moves it between rollup days too
+                    delta = RollupDelta()
+                    delta.add_payment(existing, sign=-1)
                     existing.created_at = now_utc
+                    delta.add_payment(existing)
+                    delta.apply(db)
                     db.commit()
                     print(f"✅ Updated stale payment due to counter reset: {normalized_bill}, new created_at={existing.created_at}")
                 return {
@@ -582,6 +610,8 @@ async def create_payment(
     payment = Payment(
         machine_id=payment_data.machine_id,
         bill_number=normalized_bill,
+        posid=posid,
+        bill_seq=bill_num,
         amount=payment_data.amount,
         method=payment_data.method,
         status=payment_data.status,
@@ -590,6 +620,7 @@ async def create_payment(
     
     try:
         db.add(payment)
+        record_payments(db, [payment])
         db.commit()
         db.refresh(payment)
         # Sync machines.bill_counter so app reads correct value on next login.
@@ -23,6 +23,8 @@ async def create_razorpay_order(
     body: CreateOrderRequest,
     current_user=Depends(get_current_user),
 ):
+    # Stays async for the Razorpay call. It has no DB steps of its own:
+    # get_current_user is a plain `def` dependency, run in the threadpool.
     if not settings.RAZORPAY_KEY_ID or not settings.RAZORPAY_KEY_SECRET:
         raise HTTPException(status_code=500, detail="Razorpay not configured")
 
@@ -7,7 +7,8 @@ from app.database import get_db
 from app.models.user import User
 from app.models.machine import Machine
 from app.models.service import Service
-from app.models.bill_config import BillConfig
+from app.utils.catalog_service import bump_catalog_version, record_service_tombstone
+from app.utils.machine_names import resolve_machine_name
 
 from app.dependencies import get_current_user
 from app.schemas.service import ServiceCreate, ServiceUpdate, ServiceResponse, ServiceWithMachineResponse
@@ -17,7 +18,7 @@ router = APIRouter()
 
 
 @router.get("/machines/{machine_id}/services", response_model=SuccessResponse[list[ServiceResponse]])
-async def get_services_by_machine(
+def get_services_by_machine(
     machine_id: str,
     status_filter: Optional[str] = Query(None, alias="status", pattern="^(active|inactive)$"),
     db: Session = Depends(get_db),
@@ -63,7 +64,7 @@ async def get_services_by_machine(
 
 
 @router.get("/machines/{machine_id}/services/active", response_model=SuccessResponse[list[ServiceResponse]])
-async def get_active_services(
+def get_active_services(
     machine_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -115,7 +116,7 @@ async def get_active_services(
 
 @router.get("/services/{service_id}", response_model=SuccessResponse[ServiceWithMachineResponse])
 
-async def get_service(
+def get_service(
     service_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -129,15 +130,13 @@ async def get_service(
             detail="Service not found"
         )
     
-    # Get machine name
-    machine = db.query(Machine).filter(Machine.id == service.machine_id).first()
     
     return {
         "success": True,
         "data": ServiceWithMachineResponse(
             id=str(service.id),
             machine_id=str(service.machine_id),
-            machine_name=machine.name if machine else "Unknown",
+            machine_name=resolve_machine_name(db, service.machine_id),
             name=service.name,
             price=float(service.price),
             status=service.status,
@@ -148,7 +147,7 @@ async def get_service(
 
 
 @router.post("/machines/{machine_id}/services", response_model=SuccessResponse[ServiceResponse], status_code=status.HTTP_201_CREATED)
-async def create_service(
+def create_service(
     machine_id: str,
     service_data: ServiceCreate,
     db: Session = Depends(get_db),
@@ -170,6 +169,7 @@ async def create_service(
         price=service_data.price,
         status=service_data.status
     )
+    service.catalog_version = bump_catalog_version(db, machine_id)
     
     try:
         db.add(service)
@@ -182,11 +182,6 @@ async def create_service(
             detail=f"Failed to create service: {str(e)}"
         )
 
-    bill_cfg = db.query(BillConfig).filter(BillConfig.machine_id == machine_id).first()
-    if bill_cfg:
-        bill_cfg.catalog_version = (bill_cfg.catalog_version or 0) + 1
-        db.commit()
-
     return {
         "success": True,
         "data": ServiceResponse(
@@ -202,7 +197,7 @@ async def create_service(
 
 
 @router.put("/services/{service_id}", response_model=SuccessResponse[ServiceResponse])
-async def update_service(
+def update_service(
     service_id: str,
     service_data: ServiceUpdate,
     db: Session = Depends(get_db),
@@ -235,6 +230,8 @@ async def update_service(
     
     if service_data.status is not None:
         service.status = service_data.status
+
+    service.catalog_version = bump_catalog_version(db, service.machine_id)
     
     try:
         db.commit()
@@ -246,11 +243,6 @@ async def update_service(
             detail=f"Failed to update service: {str(e)}"
         )
 
-    bill_cfg = db.query(BillConfig).filter(BillConfig.machine_id == service.machine_id).first()
-    if bill_cfg:
-        bill_cfg.catalog_version = (bill_cfg.catalog_version or 0) + 1
-        db.commit()
-
     return {
         "success": True,
         "data": ServiceResponse(
@@ -266,7 +258,7 @@ async def update_service(
 
 
 @router.delete("/services/{service_id}", response_model=MessageResponse)
-async def delete_service(
+def delete_service(
     service_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -280,8 +272,8 @@ async def delete_service(
             detail="Service not found"
         )
     
-    machine_id_for_bump = service.machine_id
     try:
+        record_service_tombstone(db, service)
         db.delete(service)
         db.commit()
     except Exception as e:
@@ -291,11 +283,6 @@ async def delete_service(
             detail=f"Failed to delete service: {str(e)}"
         )
 
-    bill_cfg = db.query(BillConfig).filter(BillConfig.machine_id == machine_id_for_bump).first()
-    if bill_cfg:
-        bill_cfg.catalog_version = (bill_cfg.catalog_version or 0) + 1
-        db.commit()
-
     return {
         "success": True,
         "message": "Service deleted successfully"
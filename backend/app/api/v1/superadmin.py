@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import Optional, Tuple
@@ -12,7 +13,10 @@ from app.models.machine import Machine
 from app.models.upi_change_request import UpiChangeRequest
 from app.models.audit_log import AuditLog
 from app.dependencies import get_current_superadmin
-from app.core.security import get_password_hash
+from app.utils.pagination import paginate_keyset
+from app.utils.machine_names import resolve_machine_names
+from app.utils.principal_cache import principals
+from app.core.security import get_password_hash_async
 from app.core.config import settings
 from app.schemas.common import SuccessResponse, MessageResponse
 
@@ -79,7 +83,7 @@ def _mask_phone(phone: Optional[str]) -> Optional[str]:
 # ─── Admin management ─────────────────────────────────────────────────────────
 
 @router.get("/admins", response_model=SuccessResponse[dict])
-async def list_admins(
+def list_admins(
     db: Session = Depends(get_db),
     _: User = Depends(get_current_superadmin),
 ):
@@ -112,7 +116,7 @@ async def list_admins(
 
 
 @router.get("/admins/{admin_id}", response_model=SuccessResponse[dict])
-async def get_admin(
+def get_admin(
     admin_id: str,
     db: Session = Depends(get_db),
     _: User = Depends(get_current_superadmin),
@@ -174,48 +178,63 @@ async def create_admin(
     if not username or not email or not password:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="username, email and password are required")
 
-    if db.query(User).filter(User.username == username).first():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists")
-    if db.query(User).filter(User.email == email).first():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
+    # This handler awaits the hashing pool and Clerk, so DB steps go through
+    # the threadpool rather than running on the event loop
+    def taken() -> Optional[str]:
+        if db.query(User).filter(User.username == username).first():
+            return "Username already exists"
+        if db.query(User).filter(User.email == email).first():
+            return "Email already exists"
+        return None
+
+    conflict = await run_in_threadpool(taken)
+    if conflict:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=conflict)
 
     user = User(
         username=username,
         email=email,
         phone=phone,
-        hashed_password=get_password_hash(password),
+        hashed_password=await get_password_hash_async(password),
         role=UserRole.ADMIN,
         is_active="true",
     )
-    db.add(user)
-    try:
-        db.commit()
-        db.refresh(user)
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    def save() -> dict:
+        db.add(user)
+        try:
+            db.commit()
+            db.refresh(user)
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        # Read now: the audit commit below expires the instance
+        return {
+            "id": str(user.id),
+            "username": user.username,
+            "email": user.email,
+            "role": user.role,
+            "created_at": user.created_at.isoformat(),
+        }
+
+    created = await run_in_threadpool(save)
 
     # Create Clerk account so the admin can use email magic link immediately
     _clerk_id, clerk_ready = await _create_clerk_user(email, username)
 
-    _log_audit(db, superadmin, "admin.create", target_type="user", target_id=str(user.id),
-               details={"username": username, "email": email, "clerk_ready": clerk_ready})
+    await run_in_threadpool(
+        _log_audit, db, superadmin, "admin.create", target_type="user", target_id=created["id"],
+        details={"username": username, "email": email, "clerk_ready": clerk_ready}
+    )
 
     return {
         "success": True,
-        "data": {
-            "id": str(user.id),
-            "username": user.username,
-            "email": user.email,
-            "role": user.role,
-            "clerk_ready": clerk_ready,
-            "created_at": user.created_at.isoformat(),
-        },
+        "data": {**created, "clerk_ready": clerk_ready},
     }
 
 
 @router.patch("/admins/{admin_id}/status", response_model=SuccessResponse[dict])
-async def toggle_admin_status(
+def toggle_admin_status(
     admin_id: str,
     body: dict,
     db: Session = Depends(get_db),
@@ -231,6 +250,8 @@ async def toggle_admin_status(
 
     admin.is_active = new_status
     db.commit()
+    # Takes effect on the admin's next request rather than at cache expiry
+    principals.invalidate([admin.id])
 
     _log_audit(db, superadmin, "admin.status_toggle", target_type="user", target_id=str(admin.id),
                details={"username": admin.username, "is_active": new_status})
@@ -241,7 +262,7 @@ async def toggle_admin_status(
 # ─── Machine overview ─────────────────────────────────────────────────────────
 
 @router.get("/machines", response_model=SuccessResponse[dict])
-async def list_all_machines(
+def list_all_machines(
     db: Session = Depends(get_db),
     _: User = Depends(get_current_superadmin),
 ):
@@ -275,7 +296,7 @@ async def list_all_machines(
 # ─── UPI change request approval ─────────────────────────────────────────────
 
 @router.get("/upi-requests", response_model=SuccessResponse[dict])
-async def list_upi_requests(
+def list_upi_requests(
     request_status: Optional[str] = Query(None, alias="status"),
     db: Session = Depends(get_db),
     _: User = Depends(get_current_superadmin),
@@ -288,7 +309,7 @@ async def list_upi_requests(
     machine_ids = list({r.machine_id for r in requests})
     admin_ids = list({r.requested_by for r in requests})
 
-    machines = {str(m.id): m for m in db.query(Machine).filter(Machine.id.in_(machine_ids)).all()}
+    machine_names = resolve_machine_names(db, machine_ids)
     admins = {str(u.id): u.username for u in db.query(User).filter(User.id.in_(admin_ids)).all()}
 
     return {
@@ -298,7 +319,7 @@ async def list_upi_requests(
                 {
                     "id": str(r.id),
                     "machine_id": str(r.machine_id),
-                    "machine_name": machines[str(r.machine_id)].name if str(r.machine_id) in machines else "—",
+                    "machine_name": machine_names.get(str(r.machine_id), "—"),
                     "requested_by_id": str(r.requested_by),
                     "requested_by": admins.get(str(r.requested_by), "—"),
                     "old_upi_id": r.old_upi_id,
@@ -315,7 +336,7 @@ async def list_upi_requests(
 
 
 @router.post("/upi-requests/{request_id}/approve", response_model=SuccessResponse[dict])
-async def approve_upi_request(
+def approve_upi_request(
     request_id: str,
     db: Session = Depends(get_db),
     superadmin: User = Depends(get_current_superadmin),
@@ -351,7 +372,7 @@ async def approve_upi_request(
 
 
 @router.post("/upi-requests/{request_id}/reject", response_model=SuccessResponse[dict])
-async def reject_upi_request(
+def reject_upi_request(
     request_id: str,
     body: dict,
     db: Session = Depends(get_db),
@@ -379,18 +400,21 @@ async def reject_upi_request(
 # ─── Audit log viewer ─────────────────────────────────────────────────────────
 
 @router.get("/audit-logs", response_model=SuccessResponse[dict])
-async def list_audit_logs(
+def list_audit_logs(
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=200),
     action: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page; overrides page"),
     db: Session = Depends(get_db),
     _: User = Depends(get_current_superadmin),
 ):
     query = db.query(AuditLog)
     if action:
         query = query.filter(AuditLog.action == action)
-    total = query.count()
-    logs = query.order_by(AuditLog.created_at.desc()).offset((page - 1) * limit).limit(limit).all()
+    total = query.count() if not cursor else None
+    logs, next_cursor, prev_cursor = paginate_keyset(
+        query, AuditLog.created_at, AuditLog.id, limit, cursor=cursor, page=page
+    )
     return {
         "success": True,
         "data": {
@@ -407,6 +431,12 @@ async def list_audit_logs(
                 }
                 for log in logs
             ],
-            "pagination": {"total": total, "page": page, "limit": limit},
+            "pagination": {
+                "total": total,
+                "page": page,
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+            },
         },
     }
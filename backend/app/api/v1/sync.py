@@ -1,36 +1,158 @@
 """
 Sync endpoints for client app offline data synchronization.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Optional, Tuple
 import re
+import uuid
 
 from app.database import get_db
 from app.models.user import User
 from app.models.machine import Machine
-from app.models.service import Service
+from app.models.service import Service, ServiceTombstone
+from app.models.bill_config import BillConfig
 from app.models.payment import Payment
 from app.models.bill_counter import BillCounter
 from app.dependencies import get_current_user, assert_machine_owns
 from app.schemas.sync import (
-    SyncPushRequest, SyncPushResponse,
+    PaymentSync, SyncPushRequest, SyncPushResponse,
+    SyncStreamPushResponse, SyncPushCursorResponse,
     SyncPullResponse, SyncStatusResponse
 )
 from app.schemas.common import SuccessResponse
+from app.utils.heartbeat import heartbeats
+from app.utils.bill_numbers import normalize_bill_number, split_bill_number, max_used_bill_number
+from app.utils.payment_rollups import record_payments
 
 router = APIRouter()
 
+# Rows per multi-row INSERT. Keeps each statement well under Postgres'
+# bind-parameter limit while a large backlog still costs only a few round trips.
+SYNC_PUSH_BATCH_SIZE = 500
 
-def _normalize_bill_number(bill_number: str) -> str:
-    """Strip leading zeros from numeric suffix: POSID/000123 → POSID/123."""
-    m = re.match(r'^(.+/)0*(\d+)$', bill_number)
-    return f"{m.group(1)}{m.group(2)}" if m else bill_number
+# Longest NDJSON line /sync/push/stream accepts. A PaymentSync record is a few
+# hundred bytes; anything past this is not one, and buffering it unbounded
+# would let a single request without newlines exhaust memory.
+SYNC_STREAM_MAX_LINE_BYTES = 64 * 1024
+
+
+def _machine_uuid(machine_id) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(str(machine_id))
+    except ValueError:
+        return None
+
+
+def _ingest_payment_batch(
+    db: Session, machine_id: str, batch: List[PaymentSync], max_num_by_posid: dict
+) -> Tuple[int, int]:
+    """
+    Insert one batch of synced payments with a single duplicate lookup and a
+    single multi-row INSERT ... ON CONFLICT DO NOTHING.
+
+    Duplicates (already on the server, repeated inside the batch, or inserted
+    concurrently by another device) are skipped, same as before. Records whose
+    machine_id is not the machine being synced are counted as failed: the
+    caller authorized that machine only, and its counters and cursor are the
+    ones advanced. Updates max_num_by_posid with the bills actually inserted.
+
+    Returns:
+        (synced_count, failed_count)
+    """
+    failed_count = 0
+    rows = {}  # (machine_id, bill_number) -> row; first occurrence wins
+    now = datetime.now(timezone.utc)
+
+    synced_machine = _machine_uuid(machine_id)
+    for payment_data in batch:
+        machine_uuid = _machine_uuid(payment_data.machine_id)
+        if machine_uuid is None or machine_uuid != synced_machine:
+            failed_count += 1
+            continue
+
+        normalized_bill = normalize_bill_number(payment_data.bill_number)
+        key = (machine_uuid, normalized_bill)
+        if key in rows:
+            continue
+        posid, bill_seq = split_bill_number(normalized_bill) or (None, None)
+        rows[key] = {
+            "id": uuid.uuid4(),
+            "machine_id": machine_uuid,
+            "bill_number": normalized_bill,
+            "posid": posid,
+            "bill_seq": bill_seq,
+            "amount": payment_data.amount,
+            "method": payment_data.method,
+            "status": payment_data.status,
+            "created_at": payment_data.created_at or now,
+        }
+
+    if not rows:
+        return 0, failed_count
+
+    # Check which payments already exist — scoped per machine
+    existing = db.query(Payment.machine_id, Payment.bill_number).filter(
+        tuple_(Payment.machine_id, Payment.bill_number).in_(list(rows.keys()))
+    ).all()
+    for machine_uuid, bill_number in existing:
+        rows.pop((machine_uuid, bill_number), None)
+
+    if not rows:
+        return 0, failed_count
+
+    # idx_payments_machine_bill still guards against a concurrent push of the
+    # same bill between the lookup above and this insert.
+    inserted = db.execute(
+        pg_insert(Payment.__table__)
+        .values(list(rows.values()))
+        .on_conflict_do_nothing(index_elements=["machine_id", "bill_number"])
+        .returning(
+            Payment.posid, Payment.bill_seq,
+            Payment.machine_id, Payment.created_at, Payment.method, Payment.status, Payment.amount
+        )
+    ).all()
+
+    for row in inserted:
+        if row.posid is not None:
+            max_num_by_posid[row.posid] = max(max_num_by_posid.get(row.posid, 0), row.bill_seq)
+
+    # Rollups move with the rows actually inserted, in the same transaction
+    record_payments(db, inserted)
+
+    return len(inserted), failed_count
+
+
+def _advance_bill_counters(db: Session, machine_id: str, max_num_by_posid: dict) -> None:
+    """Move each POSID counter past the highest synced number (one lookup for all POSIDs)."""
+    if not max_num_by_posid:
+        return
+
+    counters = db.query(BillCounter).filter(
+        BillCounter.machine_id == machine_id,
+        BillCounter.posid.in_(list(max_num_by_posid.keys())),
+    ).all()
+    counters_by_posid = {c.posid: c for c in counters}
+
+    for posid, max_num in max_num_by_posid.items():
+        counter = counters_by_posid.get(posid)
+        if counter:
+            counter.next_number = max(counter.next_number, max_num + 1)
+        else:
+            db.add(BillCounter(
+                machine_id=machine_id,
+                posid=posid,
+                next_number=max_num + 1
+            ))
 
 
 @router.post("/push", response_model=SuccessResponse[SyncPushResponse])
-async def sync_push(
+def sync_push(
     sync_data: SyncPushRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -64,66 +186,24 @@ async def sync_push(
     failed_count = 0
     max_num_by_posid = {}  # highest bill number synced per POSID
 
-    # Process payments
-    for payment_data in sync_data.payments:
-        try:
-            normalized_bill = _normalize_bill_number(payment_data.bill_number)
-
-            # Check if payment already exists — scoped to this machine
-            existing = db.query(Payment).filter(
-                Payment.machine_id == payment_data.machine_id,
-                Payment.bill_number == normalized_bill,
-            ).first()
-
-            if existing:
-                # Skip duplicate
-                continue
-
-            # Create new payment
-            payment = Payment(
-                machine_id=payment_data.machine_id,
-                bill_number=normalized_bill,
-                amount=payment_data.amount,
-                method=payment_data.method,
-                status=payment_data.status,
-                created_at=payment_data.created_at or datetime.now(timezone.utc)
-            )
-
-            db.add(payment)
-            synced_count += 1
-
-            bill_match = re.match(r'^(.+?)/(\d+)$', normalized_bill)
-            if bill_match:
-                posid, num = bill_match.group(1), int(bill_match.group(2))
-                max_num_by_posid[posid] = max(max_num_by_posid.get(posid, 0), num)
-
-        except Exception as e:
-            failed_count += 1
-            continue
+    # Set-based ingestion: a terminal back online with thousands of offline
+    # bills costs two statements per batch instead of one SELECT per bill.
+    for start in range(0, len(sync_data.payments), SYNC_PUSH_BATCH_SIZE):
+        batch = sync_data.payments[start:start + SYNC_PUSH_BATCH_SIZE]
+        synced, failed = _ingest_payment_batch(db, sync_data.machine_id, batch, max_num_by_posid)
+        synced_count += synced
+        failed_count += failed
 
     # Keep the per-POSID counters (used by POST /payments validation) in step
     # with offline-synced payments so they don't flag later bills as resets.
-    for posid, max_num in max_num_by_posid.items():
-        counter = db.query(BillCounter).filter(
-            BillCounter.machine_id == sync_data.machine_id,
-            BillCounter.posid == posid,
-        ).first()
-        if counter:
-            counter.next_number = max(counter.next_number, max_num + 1)
-        else:
-            db.add(BillCounter(
-                machine_id=sync_data.machine_id,
-                posid=posid,
-                next_number=max_num + 1
-            ))
+    _advance_bill_counters(db, sync_data.machine_id, max_num_by_posid)
 
-    # Update machine last_sync and bill_counter (take the max so we never go
-    # backwards). Semantics: LAST USED number — same as POST /payments and login.
+    # Update machine bill_counter (take the max so we never go backwards).
+    # Semantics: LAST USED number — same as POST /payments and login.
     # NOTE: sync_data.client_bill_counter is deliberately IGNORED — bill numbers
     # are server-issued now, and the client's legacy local counter is stale; it
     # must not be able to drag the server counter forward (e.g. after an admin
     # resets machines.bill_counter). Only real synced payments count.
-    machine.last_sync = datetime.now(timezone.utc)
     highest_synced = max(max_num_by_posid.values(), default=0)
     machine.bill_counter = max(
         machine.bill_counter or 0,
@@ -139,6 +219,9 @@ async def sync_push(
             detail=f"Failed to sync data: {str(e)}"
         )
 
+    # last_sync goes through the coalesced heartbeat, not this transaction
+    heartbeats.touch(machine)
+
     return {
         "success": True,
         "data": SyncPushResponse(
@@ -150,9 +233,233 @@ async def sync_push(
     }
 
 
+def _commit_stream_batch(db: Session, machine: Machine, batch: List[PaymentSync], cursor: dict) -> Tuple[int, int]:
+    """Ingest and commit one streamed batch, then advance the resume cursor."""
+    max_num_by_posid = {}
+    synced, failed = _ingest_payment_batch(db, str(machine.id), batch, max_num_by_posid)
+    _advance_bill_counters(db, machine.id, max_num_by_posid)
+    machine.bill_counter = max(
+        machine.bill_counter or 0,
+        max(max_num_by_posid.values(), default=0),
+    )
+
+    try:
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to sync data: {str(e)}"
+        )
+
+    # Only now is the batch durable — duplicates count too, they are on the server.
+    for payment_data in batch:
+        bill_parts = split_bill_number(normalize_bill_number(payment_data.bill_number))
+        if bill_parts:
+            posid, num = bill_parts
+            cursor[posid] = max(cursor.get(posid, 0), num)
+
+    return synced, failed
+
+
+def _touch_after_stream(machine: Machine) -> Tuple[Optional[datetime], Optional[int]]:
+    """Record the heartbeat and read the response fields (may refresh `machine`)."""
+    heartbeats.touch(machine)
+    return machine.last_sync, machine.bill_counter
+
+
+@router.post("/push/stream", response_model=SuccessResponse[SyncStreamPushResponse])
+async def sync_push_stream(
+    request: Request,
+    machine_id: str = Query(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Push offline payments as newline-delimited JSON (one PaymentSync per line).
+
+    The body is read incrementally and committed every SYNC_PUSH_BATCH_SIZE
+    records, so a backlog of several days never has to be parsed as one
+    document. If the connection drops, GET /sync/push/cursor/{machine_id}
+    returns the last committed bill per POSID and the client resumes after it
+    (re-sent bills are skipped as duplicates anyway).
+
+    Every record must belong to machine_id; others count as failed. A line
+    longer than SYNC_STREAM_MAX_LINE_BYTES aborts the request with 413
+    (batches committed before it stay committed).
+
+    Args:
+        request: Raw request whose body is the NDJSON stream
+        machine_id: Machine UUID
+        db: Database session
+        current_user: Current authenticated user/machine
+
+    Returns:
+        Sync statistics and the resume cursor
+    """
+    # Machine tokens may only push data for their own machine
+    assert_machine_owns(current_user, machine_id)
+
+    # Verify machine exists (this handler is async to read the body, so
+    # every DB step is pushed to the threadpool)
+    machine = await run_in_threadpool(
+        lambda: db.query(Machine).filter(Machine.id == machine_id).first()
+    )
+    if not machine:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Machine not found"
+        )
+    # Batch commits expire `machine`; reading it on the event loop would
+    # refresh it synchronously, so the loop only ever uses this copy.
+    authorized_id = machine.id
+
+    synced_count = 0
+    failed_count = 0
+    committed_batches = 0
+    cursor = {}  # POSID -> highest committed bill number
+    batch: List[PaymentSync] = []
+    pending = b""
+
+    def parse(line: bytes) -> Optional[PaymentSync]:
+        """One record of this machine, or None (counted as failed)."""
+        try:
+            record = PaymentSync.model_validate_json(line)
+        except ValidationError:
+            return None
+        # Records for any other machine are rejected, not ingested: counters
+        # and the cursor below only ever move for the authorized machine.
+        if _machine_uuid(record.machine_id) != authorized_id:
+            return None
+        return record
+
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        if len(pending) > SYNC_STREAM_MAX_LINE_BYTES or any(len(line) > SYNC_STREAM_MAX_LINE_BYTES for line in lines):
+            raise HTTPException(
+                status_code=413,
+                detail=f"NDJSON line exceeds {SYNC_STREAM_MAX_LINE_BYTES} bytes"
+            )
+        for line in lines:
+            if not line.strip():
+                continue
+            record = parse(line)
+            if record is None:
+                failed_count += 1
+                continue
+            batch.append(record)
+
+            if len(batch) >= SYNC_PUSH_BATCH_SIZE:
+                synced, failed = await run_in_threadpool(_commit_stream_batch, db, machine, batch, cursor)
+                synced_count += synced
+                failed_count += failed
+                committed_batches += 1
+                batch = []
+
+    # Last line may come without a trailing newline
+    if pending.strip():
+        record = parse(pending)
+        if record is None:
+            failed_count += 1
+        else:
+            batch.append(record)
+
+    if batch:
+        synced, failed = await run_in_threadpool(_commit_stream_batch, db, machine, batch, cursor)
+        synced_count += synced
+        failed_count += failed
+        committed_batches += 1
+
+    sync_timestamp, latest_bill_counter = await run_in_threadpool(_touch_after_stream, machine)
+
+    return {
+        "success": True,
+        "data": SyncStreamPushResponse(
+            synced_payments=synced_count,
+            failed_payments=failed_count,
+            committed_batches=committed_batches,
+            sync_timestamp=sync_timestamp,
+            latest_bill_counter=latest_bill_counter,
+            cursor={posid: f"{posid}/{num}" for posid, num in cursor.items()}
+        )
+    }
+
+
+@router.get("/push/cursor/{machine_id}", response_model=SuccessResponse[SyncPushCursorResponse])
+def sync_push_cursor(
+    machine_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the last committed bill per POSID for a machine.
+
+    A client whose streaming push was interrupted calls this to find where
+    to resume instead of re-uploading its whole offline backlog.
+    """
+    # Machine tokens may only read their own cursor
+    assert_machine_owns(current_user, machine_id)
+
+    # Verify machine exists
+    machine = db.query(Machine).filter(Machine.id == machine_id).first()
+    if not machine:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Machine not found"
+        )
+
+    # Every POSID that ever recorded a bill has a counter row (POST /payments,
+    # reservations and pushes all create one).
+    posids = [
+        posid for (posid,) in db.query(BillCounter.posid).filter(
+            BillCounter.machine_id == machine_id
+        ).all()
+    ]
+    cursor = {}
+    for posid in posids:
+        max_used = max_used_bill_number(db, machine_id, posid)
+        if max_used:
+            cursor[posid] = f"{posid}/{max_used}"
+
+    return {
+        "success": True,
+        "data": SyncPushCursorResponse(
+            machine_id=str(machine.id),
+            cursor=cursor
+        )
+    }
+
+
+def _catalog_etag(version: int) -> str:
+    return f'"catalog-{version}"'
+
+
+def _parse_catalog_etag(if_none_match: Optional[str]) -> Optional[int]:
+    """Extract the catalog version from an If-None-Match header, if it is ours."""
+    if not if_none_match:
+        return None
+    m = re.search(r'"catalog-(\d+)"', if_none_match)
+    return int(m.group(1)) if m else None
+
+
+def _service_to_sync_dict(s: Service) -> dict:
+    return {
+        "id": str(s.id),
+        "name": s.name,
+        "price": float(s.price),
+        "status": s.status,
+        "created_at": s.created_at.isoformat(),
+        "updated_at": s.updated_at.isoformat()
+    }
+
+
 @router.post("/pull", response_model=SuccessResponse[SyncPullResponse])
-async def sync_pull(
+def sync_pull(
+    response: Response,
     machine_id: str = Query(...),
+    catalog_version: Optional[int] = Query(None, ge=0),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -161,9 +468,19 @@ async def sync_pull(
     
     This endpoint allows client apps to download the latest
     services and configuration.
+
+    Clients that pass the catalog version they already hold (query param
+    or the ETag from a previous pull in If-None-Match) get only what
+    changed since then: added/updated active services in `services` and
+    deleted or deactivated ones in `removed_service_ids`. If nothing
+    changed, If-None-Match gets a 304 and catalog_version gets
+    `unchanged: true`, without loading any services.
     
     Args:
+        response: Response (carries the catalog ETag)
         machine_id: Machine UUID
+        catalog_version: Catalog version the client already has
+        if_none_match: ETag from a previous pull
         db: Database session
         current_user: Current authenticated user/machine
         
@@ -181,44 +498,89 @@ async def sync_pull(
             detail="Machine not found"
         )
 
+    # Update machine last_sync (coalesced heartbeat, no write on this request)
+    heartbeats.touch(machine)
+
+    # None when the machine has no bill config: the catalog is unversioned
+    # and always served in full.
+    current_version, delta_base = db.query(
+        BillConfig.catalog_version, BillConfig.catalog_delta_base
+    ).filter(
+        BillConfig.machine_id == machine_id
+    ).first() or (None, None)
+
+    etag_version = _parse_catalog_etag(if_none_match)
+    known_version = catalog_version if catalog_version is not None else etag_version
+
+    if current_version is not None:
+        etag = _catalog_etag(current_version)
+        response.headers["ETag"] = etag
+        if etag_version == current_version:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        if known_version == current_version:
+            return {
+                "success": True,
+                "data": SyncPullResponse(
+                    services=[],
+                    machine_status=machine.status,
+                    sync_timestamp=machine.last_sync,
+                    catalog_version=current_version,
+                    is_delta=True,
+                    unchanged=True
+                )
+            }
+
+    # Delta only when the client is behind but not older than delta_base; an
+    # unknown, older or newer version (e.g. config recreated) falls back to
+    # the full catalog.
+    if (
+        current_version is not None and known_version is not None
+        and delta_base <= known_version < current_version
+    ):
+        changed = db.query(Service).filter(
+            Service.machine_id == machine_id,
+            Service.catalog_version > known_version
+        ).all()
+        deleted_ids = db.query(ServiceTombstone.service_id).filter(
+            ServiceTombstone.machine_id == machine_id,
+            ServiceTombstone.catalog_version > known_version
+        ).all()
+
+        services_data = [_service_to_sync_dict(s) for s in changed if s.status == "active"]
+        removed_ids = [str(s.id) for s in changed if s.status != "active"]
+        removed_ids += [str(service_id) for (service_id,) in deleted_ids]
+
+        return {
+            "success": True,
+            "data": SyncPullResponse(
+                services=services_data,
+                machine_status=machine.status,
+                sync_timestamp=machine.last_sync,
+                catalog_version=current_version,
+                is_delta=True,
+                removed_service_ids=removed_ids
+            )
+        }
+
     # Get active services for this machine
     services = db.query(Service).filter(
         Service.machine_id == machine_id,
         Service.status == "active"
     ).all()
     
-    services_data = [
-        {
-            "id": str(s.id),
-            "name": s.name,
-            "price": float(s.price),
-            "status": s.status,
-            "created_at": s.created_at.isoformat(),
-            "updated_at": s.updated_at.isoformat()
-        }
-        for s in services
-    ]
-    
-    # Update machine last_sync
-    machine.last_sync = datetime.now(timezone.utc)
-    
-    try:
-        db.commit()
-    except Exception:
-        db.rollback()
-    
     return {
         "success": True,
         "data": SyncPullResponse(
-            services=services_data,
+            services=[_service_to_sync_dict(s) for s in services],
             machine_status=machine.status,
-            sync_timestamp=machine.last_sync
+            sync_timestamp=machine.last_sync,
+            catalog_version=current_version or 0
         )
     }
 
 
 @router.get("/status/{machine_id}", response_model=SuccessResponse[SyncStatusResponse])
-async def sync_status(
+def sync_status(
     machine_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
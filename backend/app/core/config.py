@@ -1,3 +1,5 @@
+from importlib.metadata import PackageNotFoundError, version
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from typing import List
 
@@ -19,6 +21,11 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Library that verifies JWTs in decode_token: "jose" or "pyjwt" (needs PyJWT
+    # installed; compare them with benchmarks/jwt_decode.py)
+    JWT_BACKEND: str = "jose"
+    # Verified token claims cached until the token's exp (0 disables)
+    JWT_CLAIMS_CACHE_MAX_ENTRIES: int = 10000
     
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:8080,http://localhost:5173"
@@ -45,10 +52,72 @@ class Settings(BaseSettings):
     # override SELF_REGISTER_TOKEN in the environment to use a different value.
     SELF_REGISTER_TOKEN: str = "lcaWo29pNaw"
 
+    # Machine heartbeats (last_sync/status) are buffered and flushed in batches
+    HEARTBEAT_FLUSH_INTERVAL_SECONDS: int = 15
+    # last_sync is only persisted once it has moved by at least this much
+    HEARTBEAT_GRANULARITY_SECONDS: int = 60
+
+    # Machine alerts (offline / maintenance / sync delayed) are evaluated in the background
+    ALERT_EVALUATION_INTERVAL_SECONDS: int = 60
+    # An online machine whose last sync is older than this gets a "Sync Delayed" alert
+    ALERT_SYNC_DELAY_MINUTES: int = 30
+
+    # Authenticated principals (user/machine behind a token) cached per process
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+
+    # bcrypt runs on its own capped pool, off the event loop and request threadpool
+    PASSWORD_HASH_WORKERS: int = 2
+    # Queued + running hash/verify calls before logins fail fast with 503
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 2
+
+    # Bill number block leases (POST /payments/reserve-bill-number with count > 1)
+    BILL_LEASE_MAX_SIZE: int = 200
+    BILL_LEASE_TTL_SECONDS: int = 12 * 60 * 60
+
+    # Streaming exports: rows fetched per round trip, bytes per response chunk
+    EXPORT_FETCH_SIZE: int = 2000
+    EXPORT_CHUNK_BYTES: int = 64 * 1024
+
+    # Background export jobs (POST /analytics/export-jobs)
+    EXPORT_JOB_WORKERS: int = 2
+    # Jobs one tenant may have running at once; the rest wait their turn
+    EXPORT_JOB_TENANT_CONCURRENCY: int = 1
+    # Queued + running jobs one tenant may have before new ones are refused
+    EXPORT_JOB_TENANT_MAX_PENDING: int = 5
+    # Artifact directory; empty means <system temp dir>/billing-exports
+    EXPORT_JOB_DIR: str = ""
+    EXPORT_JOB_TTL_HOURS: int = 24
+    # A running job's worker refreshes heartbeat_at this often; the queue is
+    # swept for abandoned jobs on the same interval
+    EXPORT_JOB_HEARTBEAT_SECONDS: int = 30
+    # A running job whose heartbeat is older than this lost its worker and is re-queued
+    EXPORT_JOB_STALE_SECONDS: int = 120
+
+    # The payment_daily_rollups backfill starts this long after startup, so a
+    # deploy has cut over first (old instances write payments without
+    # rollups), and is retried on the same interval until it completes
+    ROLLUP_BACKFILL_DELAY_SECONDS: int = 300
+
+    # EXPLAIN the registered hot queries at startup and log any sequential scans
+    INDEX_ADVISOR_ON_STARTUP: bool = False
+
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     
+    @field_validator("JWT_BACKEND")
+    @classmethod
+    def jwt_backend_installed(cls, v: str) -> str:
+        """PyJWT is optional (not in requirements.txt); fail at startup, not on the first request."""
+        if v == "pyjwt":
+            try:
+                version("PyJWT")
+            except PackageNotFoundError:
+                raise ValueError("JWT_BACKEND=pyjwt needs PyJWT installed (pip install PyJWT), or use JWT_BACKEND=jose")
+        return v
+
     @property
     def allowed_origins_list(self) -> List[str]:
         """Convert comma-separated origins to list."""
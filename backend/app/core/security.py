@@ -1,8 +1,16 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Tuple
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.logger import logger
 
 # Password hashing context
 # Note: bcrypt has a 72-byte password limit
@@ -37,6 +45,123 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password_truncated)
 
 
+class PasswordHashingBusy(Exception):
+    """The password hashing pool already has PASSWORD_HASH_MAX_PENDING calls in flight."""
+
+
+class PasswordHashingPool:
+    """
+    Size-capped executor for bcrypt.
+
+    Each hash or verify burns tens of milliseconds of CPU. Run inline, a burst
+    of logins (a whole shift of terminals signing in at once) used up the
+    request threadpool and everything else queued behind it. Here at most
+    max_workers bcrypt calls run at once and at most max_pending wait or run;
+    beyond that submit() fails immediately instead of growing the queue.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._peak_pending = 0
+        self._wait_seconds = 0.0
+
+    def submit(self, fn: Callable, *args) -> Future:
+        with self._lock:
+            if self._queued + self._running >= self.max_pending:
+                self._rejected += 1
+                raise PasswordHashingBusy()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+            self._queued += 1
+            self._peak_pending = max(self._peak_pending, self._queued + self._running)
+            executor = self._executor
+        try:
+            return executor.submit(self._run, time.perf_counter(), fn, *args)
+        except RuntimeError:
+            # Executor shut down
+            with self._lock:
+                self._queued -= 1
+            raise
+
+    def _run(self, enqueued_at: float, fn: Callable, *args):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._wait_seconds += time.perf_counter() - enqueued_at
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and counters since startup."""
+        with self._lock:
+            started = self._completed + self._running
+            return {
+                "queued": self._queued,
+                "running": self._running,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "peak_pending": self._peak_pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._wait_seconds / started * 1000, 2) if started else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hashing = PasswordHashingPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+
+
+def _submit_to_hashing_pool(fn: Callable, *args) -> Future:
+    try:
+        return password_hashing.submit(fn, *args)
+    except PasswordHashingBusy:
+        logger.warning(f"🔐 PASSWORD POOL SATURATED | pending={password_hashing.max_pending}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins in progress, please retry shortly",
+            headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+        )
+
+
+async def _run_in_hashing_pool(fn: Callable, *args):
+    return await asyncio.wrap_future(_submit_to_hashing_pool(fn, *args))
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hashing pool. Raises 503 when the pool is saturated."""
+    return await _run_in_hashing_pool(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the hashing pool. Raises 503 when the pool is saturated."""
+    return await _run_in_hashing_pool(get_password_hash, password)
+
+
+def get_password_hash_pooled(password: str) -> str:
+    """
+    get_password_hash_async for plain `def` handlers (already on a threadpool
+    thread): waits for the hashing pool instead of hashing inline, so the
+    cap and the pool stats cover it too. Raises 503 when the pool is saturated.
+    """
+    return _submit_to_hashing_pool(get_password_hash, password).result()
+
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a JWT access token.
@@ -84,6 +209,82 @@ def create_refresh_token(data: Dict[str, Any]) -> str:
     return encoded_jwt
 
 
+def _jose_decoder() -> Callable[[str], Optional[Dict[str, Any]]]:
+    def decode(token: str) -> Optional[Dict[str, Any]]:
+        try:
+            return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            return None
+    return decode
+
+
+def _pyjwt_decoder() -> Callable[[str], Optional[Dict[str, Any]]]:
+    import jwt as pyjwt
+
+    def decode(token: str) -> Optional[Dict[str, Any]]:
+        try:
+            return pyjwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except pyjwt.InvalidTokenError:
+            return None
+    return decode
+
+
+# JWT_BACKEND -> factory of a verifying decoder (claims, or None if invalid/expired).
+# Tokens are always issued with python-jose; both read the same HS256 tokens.
+JWT_BACKENDS: Dict[str, Callable[[], Callable[[str], Optional[Dict[str, Any]]]]] = {
+    "jose": _jose_decoder,
+    "pyjwt": _pyjwt_decoder,
+}
+
+if settings.JWT_BACKEND not in JWT_BACKENDS:
+    raise ValueError(f"JWT_BACKEND must be one of {', '.join(JWT_BACKENDS)}, got {settings.JWT_BACKEND!r}")
+_verify_token = JWT_BACKENDS[settings.JWT_BACKEND]()
+
+
+class VerifiedClaimsCache:
+    """
+    Claims of tokens whose signature has already been checked, keyed by the
+    SHA-256 of the token and kept until the token's own exp. A terminal sends
+    the same token on every call, so after the first request decode_token is
+    a hash and a dict lookup instead of an HMAC check plus JSON parsing.
+    Tokens without exp are never cached. Bounded LRU.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            exp, claims = entry
+            if exp <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+        return dict(claims)
+
+    def put(self, digest: bytes, claims: Dict[str, Any]) -> None:
+        exp = claims.get("exp")
+        if self.max_entries <= 0 or not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._entries[digest] = (float(exp), dict(claims))
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+verified_claims = VerifiedClaimsCache(settings.JWT_CLAIMS_CACHE_MAX_ENTRIES)
+
+
 def decode_token(token: str) -> Optional[Dict[str, Any]]:
     """
     Decode and verify a JWT token.
@@ -94,8 +295,12 @@ def decode_token(token: str) -> Optional[Dict[str, Any]]:
     Returns:
         Decoded token payload or None if invalid
     """
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = verified_claims.get(digest)
+    if payload is not None:
         return payload
-    except JWTError:
-        return None
+
+    payload = _verify_token(token)
+    if payload is not None:
+        verified_claims.put(digest, payload)
+    return payload
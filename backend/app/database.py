@@ -28,6 +28,12 @@ def get_db():
     """
     Dependency function to get database session.
     Yields a database session and ensures it's closed after use.
+
+    Sessions are synchronous, so handlers that use them are declared with
+    plain `def` and FastAPI runs them in its threadpool, keeping the event
+    loop free while a query runs. Handlers that must be `async def` (they
+    await the request body or an HTTP call) push DB work through
+    fastapi.concurrency.run_in_threadpool instead.
     """
     db = SessionLocal()
     try:
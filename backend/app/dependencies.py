@@ -7,12 +7,42 @@ from app.database import get_db
 from app.core.security import decode_token
 from app.models.user import User
 from app.models.machine import Machine
+from app.utils.principal_cache import principals, snapshot
 
 # HTTP Bearer token security scheme
 security = HTTPBearer()
 
 
-async def get_current_user(
+def _load_principal(db: Session, token_type: str, entity_id: str) -> Union[User, Machine]:
+    """Load the user or machine a token refers to, raising 401 if it no longer exists."""
+    # For machine tokens, get machine instead of user
+    if token_type == "machine":
+        machine = db.query(Machine).filter(Machine.id == entity_id).first()
+        if machine is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Machine not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return snapshot(machine)
+    
+    # For access tokens, get user
+    user = db.query(User).filter(User.id == entity_id).first()
+    if user is None:
+        # Fallback: Check if it's a machine (handle mislabeled tokens)
+        machine = db.query(Machine).filter(Machine.id == entity_id).first()
+        if machine:
+            return snapshot(machine)
+
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return snapshot(user)
+
+
+def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> Union[User, Machine]:
@@ -24,7 +54,8 @@ async def get_current_user(
         db: Database session
         
     Returns:
-        Current user or machine object
+        Current user or machine, as a detached snapshot (see
+        app/utils/principal_cache.py) that is not bound to the session
         
     Raises:
         HTTPException: If token is invalid or user/machine not found
@@ -58,30 +89,16 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # For machine tokens, get machine instead of user
-    if token_type == "machine":
-        machine = db.query(Machine).filter(Machine.id == entity_id).first()
-        if machine is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Machine not found",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return machine
+    # Cached snapshot of the user/machine; no database hit on the hot path
+    principal = principals.get(token_type, entity_id)
+    if principal is None:
+        generation = principals.generation()
+        principal = _load_principal(db, token_type, entity_id)
+        principals.put(token_type, entity_id, principal, generation)
     
-    # For access tokens, get user
-    user = db.query(User).filter(User.id == entity_id).first()
-    if user is None:
-        # Fallback: Check if it's a machine (handle mislabeled tokens)
-        machine = db.query(Machine).filter(Machine.id == entity_id).first()
-        if machine:
-            return machine
-
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    if isinstance(principal, Machine):
+        return principal
+    user = principal
     
     # Check if user is active
     if user.is_active != "true":
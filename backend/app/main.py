@@ -5,13 +5,20 @@ from fastapi.exceptions import RequestValidationError
 from sqlalchemy.exc import SQLAlchemyError
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
+import asyncio
 import time
 
 from app.core.config import settings
 from app.core.logger import log_request, log_error
 from app.core.limiter import limiter
+from app.core.security import password_hashing
 from app.api.v1 import api_router
 from app.database import engine, Base
+from app.utils.heartbeat import run_heartbeat_flusher
+from app.utils.alert_evaluator import run_alert_evaluator
+from app.utils.export_jobs import export_jobs, run_export_job_sweeper
+from app.utils.index_advisor import check_hot_queries, ensure_hot_path_indexes, report
+from app.utils.payment_rollups import run_rollup_backfill
 
 # Create FastAPI application
 app = FastAPI(
@@ -114,6 +121,14 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
 
 
+async def build_hot_path_indexes():
+    try:
+        for line in await asyncio.to_thread(ensure_hot_path_indexes, engine):
+            print(line)
+    except Exception as e:
+        print(f"⚠️  Hot path index build skipped: {e}")
+
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
@@ -215,6 +230,41 @@ async def startup_event():
                 except Exception as e:
                     print(f"⚠️  Payment dedup migration skipped: {e}")
 
+            # One unresolved alert per (machine, title): close duplicate open
+            # alerts (keeping the oldest), then add the partial unique index
+            # the alert upserts rely on. Runs once, while the index is missing.
+            alert_indexes = (
+                {ix["name"] for ix in inspector.get_indexes("system_alerts")}
+                if "system_alerts" in existing_tables else set()
+            )
+            if "system_alerts" in existing_tables and "uq_system_alerts_open_machine_title" not in alert_indexes:
+                try:
+                    conn.execute(text("""
+                        UPDATE system_alerts
+                        SET resolved = true, resolved_at = CURRENT_TIMESTAMP
+                        WHERE id IN (
+                            SELECT id FROM (
+                                SELECT id,
+                                       ROW_NUMBER() OVER (
+                                           PARTITION BY machine_id, title
+                                           ORDER BY created_at
+                                       ) AS rn
+                                FROM system_alerts
+                                WHERE resolved = false
+                            ) subq
+                            WHERE rn > 1
+                        )
+                    """))
+                    conn.commit()
+                    conn.execute(text("""
+                        CREATE UNIQUE INDEX IF NOT EXISTS uq_system_alerts_open_machine_title
+                        ON system_alerts(machine_id, title) WHERE resolved = false
+                    """))
+                    conn.commit()
+                    print("✅ Migration: unique index on open system_alerts(machine_id, title)")
+                except Exception as e:
+                    print(f"⚠️  Open alert dedup migration skipped: {e}")
+
             # UPI change requests table
             if "upi_change_requests" not in existing_tables:
                 conn.execute(text("""
@@ -259,11 +309,20 @@ async def startup_event():
                         machine_id UUID NOT NULL REFERENCES machines(id),
                         posid VARCHAR(100) NOT NULL,
                         next_number INTEGER NOT NULL DEFAULT 1,
+                        leased_through INTEGER,
+                        lease_expires_at TIMESTAMPTZ,
                         UNIQUE(machine_id, posid)
                     )
                 """))
                 conn.commit()
                 print("✅ Migration: created bill_counters table")
+            else:
+                counter_cols = {c["name"] for c in inspector.get_columns("bill_counters")}
+                if "leased_through" not in counter_cols:
+                    conn.execute(text("ALTER TABLE bill_counters ADD COLUMN leased_through INTEGER"))
+                    conn.execute(text("ALTER TABLE bill_counters ADD COLUMN lease_expires_at TIMESTAMPTZ"))
+                    conn.commit()
+                    print("✅ Migration: added block lease columns to bill_counters")
 
             # catalog_version on bill_configs
             if "bill_configs" in inspector.get_table_names():
@@ -273,6 +332,80 @@ async def startup_event():
                     conn.commit()
                     print("✅ Migration: added catalog_version to bill_configs")
 
+            # catalog_version on services (delta /sync/pull)
+            service_cols = {c["name"] for c in inspector.get_columns("services")}
+            if "catalog_version" not in service_cols:
+                conn.execute(text("ALTER TABLE services ADD COLUMN catalog_version INTEGER NOT NULL DEFAULT 0"))
+                conn.commit()
+                print("✅ Migration: added catalog_version to services")
+
+            # Delta pulls are only complete from the version at which services
+            # started being versioned: earlier changes and deletions left no
+            # trace, so clients holding an older catalog_version must get the
+            # full catalog. Record that version once per bill config.
+            if "bill_configs" in inspector.get_table_names():
+                bc_cols = {c["name"] for c in inspector.get_columns("bill_configs")}
+                if "catalog_delta_base" not in bc_cols:
+                    conn.execute(text("ALTER TABLE bill_configs ADD COLUMN catalog_delta_base INTEGER NOT NULL DEFAULT 0"))
+                    conn.execute(text("UPDATE bill_configs SET catalog_delta_base = catalog_version"))
+                    conn.commit()
+                    print("✅ Migration: added catalog_delta_base to bill_configs")
+
+            # payments.posid / payments.bill_seq (bill_number split for MAX lookups).
+            # The backfill is a full-table UPDATE, so like the dedup above it only
+            # runs once, when the columns are first added. Run
+            # migrations/005_payment_bill_seq.sql ahead of a deploy to keep it
+            # out of startup on a large table.
+            payment_cols = {c["name"] for c in inspector.get_columns("payments")}
+            if "bill_seq" not in payment_cols:
+                conn.execute(text("ALTER TABLE payments ADD COLUMN posid VARCHAR(100)"))
+                conn.execute(text("ALTER TABLE payments ADD COLUMN bill_seq INTEGER"))
+                conn.commit()
+                if engine.dialect.name == "postgresql":
+                    conn.execute(text("""
+                        UPDATE payments
+                        SET posid = substring(bill_number from '^(.+)/[0-9]{1,9}$'),
+                            bill_seq = CAST(substring(bill_number from '/([0-9]{1,9})$') AS INTEGER)
+                        WHERE bill_number ~ '^.+/[0-9]{1,9}$'
+                    """))
+                else:
+                    from app.utils.bill_numbers import split_bill_number
+                    rows = conn.execute(text("SELECT id, bill_number FROM payments")).all()
+                    updates = []
+                    for payment_id, bill_number in rows:
+                        bill_parts = split_bill_number(bill_number)
+                        if bill_parts:
+                            updates.append({"id": payment_id, "posid": bill_parts[0], "bill_seq": bill_parts[1]})
+                    if updates:
+                        conn.execute(
+                            text("UPDATE payments SET posid = :posid, bill_seq = :bill_seq WHERE id = :id"),
+                            updates
+                        )
+                conn.commit()
+                print("✅ Migration: added posid/bill_seq to payments (backfilled)")
+
+            # report_cache.generation (compare-and-swap store). Entries cached
+            # under the old timestamp check may have raced an invalidation, so
+            # they are dropped and recomputed on demand.
+            if "report_cache" in existing_tables:
+                report_cache_cols = {c["name"] for c in inspector.get_columns("report_cache")}
+                if "generation" not in report_cache_cols:
+                    conn.execute(text("ALTER TABLE report_cache ADD COLUMN generation INTEGER NOT NULL DEFAULT 0"))
+                    conn.execute(text("DELETE FROM report_cache"))
+                    conn.commit()
+                    print("✅ Migration: added generation to report_cache")
+
+            if "export_jobs" in existing_tables:
+                export_job_cols = {c["name"] for c in inspector.get_columns("export_jobs")}
+                if "worker_id" not in export_job_cols:
+                    conn.execute(text("ALTER TABLE export_jobs ADD COLUMN worker_id VARCHAR(100)"))
+                    conn.commit()
+                    print("✅ Migration: added worker_id to export_jobs")
+                if "heartbeat_at" not in export_job_cols:
+                    conn.execute(text("ALTER TABLE export_jobs ADD COLUMN heartbeat_at TIMESTAMP WITH TIME ZONE"))
+                    conn.commit()
+                    print("✅ Migration: added heartbeat_at to export_jobs")
+
             # Superadmin role: ensure SQLEnum allows the new value (Postgres-specific)
             user_cols_info = inspector.get_columns("users")
             role_col = next((c for c in user_cols_info if c["name"] == "role"), None)
@@ -285,11 +418,59 @@ async def startup_event():
                     pass  # SQLite or enum already has the value
 
         print(f"✅ {settings.APP_NAME} v{settings.APP_VERSION} started successfully")
+
+        if settings.INDEX_ADVISOR_ON_STARTUP:
+            findings = await asyncio.to_thread(check_hot_queries, engine)
+            if findings:
+                print("🔍 Index advisor:")
+                report(findings)
     except Exception as e:
         print(f"⚠️  Database connection failed at startup: {e}")
         print("   Server will start but DB-dependent endpoints will fail until the database is reachable.")
     print(f"📚 API Documentation: http://{settings.HOST}:{settings.PORT}/docs")
 
+    # Hot-path composite indexes (migrations/004_hot_path_indexes.sql):
+    # create_all only adds them to brand-new tables, so missing or INVALID
+    # ones are built here, in the background. A concurrent build on a big
+    # table takes minutes and must not hold up binding the port.
+    app.state.index_task = asyncio.create_task(build_hot_path_indexes())
+
+    # Coalesced machine heartbeats (last_sync/status) are flushed from here
+    app.state.heartbeat_task = asyncio.create_task(run_heartbeat_flusher())
+
+    # Machine alerts are generated here, not by GET /dashboard/alerts
+    app.state.alert_task = asyncio.create_task(run_alert_evaluator())
+
+    # payment_daily_rollups is created empty by create_all. The backfill is
+    # not run inline: during a deploy the old instance keeps taking payments
+    # without rollups, so it starts after cut-over, and readers aggregate
+    # payments until it has completed.
+    app.state.rollup_task = asyncio.create_task(run_rollup_backfill())
+
+    # Queued export jobs, and running ones whose worker stopped heartbeating,
+    # go (back) on this process's worker pool
+    app.state.export_job_task = asyncio.create_task(run_export_job_sweeper())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered machine heartbeats and stop background workers before the process exits."""
+    # Unfinished export jobs stay in the table; other processes pick up the
+    # queued ones, and running ones once their heartbeat goes stale
+    export_jobs.shutdown()
+    password_hashing.shutdown()
+    for name in ("alert_task", "index_task", "export_job_task", "rollup_task"):
+        background = getattr(app.state, name, None)
+        if background:
+            background.cancel()
+    task = getattr(app.state, "heartbeat_task", None)
+    if task:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
 
 # Health check endpoint
 @app.get("/health", tags=["Health"])
@@ -300,7 +481,9 @@ async def health_check():
         "data": {
             "status": "healthy",
             "app_name": settings.APP_NAME,
-            "version": settings.APP_VERSION
+            "version": settings.APP_VERSION,
+            # Login backpressure: bcrypt pool queue depth and fast-fail count
+            "password_hashing": password_hashing.stats()
         }
     }
 
@@ -1,11 +1,14 @@
 from app.database import Base
 from app.models.user import User
 from app.models.machine import Machine
-from app.models.service import Service
+from app.models.service import Service, ServiceTombstone
 from app.models.payment import Payment
+from app.models.payment_rollup import PaymentDailyRollup, PaymentRollupBackfill
+from app.models.report_cache import ReportCache
 from app.models.log import Log
 from app.models.alert import SystemAlert
 from app.models.bill_config import BillConfig
 from app.models.location import Location
+from app.models.export_job import ExportJob
 
-__all__ = ["Base", "User", "Machine", "Service", "Payment", "Log", "SystemAlert", "BillConfig", "Location"]
+__all__ = ["Base", "User", "Machine", "Service", "ServiceTombstone", "Payment", "PaymentDailyRollup", "PaymentRollupBackfill", "ReportCache", "Log", "SystemAlert", "BillConfig", "Location", "ExportJob"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Index, Enum as SQLEnum, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
@@ -20,8 +20,19 @@ class SystemAlert(Base):
     System alerts for monitoring machine status and system events.
     
     Alerts can be automatically generated by the system or manually created.
+    A machine has at most one unresolved alert per title (partial unique
+    index; see app/utils/alert_service.py).
     """
     __tablename__ = "system_alerts"
+    __table_args__ = (
+        Index("idx_system_alerts_created_id", "created_at", "id"),
+        Index(
+            "uq_system_alerts_open_machine_title", "machine_id", "title",
+            unique=True,
+            postgresql_where=text("resolved = false"),
+            sqlite_where=text("resolved = 0"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
@@ -40,6 +40,11 @@ class BillConfig(Base):
     toll_free = Column(String(50), nullable=True)
 
     catalog_version = Column(Integer, nullable=False, default=0, server_default='0')
+    # Oldest client catalog_version a delta /sync/pull can be computed from.
+    # Set to catalog_version when service versioning was introduced: services
+    # changed or deleted before then carry no version / tombstone, so clients
+    # holding an older version get the full catalog instead.
+    catalog_delta_base = Column(Integer, nullable=False, default=0, server_default='0')
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 
@@ -17,6 +17,11 @@ class BillCounter(Base):
     machine_id = Column(UUID(as_uuid=True), ForeignKey("machines.id"), nullable=False)
     posid = Column(String(100), nullable=False)  # e.g., "WSSBI-AP"
     next_number = Column(Integer, nullable=False, default=1)  # Next bill number to use
+    # Last number of the most recent block lease and when that lease lapses.
+    # While it is live, an admin reset of machines.bill_counter cannot move
+    # the counter back into numbers a terminal may still be spending.
+    leased_through = Column(Integer, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
 
     def __repr__(self):
         return f"<BillCounter {self.posid} machine={self.machine_id} next={self.next_number}>"
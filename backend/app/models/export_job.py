@@ -0,0 +1,44 @@
+from sqlalchemy import Column, String, BigInteger, DateTime, Text, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime, timezone
+import uuid
+
+from app.database import Base
+
+
+class ExportJob(Base):
+    """
+    A background data export (see app/utils/export_jobs.py).
+
+    `tenant_id` is the admin account the export belongs to (the owning admin
+    for machine tokens); concurrency limits and visibility are per tenant.
+    status: queued -> running -> done | failed. A running job carries the
+    process running it (`worker_id`) and that process's last sign of life
+    (`heartbeat_at`); see requeue_pending_jobs.
+    """
+
+    __tablename__ = "export_jobs"
+    __table_args__ = (
+        Index("idx_export_jobs_tenant_status", "tenant_id", "status"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    requested_by = Column(String(100), nullable=False)
+    export_type = Column(String(50), nullable=False)
+    format = Column(String(20), nullable=False)
+    start_date = Column(DateTime(timezone=True), nullable=True)
+    end_date = Column(DateTime(timezone=True), nullable=True)
+    machine_id = Column(UUID(as_uuid=True), nullable=True)
+    status = Column(String(20), nullable=False, default="queued")
+    artifact_key = Column(String(255), nullable=True)
+    artifact_size = Column(BigInteger, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    worker_id = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<ExportJob {self.export_type}.{self.format} {self.status}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Numeric, DateTime, Text, ForeignKey, Integer
+from sqlalchemy import Column, String, Numeric, DateTime, Text, ForeignKey, Integer, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -11,6 +11,9 @@ class Machine(Base):
     """Machine model representing a billing terminal/client."""
     
     __tablename__ = "machines"
+    __table_args__ = (
+        Index("idx_machines_user_status", "user_id", "status"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey
+from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, Index, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -12,10 +12,21 @@ class Payment(Base):
     """Payment model representing a transaction."""
 
     __tablename__ = "payments"
+    __table_args__ = (
+        # Keyset pagination: newest-first per machine, and across machines
+        Index("idx_payments_machine_created_id", "machine_id", "created_at", "id"),
+        Index("idx_payments_created_id", "created_at", "id"),
+        Index("idx_payments_status_created", "status", "created_at"),
+        # MAX(bill_seq) per series is an index-only lookup
+        Index("idx_payments_machine_posid_seq", "machine_id", "posid", "bill_seq"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     machine_id = Column(UUID(as_uuid=True), ForeignKey("machines.id"), nullable=False)
     bill_number = Column(String(100), nullable=False)
+    # bill_number split as POSID/bill_seq; NULL when it doesn't follow that format
+    posid = Column(String(100), nullable=True)
+    bill_seq = Column(Integer, nullable=True)
     amount = Column(Numeric(10, 2), nullable=False)
     method = Column(String(50), nullable=False)  # UPI, Card, Cash
     status = Column(String(50), nullable=False, default="success")  # success, pending, failed
@@ -0,0 +1,53 @@
+from sqlalchemy import Column, String, Integer, Numeric, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime, timezone
+import uuid
+
+from app.database import Base
+
+
+class PaymentDailyRollup(Base):
+    """
+    Per-day payment totals for one machine, method and status.
+
+    `day` is the IST calendar date of the payments. Rows are kept in step
+    with `payments` by the write paths (see app/utils/payment_rollups.py), so
+    dashboards and long-range analytics read days instead of transactions.
+    """
+
+    __tablename__ = "payment_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("machine_id", "day", "method", "status", name="uq_payment_rollup_key"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    machine_id = Column(UUID(as_uuid=True), ForeignKey("machines.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    method = Column(String(50), nullable=False)
+    status = Column(String(50), nullable=False)
+    txn_count = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(14, 2), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<PaymentDailyRollup {self.day} {self.method}/{self.status} x{self.txn_count}>"
+
+
+class PaymentRollupBackfill(Base):
+    """
+    Progress of the one-time rollup backfill (a single row, id = 1).
+
+    IST days up to `backfilled_through` have been rebuilt from `payments`;
+    once `completed_at` is set the rollups cover the whole history and
+    readers stop falling back to `payments`.
+    """
+
+    __tablename__ = "payment_rollup_backfill"
+
+    id = Column(Integer, primary_key=True, default=1)
+    backfilled_through = Column(Date, nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<PaymentRollupBackfill through={self.backfilled_through} completed={self.completed_at is not None}>"
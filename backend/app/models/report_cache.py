@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, Date, DateTime, Integer, Text, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+
+from app.database import Base
+
+
+class ReportCache(Base):
+    """
+    A rendered end-of-day report for a closed IST day (see
+    app/utils/report_cache.py).
+
+    `scope` is "machine:<id>" for a single-machine report or "all" for the
+    unfiltered admin view. `generation` goes up on every invalidation; a
+    report may only be stored at the generation that was current when its
+    computation started. A row whose payload is NULL is an invalidation
+    marker: payments for that day last changed at `invalidated_at`.
+    """
+
+    __tablename__ = "report_cache"
+    __table_args__ = (
+        UniqueConstraint("scope", "day", "report_type", name="uq_report_cache_key"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    scope = Column(String(100), nullable=False)
+    day = Column(Date, nullable=False)
+    report_type = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=True)
+    generation = Column(Integer, nullable=False, default=0, server_default='0')
+    computed_at = Column(DateTime(timezone=True), nullable=True)
+    invalidated_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<ReportCache {self.scope} {self.day} {self.report_type}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey
+from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, Integer, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -10,14 +10,34 @@ class Service(Base):
     """Service model representing a catalog item/service for a machine."""
     
     __tablename__ = "services"
+    __table_args__ = (
+        Index("idx_services_machine_status", "machine_id", "status"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     machine_id = Column(UUID(as_uuid=True), ForeignKey("machines.id", ondelete="CASCADE"), nullable=False)
     name = Column(String(255), nullable=False)
     price = Column(Numeric(10, 2), nullable=False)
     status = Column(String(50), nullable=False, default="active")  # active, inactive
+    # BillConfig.catalog_version at which this service last changed (delta /sync/pull)
+    catalog_version = Column(Integer, nullable=False, default=0, server_default='0')
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     def __repr__(self):
         return f"<Service {self.name} - ₹{self.price}>"
+
+
+class ServiceTombstone(Base):
+    """Record of a deleted service so delta catalog pulls can report the removal."""
+
+    __tablename__ = "service_tombstones"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    machine_id = Column(UUID(as_uuid=True), ForeignKey("machines.id", ondelete="CASCADE"), nullable=False, index=True)
+    service_id = Column(UUID(as_uuid=True), nullable=False)
+    catalog_version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ServiceTombstone {self.service_id} v{self.catalog_version}>"
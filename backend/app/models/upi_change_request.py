@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -8,6 +8,9 @@ from app.database import Base
 
 class UpiChangeRequest(Base):
     __tablename__ = "upi_change_requests"
+    __table_args__ = (
+        Index("idx_upi_change_requests_status_created", "status", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     machine_id = Column(UUID(as_uuid=True), ForeignKey('machines.id'), nullable=False)
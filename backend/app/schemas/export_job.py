@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Literal
+from datetime import datetime
+
+
+class ExportJobCreate(BaseModel):
+    """Schema for queuing a background export"""
+    export_type: Literal["payments", "machines", "logs"]
+    format: Literal["csv", "excel", "parquet", "arrow"] = "csv"
+    start_date: Optional[datetime] = Field(None, description="Only rows created at or after this time")
+    end_date: Optional[datetime] = Field(None, description="Only rows created at or before this time")
+    machine_id: Optional[str] = Field(None, description="Limit payments/logs to one machine")
+
+
+class ExportJobResponse(BaseModel):
+    """Schema for export job status"""
+    id: str
+    export_type: str
+    format: str
+    status: Literal["queued", "running", "done", "failed"]
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    machine_id: Optional[str] = None
+    artifact_size: Optional[int] = Field(None, description="Size in bytes once the job is done")
+    download_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -30,13 +30,17 @@ class BillNumberReserveRequest(BaseModel):
     """Schema for reserving the next bill number from the server."""
     machine_id: str = Field(..., description="Machine UUID")
     posid: Optional[str] = Field(None, max_length=50, description="POS ID prefix, e.g. WSSBI")
+    count: int = Field(1, ge=1, description="Numbers to lease as one consecutive block (1 = single reservation)")
 
 
 class BillNumberReserveResponse(BaseModel):
     """Schema for a server-issued bill number reservation."""
-    bill_number: str
+    bill_number: str  # first number of the reservation
     number: int
     posid: str
+    lease_start: int
+    lease_end: int  # inclusive
+    lease_expires_at: Optional[datetime] = None  # block leases only; spend numbers before this
 
 
 class PaymentUpdate(BaseModel):
@@ -2,7 +2,7 @@
 Pydantic schemas for Sync endpoints.
 """
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 
@@ -45,11 +45,34 @@ class SyncPushResponse(BaseModel):
     latest_bill_counter: int = 0
 
 
+class SyncStreamPushResponse(BaseModel):
+    """Schema for streaming (NDJSON) sync push response."""
+    synced_payments: int
+    failed_payments: int
+    committed_batches: int
+    sync_timestamp: datetime
+    latest_bill_counter: int = 0
+    # Last committed bill per POSID, e.g. {"WSSBI": "WSSBI/678"} — resume after it.
+    cursor: Dict[str, str] = {}
+
+
+class SyncPushCursorResponse(BaseModel):
+    """Schema for the resumable push cursor of a machine."""
+    machine_id: str
+    cursor: Dict[str, str] = {}
+
+
 class SyncPullResponse(BaseModel):
     """Schema for sync pull response."""
     services: List[dict]
     machine_status: str
     sync_timestamp: datetime
+    catalog_version: int = 0
+    # True when `services` only holds what changed since the client's version
+    is_delta: bool = False
+    # True when the client's version is current and `services` is empty
+    unchanged: bool = False
+    removed_service_ids: List[str] = []
 
 
 class SyncStatusResponse(BaseModel):
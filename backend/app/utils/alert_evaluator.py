@@ -0,0 +1,124 @@
+"""
+Scheduled machine alert evaluation.
+
+GET /dashboard/alerts used to walk every machine of the admin on each
+dashboard refresh and run create_alert_if_not_exists() per machine, so a
+read endpoint did O(machines) queries and commits. Alerts are now evaluated
+here instead, every ALERT_EVALUATION_INTERVAL_SECONDS, for all machines at
+once, and the endpoint only reads unresolved alerts.
+
+One pass is set-based:
+
+    1. one SELECT over machines computes, with a CASE, the alert each machine
+       should currently have (offline, maintenance, sync delayed) and returns
+       only machines that have one
+    2. one SELECT of the open alerts with those titles
+    3. the difference is written back through the batch alert_service
+       calls: missing alerts in one INSERT ... ON CONFLICT DO NOTHING, alerts
+       whose condition has cleared in one UPDATE per title
+
+Only the titles in AUTO_ALERT_TITLES are managed here; alerts with other
+titles are left alone.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import case, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logger import logger, log_error
+from app.database import SessionLocal
+from app.models.alert import AlertSeverity, SystemAlert
+from app.models.machine import Machine
+from app.utils.alert_service import create_alerts_if_not_exist, resolve_alerts
+
+MACHINE_OFFLINE = "Machine Offline"
+MAINTENANCE_MODE = "Maintenance Mode"
+SYNC_DELAYED = "Sync Delayed"
+
+AUTO_ALERT_TITLES = (MACHINE_OFFLINE, MAINTENANCE_MODE, SYNC_DELAYED)
+
+_SEVERITY = {
+    MACHINE_OFFLINE: AlertSeverity.CRITICAL,
+    MAINTENANCE_MODE: AlertSeverity.WARNING,
+    SYNC_DELAYED: AlertSeverity.WARNING,
+}
+
+
+def _message(title: str, last_sync: Optional[datetime], now: datetime) -> str:
+    if last_sync is not None and last_sync.tzinfo is None:
+        last_sync = last_sync.replace(tzinfo=timezone.utc)
+    if title == MACHINE_OFFLINE:
+        if last_sync is None:
+            return "Machine has never synced"
+        return f"Machine offline for {int((now - last_sync).total_seconds() // 3600)}h"
+    if title == MAINTENANCE_MODE:
+        return "Machine is in maintenance mode"
+    return f"Last sync was {int((now - last_sync).total_seconds() // 60)}m ago"
+
+
+def evaluate_alerts(db: Session, now: Optional[datetime] = None) -> Tuple[int, int]:
+    """
+    Bring the automatic alerts in line with current machine liveness.
+    Commits. Returns (alerts created, alerts resolved).
+    """
+    now = now or datetime.now(timezone.utc)
+    sync_cutoff = now - timedelta(minutes=settings.ALERT_SYNC_DELAY_MINUTES)
+
+    expected_title = case(
+        (Machine.status == "offline", MACHINE_OFFLINE),
+        (Machine.status == "maintenance", MAINTENANCE_MODE),
+        ((Machine.status == "online") & (Machine.last_sync < sync_cutoff), SYNC_DELAYED),
+    )
+    expected = db.execute(
+        select(Machine.id, expected_title.label("title"), Machine.last_sync).where(expected_title.isnot(None))
+    ).all()
+    open_alerts = db.execute(
+        select(SystemAlert.machine_id, SystemAlert.title).where(
+            SystemAlert.resolved == False,
+            SystemAlert.title.in_(AUTO_ALERT_TITLES),
+            SystemAlert.machine_id.isnot(None),
+        )
+    ).all()
+
+    wanted = {(machine_id, title): last_sync for machine_id, title, last_sync in expected}
+    existing = set(open_alerts)
+
+    new_alerts = [
+        (machine_id, title, _SEVERITY[title], _message(title, last_sync, now))
+        for (machine_id, title), last_sync in wanted.items()
+        if (machine_id, title) not in existing
+    ]
+    cleared: Dict[str, Set] = {}
+    for machine_id, title in existing:
+        if (machine_id, title) not in wanted:
+            cleared.setdefault(title, set()).add(machine_id)
+
+    created = create_alerts_if_not_exist(db, new_alerts)
+    resolved = sum(
+        resolve_alerts(db, machine_ids, title_filter=title)
+        for title, machine_ids in cleared.items()
+    )
+    return created, resolved
+
+
+def _evaluate_once() -> Tuple[int, int]:
+    db = SessionLocal()
+    try:
+        return evaluate_alerts(db)
+    finally:
+        db.close()
+
+
+async def run_alert_evaluator() -> None:
+    """Background task: evaluate machine alerts now and then every ALERT_EVALUATION_INTERVAL_SECONDS."""
+    while True:
+        try:
+            created, resolved = await asyncio.to_thread(_evaluate_once)
+            if created or resolved:
+                logger.info(f"🚨 ALERT EVALUATION | created={created} | resolved={resolved}")
+        except Exception as e:
+            log_error("Alert evaluation failed", e)
+        await asyncio.sleep(settings.ALERT_EVALUATION_INTERVAL_SECONDS)
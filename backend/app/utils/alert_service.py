@@ -1,9 +1,115 @@
+"""
+Machine alert writes.
+
+A machine has at most one unresolved alert per title. This is enforced by
+the partial unique index uq_system_alerts_open_machine_title on
+(machine_id, title) WHERE resolved = false, not by a SELECT before the
+INSERT, so concurrent callers (API processes, the alert evaluator, the
+heartbeat flush) can never open the same alert twice. Creation is
+INSERT ... ON CONFLICT DO NOTHING against that index, and resolution is one
+UPDATE for any number of machines.
+
+The batch functions take many alerts / machines at once; the single-machine
+helpers are thin wrappers over them. All of them commit.
+"""
+import uuid
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import any_, bindparam, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.models.alert import SystemAlert, AlertSeverity
 
+# (machine_id, title, severity, message)
+AlertSpec = Tuple[str, str, AlertSeverity, str]
+
+
+def create_alerts_if_not_exist(db: Session, alerts: Iterable[AlertSpec]) -> int:
+    """
+    Open many alerts with one INSERT. An alert is skipped when its machine
+    already has an unresolved alert with the same title.
+    Returns the number of alerts created (0 if the insert failed).
+    """
+    now = datetime.now(timezone.utc)
+    rows = {}
+    for machine_id, title, severity, message in alerts:
+        rows.setdefault((str(machine_id), title), {
+            "id": uuid.uuid4(),
+            "machine_id": machine_id,
+            "title": title,
+            "message": message,
+            "severity": severity,
+            "resolved": False,
+            "created_at": now,
+            "updated_at": now,
+        })
+    if not rows:
+        return 0
+
+    table = SystemAlert.__table__
+    stmt = pg_insert(table).values(list(rows.values())).on_conflict_do_nothing(
+        index_elements=["machine_id", "title"],
+        index_where=table.c.resolved == False,
+    )
+    try:
+        count = db.execute(stmt).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        return 0
+
+    return count
+
+
+def _machine_id_matches(db: Session, machine_ids: List[str]):
+    """
+    machine_id = ANY(:machine_ids) on PostgreSQL: one array parameter, so the
+    statement is the same whatever the number of machines. IN elsewhere.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return SystemAlert.machine_id == any_(bindparam(
+            "machine_ids",
+            [uuid.UUID(machine_id) for machine_id in machine_ids],
+            type_=ARRAY(UUID(as_uuid=True)),
+        ))
+    return SystemAlert.machine_id.in_(machine_ids)
+
+
+def resolve_alerts(
+    db: Session,
+    machine_ids: Iterable[str],
+    title_filter: Optional[str] = None,
+    resolved_by_id: Optional[str] = None,
+) -> int:
+    """
+    Resolve the open alerts of many machines (optionally only those with one
+    title) with a single UPDATE. Returns the count of alerts resolved.
+    """
+    machine_ids = list({str(machine_id) for machine_id in machine_ids})
+    if not machine_ids:
+        return 0
+
+    values = {"resolved": True, "resolved_at": datetime.now(timezone.utc)}
+    if resolved_by_id:
+        values["resolved_by"] = resolved_by_id
+
+    try:
+        stmt = update(SystemAlert).where(
+            _machine_id_matches(db, machine_ids),
+            SystemAlert.resolved == False,
+        )
+        if title_filter:
+            stmt = stmt.where(SystemAlert.title == title_filter)
+        count = db.execute(stmt.values(**values).execution_options(synchronize_session=False)).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        return 0
+
+    return count
+
 
 def create_alert_if_not_exists(
     db: Session,
@@ -16,32 +122,13 @@ def create_alert_if_not_exists(
     Create a DB alert only if there is no identical unresolved alert for this machine.
     Returns the existing or newly created alert, or None if machine_id is invalid.
     """
-    existing = db.query(SystemAlert).filter(
+    create_alerts_if_not_exist(db, [(machine_id, title, severity, message)])
+    return db.query(SystemAlert).filter(
         SystemAlert.machine_id == machine_id,
         SystemAlert.title == title,
         SystemAlert.resolved == False,
     ).first()
 
-    if existing:
-        return existing
-
-    alert = SystemAlert(
-        machine_id=machine_id,
-        severity=severity,
-        title=title,
-        message=message,
-        resolved=False,
-    )
-    db.add(alert)
-    try:
-        db.commit()
-        db.refresh(alert)
-    except Exception:
-        db.rollback()
-        return None
-
-    return alert
-
 
 def resolve_machine_alerts(
     db: Session,
@@ -53,28 +140,5 @@ def resolve_machine_alerts(
     Resolve all open alerts for a machine (optionally filtered by title).
     Returns the count of alerts resolved.
     """
-    query = db.query(SystemAlert).filter(
-        SystemAlert.machine_id == machine_id,
-        SystemAlert.resolved == False,
-    )
-    if title_filter:
-        query = query.filter(SystemAlert.title == title_filter)
-
-    alerts = query.all()
-    if not alerts:
-        return 0
-
-    now = datetime.now(timezone.utc)
-    for alert in alerts:
-        alert.resolved = True
-        alert.resolved_at = now
-        if resolved_by_id:
-            alert.resolved_by = resolved_by_id
-
-    try:
-        db.commit()
-    except Exception:
-        db.rollback()
-        return 0
+    return resolve_alerts(db, [machine_id], title_filter, resolved_by_id)
 
-    return len(alerts)
@@ -0,0 +1,55 @@
+"""
+Bill number parsing and sequence lookups.
+
+Bill numbers look like "POSID/123". Payments store the two halves in their
+own columns (payments.posid, payments.bill_seq) so the highest used number
+for a series is a single index-only MAX() instead of a scan that regex-parses
+every bill the machine ever recorded.
+"""
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.payment import Payment
+
+# bill_seq is a 32-bit INTEGER, like bill_counters.next_number
+_MAX_SEQ_DIGITS = 9
+
+
+def split_bill_number(bill_number: Optional[str]) -> Optional[Tuple[str, int]]:
+    """
+    Split "POSID/123" into ("POSID", 123). The POSID is everything before the
+    last slash. Returns None when the bill number does not follow the format.
+    """
+    if not bill_number:
+        return None
+    posid, sep, digits = bill_number.rpartition("/")
+    if not sep or not posid or not digits.isdecimal():
+        return None
+    digits = digits.lstrip("0") or "0"
+    if len(digits) > _MAX_SEQ_DIGITS:
+        return None
+    return posid, int(digits)
+
+
+def normalize_bill_number(bill_number: str) -> str:
+    """
+    Normalize POSID/000123 → POSID/123.
+    Different app versions format the numeric suffix differently (some zero-pad to 6 digits,
+    newer ones don't). Stripping leading zeros before storing means both formats map to the
+    same string, so the unique index on (machine_id, bill_number) catches cross-device
+    duplicates even when two phones are logged into the same machine account.
+    """
+    posid, sep, digits = bill_number.rpartition("/")
+    if not sep or not posid or not digits.isdecimal():
+        return bill_number
+    return f"{posid}/{digits.lstrip('0') or '0'}"
+
+
+def max_used_bill_number(db: Session, machine_id, posid: str) -> int:
+    """Highest bill number already recorded for this machine+POSID (0 if none)."""
+    return db.query(func.max(Payment.bill_seq)).filter(
+        Payment.machine_id == machine_id,
+        Payment.posid == posid,
+    ).scalar() or 0
@@ -0,0 +1,41 @@
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from app.models.bill_config import BillConfig
+from app.models.service import Service, ServiceTombstone
+
+
+def bump_catalog_version(db: Session, machine_id) -> int:
+    """
+    Advance the machine's catalog version and return the new value.
+    The bill config row is locked so concurrent edits get distinct versions.
+    Returns 0 when the machine has no bill config — its catalog is then
+    unversioned and /sync/pull always serves it in full.
+    Does not commit; the caller commits together with the service change.
+    """
+    bill_cfg = db.query(BillConfig).filter(
+        BillConfig.machine_id == machine_id
+    ).with_for_update().first()
+    if not bill_cfg:
+        return 0
+
+    bill_cfg.catalog_version = (bill_cfg.catalog_version or 0) + 1
+    return bill_cfg.catalog_version
+
+
+def record_service_tombstone(db: Session, service: Service) -> Optional[ServiceTombstone]:
+    """
+    Bump the catalog version for a service that is about to be deleted and
+    leave a tombstone at that version. Does not commit.
+    """
+    version = bump_catalog_version(db, service.machine_id)
+    if not version:
+        return None
+
+    tombstone = ServiceTombstone(
+        machine_id=service.machine_id,
+        service_id=service.id,
+        catalog_version=version,
+    )
+    db.add(tombstone)
+    return tombstone
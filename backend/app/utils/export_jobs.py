@@ -0,0 +1,313 @@
+"""
+Background export jobs.
+
+Large exports through GET /analytics/export/{type} hold a request worker for
+as long as the download runs and can outlast the proxy timeout. An export
+job does the same work (app/utils/exports.py) on a small worker pool instead
+and writes the result to an artifact store; the client polls the job and
+downloads the finished file, resuming with Range requests if needed.
+
+Scheduling is per tenant (the owning admin account): at most
+EXPORT_JOB_TENANT_CONCURRENCY of a tenant's jobs run at once and the rest
+wait in that tenant's own queue, so one very large export cannot occupy
+every worker while other tenants' jobs sit behind it.
+
+The job row is the source of truth. A job is claimed with a conditional
+queued -> running UPDATE, so a queued job is only ever run once even if
+several processes submit it. The claim records the worker (WORKER_ID) and
+the job's heartbeat, which that worker refreshes while it runs; a running
+job goes back to the queue only once its heartbeat is older than
+EXPORT_JOB_STALE_SECONDS, so a deploy overlap never re-runs a job whose
+old process is still working on it.
+"""
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, Iterable, Optional, Set
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logger import logger, log_error
+from app.database import SessionLocal
+from app.models.export_job import ExportJob
+from app.utils.exports import EXPORT_FORMATS, export_statement, stream_export
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Identifies this process on the jobs it claims
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LocalArtifactStore:
+    """
+    Artifacts as files in one directory. Stands in for an object store: jobs
+    only ever refer to an artifact by key, so swapping in a bucket later only
+    touches this class.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def write(self, key: str, chunks: Iterable[bytes]) -> int:
+        """Write chunks to a temp file and move it into place; returns the size."""
+        os.makedirs(self.root, exist_ok=True)
+        final_path = self.path(key)
+        partial_path = f"{final_path}.part"
+        size = 0
+        try:
+            with open(partial_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(partial_path, final_path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        return size
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+artifact_store = LocalArtifactStore(
+    settings.EXPORT_JOB_DIR or os.path.join(tempfile.gettempdir(), "billing-exports")
+)
+
+
+class JobHeartbeat:
+    """
+    Refreshes a claimed job's heartbeat_at from a side thread every
+    EXPORT_JOB_HEARTBEAT_SECONDS until the block exits, so a long query or
+    write still shows the job as owned.
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"export-job-heartbeat-{job_id}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self) -> None:
+        while not self._stop.wait(settings.EXPORT_JOB_HEARTBEAT_SECONDS):
+            db = SessionLocal()
+            try:
+                db.query(ExportJob).filter(
+                    ExportJob.id == self.job_id,
+                    ExportJob.status == "running",
+                    ExportJob.worker_id == WORKER_ID
+                ).update({"heartbeat_at": datetime.now(timezone.utc)}, synchronize_session=False)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                log_error(f"Export job {self.job_id} heartbeat failed", e)
+            finally:
+                db.close()
+
+
+def run_export_job(job_id: str) -> None:
+    """Produce one job's artifact and record the outcome on the job row."""
+    db = SessionLocal()
+    try:
+        now = datetime.now(timezone.utc)
+        claimed = db.query(ExportJob).filter(
+            ExportJob.id == job_id,
+            ExportJob.status == "queued"
+        ).update(
+            {"status": "running", "started_at": now, "worker_id": WORKER_ID, "heartbeat_at": now},
+            synchronize_session=False
+        )
+        db.commit()
+        if not claimed:
+            return
+
+        job = db.query(ExportJob).filter(ExportJob.id == job_id).first()
+        extension, _ = EXPORT_FORMATS[job.format]
+        key = f"{job.id}.{extension}"
+        stmt = export_statement(
+            job.export_type, job.start_date, job.end_date,
+            str(job.machine_id) if job.machine_id else None,
+            owner_id=job.tenant_id
+        )
+        try:
+            with JobHeartbeat(job_id):
+                size = artifact_store.write(key, stream_export(stmt, job.export_type, job.format))
+            job.status = "done"
+            job.artifact_key = key
+            job.artifact_size = size
+        except Exception as e:
+            log_error(f"Export job {job_id} failed", e)
+            job.status = "failed"
+            job.error = str(e)[:500]
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        logger.info(f"📦 EXPORT JOB {job.status.upper()} | {job.export_type}.{job.format} | job={job_id} | bytes={job.artifact_size or 0}")
+    except Exception as e:
+        db.rollback()
+        log_error(f"Export job {job_id} could not be recorded", e)
+    finally:
+        db.close()
+
+
+class ExportJobRunner:
+    """Worker pool with a per-tenant cap on concurrently running jobs."""
+
+    def __init__(self, max_workers: int, per_tenant: int):
+        self.max_workers = max_workers
+        self.per_tenant = per_tenant
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._running: Dict[str, int] = {}
+        self._waiting: Dict[str, Deque[str]] = {}
+        self._submitted: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="export-job")
+        return self._executor
+
+    def submit(self, job_id, tenant_id) -> bool:
+        """
+        Start the job now if the tenant has a free slot, otherwise queue it
+        behind the tenant's others. Returns False if this runner already
+        has the job.
+        """
+        job_id, tenant_id = str(job_id), str(tenant_id)
+        with self._lock:
+            if job_id in self._submitted:
+                return False
+            self._submitted.add(job_id)
+            if self._running.get(tenant_id, 0) >= self.per_tenant:
+                self._waiting.setdefault(tenant_id, deque()).append(job_id)
+                return True
+            self._running[tenant_id] = self._running.get(tenant_id, 0) + 1
+            pool = self._pool()
+        pool.submit(self._run, job_id, tenant_id)
+        return True
+
+    def _run(self, job_id: str, tenant_id: str) -> None:
+        try:
+            run_export_job(job_id)
+        finally:
+            with self._lock:
+                self._submitted.discard(job_id)
+                waiting = self._waiting.get(tenant_id)
+                next_job = waiting.popleft() if waiting else None
+                if waiting is not None and not waiting:
+                    del self._waiting[tenant_id]
+                if next_job is None:
+                    self._running[tenant_id] -= 1
+                    if not self._running[tenant_id]:
+                        del self._running[tenant_id]
+                pool = self._executor
+            # The tenant's slot passes straight to its next job
+            if next_job is not None and pool is not None:
+                pool.submit(self._run, next_job, tenant_id)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._executor = self._executor, None
+            self._waiting.clear()
+            self._running.clear()
+            self._submitted.clear()
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+export_jobs = ExportJobRunner(settings.EXPORT_JOB_WORKERS, settings.EXPORT_JOB_TENANT_CONCURRENCY)
+
+
+def active_job_count(db: Session, tenant_id) -> int:
+    return db.query(ExportJob).filter(
+        ExportJob.tenant_id == tenant_id,
+        ExportJob.status.in_(ACTIVE_STATUSES)
+    ).count()
+
+
+def purge_expired_jobs(db: Session) -> int:
+    """Delete finished jobs (and their artifacts) older than EXPORT_JOB_TTL_HOURS. Commits."""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.EXPORT_JOB_TTL_HOURS)
+    expired = db.query(ExportJob).filter(
+        ExportJob.status.in_(("done", "failed")),
+        ExportJob.finished_at < cutoff
+    ).all()
+    if not expired:
+        return 0
+    try:
+        for job in expired:
+            if job.artifact_key:
+                artifact_store.delete(job.artifact_key)
+            db.delete(job)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(expired)
+
+
+def requeue_pending_jobs() -> int:
+    """
+    Hand abandoned jobs back to the queue and pick up queued ones.
+
+    A running job goes back to queued only if its heartbeat is older than
+    EXPORT_JOB_STALE_SECONDS (its worker died or was shut down); jobs
+    another live process is running are left alone. Only queued jobs are
+    submitted here, and the conditional claim in run_export_job keeps a job
+    queued by several processes from running twice. Returns the number of
+    jobs newly submitted to this process's pool.
+    """
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.EXPORT_JOB_STALE_SECONDS)
+    db = SessionLocal()
+    try:
+        db.query(ExportJob).filter(
+            ExportJob.status == "running",
+            or_(ExportJob.heartbeat_at.is_(None), ExportJob.heartbeat_at < stale_before)
+        ).update(
+            {"status": "queued", "started_at": None, "worker_id": None, "heartbeat_at": None},
+            synchronize_session=False
+        )
+        db.commit()
+        pending = db.query(ExportJob.id, ExportJob.tenant_id).filter(
+            ExportJob.status == "queued"
+        ).order_by(ExportJob.created_at).all()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    return sum(export_jobs.submit(job_id, tenant_id) for job_id, tenant_id in pending)
+
+
+async def run_export_job_sweeper() -> None:
+    """Background task: re-queue abandoned export jobs now and then every EXPORT_JOB_HEARTBEAT_SECONDS."""
+    while True:
+        try:
+            requeued = await asyncio.to_thread(requeue_pending_jobs)
+            if requeued:
+                logger.info(f"📦 EXPORT JOBS RE-QUEUED | jobs={requeued}")
+        except Exception as e:
+            log_error("Export job sweep failed", e)
+        await asyncio.sleep(settings.EXPORT_JOB_HEARTBEAT_SECONDS)
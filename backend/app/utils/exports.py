@@ -0,0 +1,353 @@
+"""
+Streaming data exports.
+
+Exports used to load the whole result with query.all() and render the file
+into one StringIO before sending a byte, so a year of payments held every
+ORM object plus the full CSV text in memory at once. Here an export is a
+generator pipeline instead:
+
+    export_statement()  -> a Core SELECT of just the exported columns
+    iter_export_rows()  -> rows fetched EXPORT_FETCH_SIZE at a time
+                           (yield_per; a server-side cursor on PostgreSQL)
+    csv_chunks()        -> rows encoded incrementally into ~EXPORT_CHUNK_BYTES
+                           byte chunks
+
+StreamingResponse pulls one chunk at a time and only asks for the next once
+the previous one has been sent, so a slow client slows the fetch down instead
+of letting output pile up in memory. Peak memory is one fetch batch plus one
+chunk, whatever the export size.
+
+The row iterator opens its own session: the response body is produced after
+the handler has returned, so it must not depend on the request's session.
+
+Besides CSV, exports can be written as typed columnar files for pandas and
+other dataframe tools, which load them without any text parsing:
+
+    parquet / arrow  -> Arrow record batches built from each fetch batch:
+                        decimal amounts, timestamptz (UTC), dictionary-encoded
+                        (categorical) method/status/type columns. Needs pyarrow.
+    excel            -> .xlsx via openpyxl's write-only mode, which spools rows
+                        to a temp file instead of keeping cells in memory. An
+                        xlsx is a zip archive, so its bytes are sent once the
+                        last row is written.
+"""
+import csv
+import io
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.log import Log
+from app.models.machine import Machine
+from app.models.payment import Payment
+
+# (header, model attribute, kind) — kind decides how a value is rendered
+ExportColumn = Tuple[str, str, str]
+
+EXPORT_MODELS = {
+    "payments": Payment,
+    "machines": Machine,
+    "logs": Log,
+}
+
+EXPORT_COLUMNS: Dict[str, List[ExportColumn]] = {
+    "payments": [
+        ("ID", "id", "uuid"),
+        ("Machine ID", "machine_id", "uuid"),
+        ("Amount", "amount", "decimal"),
+        ("Method", "method", "category"),
+        ("Status", "status", "category"),
+        ("Created At", "created_at", "timestamp"),
+    ],
+    "machines": [
+        ("ID", "id", "uuid"),
+        ("Name", "name", "text"),
+        ("Location", "location", "text"),
+        ("Status", "status", "category"),
+        ("Online Collection", "online_collection", "decimal"),
+        ("Offline Collection", "offline_collection", "decimal"),
+        ("Last Sync", "last_sync", "timestamp"),
+    ],
+    "logs": [
+        ("ID", "id", "uuid"),
+        ("Machine ID", "machine_id", "uuid"),
+        ("Action", "action", "text"),
+        ("Details", "details", "text"),
+        ("Type", "type", "category"),
+        ("Created At", "created_at", "timestamp"),
+    ],
+}
+
+
+def export_statement(
+    export_type: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    machine_id: Optional[str] = None,
+    owner_id=None
+):
+    """
+    SELECT the exported columns, filtered by date range and machine where the
+    type has them. owner_id limits the export to that admin's machines.
+    """
+    model = EXPORT_MODELS[export_type]
+    stmt = select(*[getattr(model, attr) for _, attr, _ in EXPORT_COLUMNS[export_type]])
+    if export_type == "machines":
+        if owner_id:
+            stmt = stmt.where(Machine.user_id == owner_id)
+        if machine_id:
+            stmt = stmt.where(Machine.id == machine_id)
+        return stmt
+    if owner_id:
+        stmt = stmt.where(model.machine_id.in_(select(Machine.id).where(Machine.user_id == owner_id)))
+    if start:
+        stmt = stmt.where(model.created_at >= start)
+    if end:
+        stmt = stmt.where(model.created_at <= end)
+    if machine_id:
+        stmt = stmt.where(model.machine_id == machine_id)
+    return stmt
+
+
+def iter_export_rows(stmt, fetch_size: Optional[int] = None) -> Iterator:
+    """Yield result rows, fetching them in batches on a dedicated session."""
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=fetch_size or settings.EXPORT_FETCH_SIZE))
+        for row in result:
+            yield row
+    finally:
+        db.close()
+
+
+def _csv_value(value, kind: str):
+    if value is None:
+        return ""
+    if kind == "uuid":
+        return str(value)
+    if kind == "decimal":
+        return float(value)
+    if kind == "timestamp":
+        return value.isoformat()
+    return value
+
+
+def csv_row(row, columns: List[ExportColumn]) -> list:
+    """Render one export row as CSV cells."""
+    return [_csv_value(value, kind) for value, (_, _, kind) in zip(row, columns)]
+
+
+def csv_chunks(rows: Iterable[list], header: Optional[list] = None, chunk_bytes: Optional[int] = None) -> Iterator[bytes]:
+    """Encode CSV rows incrementally, yielding UTF-8 chunks of roughly chunk_bytes."""
+    chunk_bytes = chunk_bytes or settings.EXPORT_CHUNK_BYTES
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_csv_export(stmt, export_type: str) -> Iterator[bytes]:
+    """Full CSV pipeline for one export type: fetch, render, encode."""
+    columns = EXPORT_COLUMNS[export_type]
+    rows = (csv_row(row, columns) for row in iter_export_rows(stmt))
+    return csv_chunks(rows, header=[header for header, _, _ in columns])
+
+
+# format -> (file extension, media type)
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+def require_export_format(export_format: str) -> None:
+    """
+    Fail before the response starts if the format's library is missing
+    (an error raised mid-stream would only truncate the download).
+    """
+    try:
+        if export_format in ("parquet", "arrow"):
+            import pyarrow  # noqa: F401
+        elif export_format == "excel":
+            import openpyxl  # noqa: F401
+    except ImportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"{e.name} is not installed on the server"
+        )
+
+
+def _batches(rows: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that collects bytes until they are drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+class _CategoryEncoder:
+    """
+    Dictionary-encodes one column across batches. The dictionary only ever
+    grows, so every batch's dictionary extends the previous one and Arrow
+    writers can emit deltas instead of replacing it.
+    """
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def encode(self, pa, column_values: list):
+        indices = []
+        for value in column_values:
+            if value is None:
+                indices.append(None)
+                continue
+            if value not in self._index:
+                self._index[value] = len(self.values)
+                self.values.append(value)
+            indices.append(self._index[value])
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, type=pa.int32()), pa.array(self.values, type=pa.string())
+        )
+
+
+def _arrow_type(pa, model, attr: str, kind: str):
+    if kind == "decimal":
+        column_type = getattr(model, attr).type
+        return pa.decimal128(column_type.precision or 18, column_type.scale or 2)
+    if kind == "timestamp":
+        return pa.timestamp("us", tz="UTC")
+    if kind == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+
+def _arrow_batches(pa, stmt, export_type: str):
+    """Yield (schema, record batch) for each fetch batch of the export."""
+    model = EXPORT_MODELS[export_type]
+    columns = EXPORT_COLUMNS[export_type]
+    types = [_arrow_type(pa, model, attr, kind) for _, attr, kind in columns]
+    schema = pa.schema([pa.field(header, arrow_type) for (header, _, _), arrow_type in zip(columns, types)])
+    encoders = {i: _CategoryEncoder() for i, (_, _, kind) in enumerate(columns) if kind == "category"}
+
+    batches = _batches(iter_export_rows(stmt), settings.EXPORT_FETCH_SIZE)
+    yield schema, None
+    for batch in batches:
+        arrays = []
+        for i, ((_, _, kind), arrow_type) in enumerate(zip(columns, types)):
+            values = [row[i] for row in batch]
+            if kind == "uuid":
+                values = [str(v) if v is not None else None for v in values]
+            if i in encoders:
+                arrays.append(encoders[i].encode(pa, values))
+            else:
+                arrays.append(pa.array(values, type=arrow_type))
+        yield schema, pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def stream_arrow_export(stmt, export_type: str, export_format: str) -> Iterator[bytes]:
+    """Parquet (one row group per fetch batch) or Arrow IPC file, streamed batch by batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    for schema, batch in _arrow_batches(pa, stmt, export_type):
+        if writer is None:
+            if export_format == "parquet":
+                writer = pq.ParquetWriter(sink, schema, compression="snappy")
+            else:
+                writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+        if batch is not None:
+            writer.write_batch(batch)
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    writer.close()
+    yield sink.drain()
+
+
+def _excel_value(value, kind: str):
+    if value is None:
+        return None
+    if kind == "uuid":
+        return str(value)
+    if kind == "timestamp":
+        # Excel has no time zones: write UTC wall time
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.replace(tzinfo=None)
+    return value
+
+
+def stream_excel_export(stmt, export_type: str) -> Iterator[bytes]:
+    """Write-only .xlsx: rows spool to disk while written, then the file is streamed out."""
+    import openpyxl
+
+    columns = EXPORT_COLUMNS[export_type]
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=export_type.capitalize())
+    sheet.append([header for header, _, _ in columns])
+    for row in iter_export_rows(stmt):
+        sheet.append([_excel_value(value, kind) for value, (_, _, kind) in zip(row, columns)])
+
+    with tempfile.TemporaryFile() as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(settings.EXPORT_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+def stream_export(stmt, export_type: str, export_format: str) -> Iterator[bytes]:
+    """Byte stream of the export in the requested format (see EXPORT_FORMATS)."""
+    if export_format == "csv":
+        return stream_csv_export(stmt, export_type)
+    if export_format == "excel":
+        return stream_excel_export(stmt, export_type)
+    return stream_arrow_export(stmt, export_type, export_format)
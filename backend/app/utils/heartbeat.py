@@ -0,0 +1,163 @@
+"""
+Coalesced machine heartbeats.
+
+Terminals report liveness on nearly every call (/auth/me, /sync/pull,
+/sync/push, machine-login). Writing machines.last_sync/status on each of
+those keeps a constant stream of row locks on the machines table, so
+liveness is recorded here in memory and flushed in one batched UPDATE
+every HEARTBEAT_FLUSH_INTERVAL_SECONDS.
+
+A heartbeat is only kept when it changes something worth persisting: a
+status transition, or last_sync moving by at least
+HEARTBEAT_GRANULARITY_SECONDS. Everything else is dropped on the spot.
+
+Admins change machine status directly (maintenance, offline) and discard the
+pending heartbeat, but a flush may already have taken it. Each heartbeat
+therefore remembers the status it was based on, and the flush only writes
+rows still in that status (or already in the buffered one), so a buffered
+"online" never overwrites a status an admin set in the meantime.
+"""
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, or_, select, update
+
+from app.core.config import settings
+from app.core.logger import logger, log_error
+from app.database import SessionLocal
+from app.models.machine import Machine
+from app.utils.alert_service import resolve_alerts
+from app.utils.principal_cache import principals
+
+
+class HeartbeatBuffer:
+    """Thread-safe buffer of pending (status, last_sync, based-on status) per machine."""
+
+    def __init__(self, granularity_seconds: int):
+        self.granularity = timedelta(seconds=granularity_seconds)
+        self._pending: Dict[str, Tuple[str, datetime, str]] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, machine: Machine, status: Optional[str] = None, now: Optional[datetime] = None) -> datetime:
+        """
+        Record that a machine is alive, optionally with a new status
+        (None keeps the current one, including a still-buffered transition).
+        The values are also set on the passed instance so the current
+        response reflects them, but nothing is written to the database here.
+
+        Returns the heartbeat timestamp.
+        """
+        now = now or datetime.now(timezone.utc)
+        persisted_status = machine.status
+        persisted_sync = machine.last_sync
+        if persisted_sync is not None and persisted_sync.tzinfo is None:
+            persisted_sync = persisted_sync.replace(tzinfo=timezone.utc)
+
+        machine_id = str(machine.id)
+        with self._lock:
+            buffered = self._pending.get(machine_id)
+            if status is None:
+                status = buffered[0] if buffered else persisted_status
+
+            worth_persisting = (
+                buffered is not None
+                or status != persisted_status
+                or persisted_sync is None
+                or now - persisted_sync >= self.granularity
+            )
+            if worth_persisting:
+                # The first buffered heartbeat fixes the status the flush expects
+                prev_status = buffered[2] if buffered else persisted_status
+                self._pending[machine_id] = (status, now, prev_status)
+
+        # Reflect on the loaded instance only; the session is never committed
+        # for this, so the row stays untouched until the next flush.
+        machine.status = status
+        machine.last_sync = now
+        return now
+
+    def discard(self, machine_id: str) -> None:
+        """Drop a pending heartbeat (admin changed status, machine deleted)."""
+        with self._lock:
+            self._pending.pop(str(machine_id), None)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        Write all pending heartbeats in one batched UPDATE and resolve open
+        alerts for machines that came back online. A row whose status changed
+        since its heartbeat was buffered (other than to the buffered status)
+        is left alone. Returns heartbeats flushed.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        rows = [
+            {"b_id": machine_id, "b_status": status, "b_last_sync": last_sync, "b_prev_status": prev_status}
+            for machine_id, (status, last_sync, prev_status) in pending.items()
+        ]
+        online_ids = [row["b_id"] for row in rows if row["b_status"] == "online"]
+
+        db = SessionLocal()
+        try:
+            # One executemany; machines deleted or re-statused by an admin
+            # meanwhile simply match no row
+            machines = Machine.__table__
+            db.execute(
+                update(machines)
+                .where(
+                    machines.c.id == bindparam("b_id"),
+                    or_(
+                        machines.c.status == bindparam("b_prev_status"),
+                        machines.c.status == bindparam("b_status"),
+                    ),
+                )
+                .values(status=bindparam("b_status"), last_sync=bindparam("b_last_sync")),
+                rows
+            )
+            db.commit()
+            # Cached machine principals carry status/last_sync
+            principals.invalidate(pending.keys())
+            if online_ids:
+                # Only machines the flush actually left online
+                online_ids = [
+                    str(machine_id) for (machine_id,) in db.execute(
+                        select(machines.c.id).where(machines.c.id.in_(online_ids), machines.c.status == "online")
+                    ).all()
+                ]
+                resolve_alerts(db, online_ids)
+        except Exception as e:
+            db.rollback()
+            log_error("Heartbeat flush failed", e)
+            # Put them back unless a newer heartbeat arrived meanwhile
+            with self._lock:
+                for machine_id, value in pending.items():
+                    self._pending.setdefault(machine_id, value)
+            return 0
+        finally:
+            db.close()
+
+        return len(rows)
+
+
+heartbeats = HeartbeatBuffer(settings.HEARTBEAT_GRANULARITY_SECONDS)
+
+
+async def run_heartbeat_flusher() -> None:
+    """Background task: flush the heartbeat buffer periodically, and once more on shutdown."""
+    try:
+        while True:
+            await asyncio.sleep(settings.HEARTBEAT_FLUSH_INTERVAL_SECONDS)
+            flushed = await asyncio.to_thread(heartbeats.flush)
+            if flushed:
+                logger.debug(f"💓 HEARTBEAT FLUSH | machines={flushed}")
+    except asyncio.CancelledError:
+        heartbeats.flush()
+        raise
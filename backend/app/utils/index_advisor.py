@@ -0,0 +1,256 @@
+"""
+Index advisor for the hot query shapes.
+
+HOT_PATH_INDEXES is the index pack the API relies on (built by
+ensure_hot_path_indexes() in a background task after startup, and by
+migrations/004_hot_path_indexes.sql). HOT_QUERIES registers the query
+shapes those indexes exist for. check_hot_queries() runs EXPLAIN on each one
+with sequential scans disabled: if the planner still picks a Seq Scan, no
+usable index exists for that shape, which is exactly the regression to catch
+before it reaches production (small dev tables would otherwise always seq
+scan and hide the problem).
+
+PostgreSQL only. Run it from the backend directory:
+
+    python -m app.utils.index_advisor [--ensure-indexes]
+
+Exits non-zero when any hot query falls back to a sequential scan or a hot
+path index is INVALID, so it can gate CI. --ensure-indexes first builds
+missing indexes and rebuilds invalid ones. Set INDEX_ADVISOR_ON_STARTUP=true
+to log the same report on boot.
+"""
+import json
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import inspect, text
+
+# (table, index name, columns) — keep in sync with the models' __table_args__
+HOT_PATH_INDEXES = [
+    ("payments", "idx_payments_machine_created_id", "machine_id, created_at, id"),
+    ("payments", "idx_payments_created_id", "created_at, id"),
+    ("payments", "idx_payments_status_created", "status, created_at"),
+    ("payments", "idx_payments_machine_posid_seq", "machine_id, posid, bill_seq"),
+    ("logs", "idx_logs_machine_created_id", "machine_id, created_at, id"),
+    ("machines", "idx_machines_user_status", "user_id, status"),
+    ("services", "idx_services_machine_status", "machine_id, status"),
+    ("upi_change_requests", "idx_upi_change_requests_status_created", "status, created_at"),
+    ("system_alerts", "idx_system_alerts_created_id", "created_at, id"),
+    ("audit_logs", "idx_audit_logs_created_id", "created_at, id"),
+]
+
+# name -> SQL, mirroring what the endpoints generate
+HOT_QUERIES: Dict[str, str] = {
+    "payments_by_machine_recent": """
+        SELECT id, bill_number, amount, method, status, created_at FROM payments
+        WHERE machine_id = :machine_id AND created_at >= :since
+        ORDER BY created_at DESC, id DESC LIMIT 50
+    """,
+    "payments_bill_lookup": """
+        SELECT id FROM payments WHERE machine_id = :machine_id AND bill_number = :bill_number
+    """,
+    "payments_max_bill_seq": """
+        SELECT max(bill_seq) FROM payments WHERE machine_id = :machine_id AND posid = :posid
+    """,
+    "payments_all_recent": """
+        SELECT id, machine_id, amount, created_at FROM payments
+        WHERE created_at >= :since ORDER BY created_at DESC, id DESC LIMIT 50
+    """,
+    "payments_by_status_range": """
+        SELECT count(*) FROM payments
+        WHERE status = :status AND created_at >= :since AND created_at < :until
+    """,
+    "rollups_by_machine_days": """
+        SELECT day, sum(amount), sum(txn_count) FROM payment_daily_rollups
+        WHERE machine_id = :machine_id AND day >= :first_day GROUP BY day
+    """,
+    "logs_by_machine_recent": """
+        SELECT id, action, type, created_at FROM logs
+        WHERE machine_id = :machine_id
+        ORDER BY created_at DESC, id DESC LIMIT 50
+    """,
+    "machines_by_owner_status": """
+        SELECT id, name FROM machines WHERE user_id = :user_id AND status = :status
+    """,
+    "services_active_for_machine": """
+        SELECT id, name, price FROM services WHERE machine_id = :machine_id AND status = :status
+    """,
+    "upi_requests_pending_queue": """
+        SELECT id, machine_id, new_upi_id, created_at FROM upi_change_requests
+        WHERE status = :status ORDER BY created_at DESC LIMIT 50
+    """,
+    "alerts_open_for_owner": """
+        SELECT id, title, severity, created_at FROM system_alerts
+        WHERE resolved = false
+          AND machine_id IN (SELECT id FROM machines WHERE user_id = :user_id)
+        ORDER BY created_at DESC LIMIT 5
+    """,
+    "audit_logs_recent": """
+        SELECT id, action, created_at FROM audit_logs ORDER BY created_at DESC, id DESC LIMIT 50
+    """,
+}
+
+
+def _sample_params() -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "machine_id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "bill_number": "POS/1",
+        "posid": "POS",
+        "status": "success",
+        "since": now - timedelta(days=30),
+        "until": now,
+        "first_day": (now - timedelta(days=30)).date(),
+    }
+
+
+def _seq_scanned_relations(plan: dict) -> List[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name", "?"))
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scanned_relations(child))
+    return found
+
+
+# Serializes index builds across instances (a deploy briefly runs two)
+_INDEX_BUILD_LOCK = "SELECT pg_try_advisory_lock(hashtext('hot_path_indexes'))"
+_INDEX_BUILD_UNLOCK = "SELECT pg_advisory_unlock(hashtext('hot_path_indexes'))"
+
+
+def _pg_index_states(conn) -> Dict[str, Tuple[bool, bool]]:
+    """
+    index name -> (indisvalid, being built) for the hot path indexes present.
+    A failed CREATE INDEX CONCURRENTLY leaves its index behind as INVALID:
+    present by name, never used by the planner. An index still being built
+    concurrently is INVALID too, hence the pg_stat_progress_create_index check.
+    """
+    rows = conn.execute(text("""
+        SELECT c.relname, i.indisvalid,
+               EXISTS (SELECT 1 FROM pg_stat_progress_create_index p WHERE p.index_relid = c.oid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = ANY(:names)
+    """), {"names": [name for _, name, _ in HOT_PATH_INDEXES]}).all()
+    return {name: (valid, building) for name, valid, building in rows}
+
+
+def invalid_hot_path_indexes(engine) -> List[str]:
+    """Hot path indexes left INVALID by a failed concurrent build (PostgreSQL only)."""
+    if engine.dialect.name != "postgresql":
+        return []
+    with engine.connect() as conn:
+        return [
+            name for name, (valid, building) in _pg_index_states(conn).items()
+            if not valid and not building
+        ]
+
+
+def ensure_hot_path_indexes(engine) -> List[str]:
+    """
+    Create the missing HOT_PATH_INDEXES and rebuild INVALID ones. Returns
+    one line per index built or failed.
+
+    On PostgreSQL indexes are built CONCURRENTLY so payment writes are never
+    blocked, under an advisory lock so only one instance builds at a time;
+    if another instance holds it, this returns without doing anything.
+    Slow on big tables: run it off the startup path.
+    """
+    postgres = engine.dialect.name == "postgresql"
+    concurrently = "CONCURRENTLY " if postgres else ""
+    done = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if postgres and not conn.execute(text(_INDEX_BUILD_LOCK)).scalar():
+            return done
+        try:
+            tables = set(inspect(conn).get_table_names())
+            if postgres:
+                states = _pg_index_states(conn)
+            else:
+                states = {
+                    ix["name"]: (True, False)
+                    for table in tables for ix in inspect(conn).get_indexes(table)
+                }
+            for table, index_name, columns in HOT_PATH_INDEXES:
+                if table not in tables:
+                    continue
+                valid, building = states.get(index_name, (None, False))
+                if valid or building:
+                    continue
+                try:
+                    if valid is False:
+                        conn.execute(text(f"DROP INDEX {concurrently}IF EXISTS {index_name}"))
+                    conn.execute(text(
+                        f"CREATE INDEX {concurrently}IF NOT EXISTS {index_name} ON {table}({columns})"
+                    ))
+                    action = "rebuilt invalid" if valid is False else "created"
+                    done.append(f"✅ Index {index_name} on {table}({columns}) {action}")
+                except Exception as e:
+                    done.append(f"⚠️  Index {index_name} skipped: {e}")
+        finally:
+            if postgres:
+                conn.execute(text(_INDEX_BUILD_UNLOCK))
+    return done
+
+
+def check_hot_queries(engine) -> List[dict]:
+    """
+    EXPLAIN every registered hot query and return one finding per query:
+    {"query": name, "seq_scans": [relation, ...], "error": str | None}.
+    Returns an empty list on non-PostgreSQL databases.
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+
+    params = _sample_params()
+    findings = []
+    with engine.connect() as conn:
+        for name, sql in HOT_QUERIES.items():
+            # Per-query params: the pending queue filters on a UPI request status
+            query_params = dict(params, status="pending") if "upi_change_requests" in sql else params
+            trans = conn.begin()
+            try:
+                conn.execute(text("SET LOCAL enable_seqscan = off"))
+                raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), query_params).scalar()
+                plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+                findings.append({"query": name, "seq_scans": _seq_scanned_relations(plan), "error": None})
+            except Exception as e:
+                findings.append({"query": name, "seq_scans": [], "error": str(e)})
+            finally:
+                trans.rollback()
+    return findings
+
+
+def report(findings: List[dict]) -> int:
+    """Print findings; returns the number of problem queries."""
+    problems = 0
+    for finding in findings:
+        if finding["error"]:
+            problems += 1
+            print(f"⚠️  {finding['query']}: EXPLAIN failed: {finding['error']}")
+        elif finding["seq_scans"]:
+            problems += 1
+            print(f"⚠️  {finding['query']}: sequential scan on {', '.join(finding['seq_scans'])}")
+        else:
+            print(f"✅ {finding['query']}: index scan")
+    return problems
+
+
+if __name__ == "__main__":
+    from app.database import engine
+
+    if engine.dialect.name != "postgresql":
+        print(f"ℹ️  Index advisor needs PostgreSQL (got {engine.dialect.name}); nothing to check")
+        sys.exit(0)
+    if "--ensure-indexes" in sys.argv[1:]:
+        print("🔧 Building missing / invalid hot path indexes...")
+        for line in ensure_hot_path_indexes(engine):
+            print(line)
+    invalid = invalid_hot_path_indexes(engine)
+    for index_name in invalid:
+        print(f"⚠️  {index_name}: INVALID (failed concurrent build); rerun with --ensure-indexes")
+    print("🔍 Checking hot query plans...")
+    sys.exit(1 if report(check_hot_queries(engine)) or invalid else 0)
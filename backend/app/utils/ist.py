@@ -0,0 +1,68 @@
+"""
+IST (Asia/Kolkata) calendar helpers.
+
+Payments are stored in UTC, but every business "day", "week" and "month" in
+reports and dashboards is an IST calendar period. These helpers convert in
+Python and build the equivalent SQL expressions, so grouping can happen in
+the database.
+"""
+from datetime import date, datetime, timezone
+
+import pytz
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+IST = pytz.timezone('Asia/Kolkata')
+
+
+def ist_date(dt: datetime) -> date:
+    """IST calendar date of a stored (UTC) timestamp."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(IST).date()
+
+
+def ist_day_start_utc(day: date) -> datetime:
+    """UTC instant at which the given IST calendar date begins."""
+    return IST.localize(datetime(day.year, day.month, day.day)).astimezone(timezone.utc)
+
+
+def ist_date_expr(db: Session, column):
+    """SQL expression for the IST calendar date of a timestamptz column."""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone('Asia/Kolkata', column))
+    # SQLite (dev): timestamps are stored as naive UTC strings
+    return func.date(column, '+5 hours', '+30 minutes')
+
+
+def ist_period_expr(db: Session, column, grain: str):
+    """
+    SQL expression for the first IST date of the day/week/month containing a
+    timestamptz column. Weeks start on Monday.
+    """
+    if grain == "day":
+        return ist_date_expr(db, column)
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.date_trunc(grain, func.timezone('Asia/Kolkata', column)))
+    shifted = func.datetime(column, '+5 hours', '+30 minutes')
+    if grain == "week":
+        return func.date(shifted, 'weekday 0', '-6 days')
+    return func.date(shifted, 'start of month')
+
+
+def period_start(day: date, grain: str) -> date:
+    """Python twin of ist_period_expr for an IST date."""
+    if grain == "week":
+        return date.fromordinal(day.toordinal() - day.weekday())
+    if grain == "month":
+        return day.replace(day=1)
+    return day
+
+
+def period_label(start, grain: str) -> str:
+    """Display key for a period: YYYY-MM-DD for days/weeks (week start), YYYY-MM for months."""
+    if isinstance(start, str):
+        start = date.fromisoformat(start[:10])
+    elif isinstance(start, datetime):
+        start = start.date()
+    return start.strftime('%Y-%m') if grain == "month" else start.isoformat()
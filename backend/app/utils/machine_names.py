@@ -0,0 +1,37 @@
+"""
+Bulk machine display-name lookups.
+
+List endpoints show a machine name next to each row. Resolving them one row
+at a time costs a query per row; resolve_machine_names() does it with a single
+IN query and remembers the answers on the session, which lives exactly as
+long as the request (see app.database.get_db). Later lookups in the same
+request, for the same ids, then cost nothing.
+"""
+from typing import Dict, Iterable
+
+from sqlalchemy.orm import Session
+
+from app.models.machine import Machine
+
+_CACHE_KEY = "machine_names"
+
+
+def resolve_machine_names(db: Session, machine_ids: Iterable, use_cache: bool = True) -> Dict[str, str]:
+    """
+    Map str(machine_id) -> name for the given ids in one query. Ids with no
+    machine are left out, so callers pick their own fallback with .get().
+    """
+    wanted = {str(mid) for mid in machine_ids if mid is not None}
+    cache: Dict[str, str] = db.info.setdefault(_CACHE_KEY, {}) if use_cache else {}
+
+    missing = [mid for mid in wanted if mid not in cache]
+    if missing:
+        for mid, name in db.query(Machine.id, Machine.name).filter(Machine.id.in_(missing)).all():
+            cache[str(mid)] = name
+
+    return {mid: cache[mid] for mid in wanted if mid in cache}
+
+
+def resolve_machine_name(db: Session, machine_id, default: str = "Unknown") -> str:
+    """Single-id convenience wrapper around resolve_machine_names."""
+    return resolve_machine_names(db, [machine_id]).get(str(machine_id), default)
@@ -0,0 +1,96 @@
+"""
+Keyset (cursor) pagination for newest-first listings.
+
+OFFSET pagination makes the database walk and discard every row before the
+requested page, so deep pages of payments/logs get slower as history grows.
+Keyset pagination instead seeks straight to the last row seen using the
+(created_at, id) composite indexes, so every page costs the same.
+
+Cursors are opaque to clients: a base64url-encoded JSON blob holding the
+boundary row's (created_at, id) and the direction to move in. Endpoints
+still accept the legacy `page` parameter; a cursor takes precedence.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+
+def encode_cursor(created_at: datetime, row_id, direction: str = "next") -> str:
+    """Build an opaque cursor pointing just past the given row."""
+    payload = {"t": created_at.isoformat(), "id": str(row_id), "d": direction}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID, str]:
+    """Parse a cursor from encode_cursor. Raises 400 on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        direction = payload.get("d", "next")
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        return datetime.fromisoformat(payload["t"]), uuid.UUID(payload["id"]), direction
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def paginate_keyset(
+    query,
+    created_col,
+    id_col,
+    limit: int,
+    cursor: Optional[str] = None,
+    page: int = 1
+) -> Tuple[list, Optional[str], Optional[str]]:
+    """
+    Fetch one newest-first page of `query` ordered by (created_col, id_col).
+
+    With a cursor, seeks past the boundary row in the cursor's direction.
+    Without one, falls back to OFFSET for the requested `page` so existing
+    clients keep working, but still hands back cursors for the next hop.
+
+    Returns (rows, next_cursor, prev_cursor); a cursor is None when there is
+    nothing further in that direction.
+    """
+    key = tuple_(created_col, id_col)
+
+    if cursor:
+        created_at, row_id, direction = decode_cursor(cursor)
+        if direction == "prev":
+            # Walk towards newer rows, then flip back to newest-first
+            rows = (
+                query.filter(key > tuple_(created_at, row_id))
+                .order_by(created_col.asc(), id_col.asc())
+                .limit(limit + 1)
+                .all()
+            )
+            has_newer = len(rows) > limit
+            rows = rows[:limit][::-1]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if rows else None
+            prev_cursor = encode_cursor(rows[0].created_at, rows[0].id, "prev") if rows and has_newer else None
+            return rows, next_cursor, prev_cursor
+
+        query = query.filter(key < tuple_(created_at, row_id))
+        has_newer = True
+    else:
+        has_newer = page > 1
+
+    ordered = query.order_by(created_col.desc(), id_col.desc())
+    if not cursor and page > 1:
+        ordered = ordered.offset((page - 1) * limit)
+    rows = ordered.limit(limit + 1).all()
+
+    has_older = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if rows and has_older else None
+    prev_cursor = encode_cursor(rows[0].created_at, rows[0].id, "prev") if rows and has_newer else None
+    return rows, next_cursor, prev_cursor
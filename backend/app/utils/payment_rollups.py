@@ -0,0 +1,328 @@
+"""
+Daily payment rollups (payment_daily_rollups).
+
+Every write that adds, removes or moves a payment also applies a delta to
+the (machine_id, IST day, method, status) rollup row in the same
+transaction, so the rollups commit or roll back together with the payment.
+Readers that only need per-day totals (dashboards, month/year analytics)
+scan days instead of transactions. A delta that lands on an already closed
+IST day also invalidates that day's cached reports (app/utils/report_cache.py).
+
+rebuild_rollups() recomputes any IST date range from `payments`. Use it to
+repair drift (e.g. after manual SQL edits):
+
+    python -m app.utils.payment_rollups --start 2026-01-01 --end 2026-01-31 [--machine-id <uuid>]
+
+The one-time backfill of the existing history runs by itself: every
+instance starts run_rollup_backfill(), which waits ROLLUP_BACKFILL_DELAY_SECONDS
+so the deploy has cut over (instances running code older than the rollups
+take payments without writing rollups), then rebuilds the history in
+chunks under an advisory lock, recording its progress in
+payment_rollup_backfill so an interrupted backfill resumes where it
+stopped. `--all` runs the same backfill by hand. Until it completes,
+rollups_complete() is False and readers aggregate `payments` instead.
+
+On PostgreSQL a rebuild and the delta writers coordinate through
+transaction-scoped advisory locks, one per machine plus one for "all
+machines". Writers take them shared, a rebuild exclusive, so a rebuild
+never reads payments a writer has yet to commit and never deletes rollup
+rows under a writer's delta.
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logger import logger, log_error
+from app.database import SessionLocal
+from app.models.payment import Payment
+from app.models.payment_rollup import PaymentDailyRollup, PaymentRollupBackfill
+from app.utils.ist import IST, ist_date, ist_date_expr, ist_day_start_utc
+from app.utils.report_cache import closed_days_by_machine, invalidate_closed_days
+
+RollupKey = Tuple[uuid.UUID, date, str, str]
+
+# Advisory lock keys: (namespace, hashtext(machine id)), with ALL_MACHINES
+# standing for a rebuild of every machine.
+_LOCK_NAMESPACE = "hashtext('payment_daily_rollups')"
+_ALL_MACHINES = "*"
+
+# Serializes the history backfill across instances (a deploy briefly runs two)
+_BACKFILL_LOCK = "SELECT pg_try_advisory_lock(hashtext('payment_rollup_backfill'))"
+_BACKFILL_UNLOCK = "SELECT pg_advisory_unlock(hashtext('payment_rollup_backfill'))"
+# IST days rebuilt per transaction; writers wait on each chunk, not the whole history
+BACKFILL_CHUNK_DAYS = 31
+
+# Set once payment_rollup_backfill says complete; it never goes back
+_backfill_complete = False
+
+
+def _lock_rollups(db: Session, machine_ids: Iterable, exclusive: bool) -> None:
+    """
+    Take the rollup advisory locks for these machines (and the all-machines
+    key) until the end of the transaction. In sorted order, so concurrent
+    lockers cannot deadlock. No-op outside PostgreSQL.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    lock = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+    for key in sorted({str(machine_id) for machine_id in machine_ids}):
+        db.execute(text(f"SELECT {lock}({_LOCK_NAMESPACE}, hashtext(:key))"), {"key": key})
+
+
+class RollupDelta:
+    """Accumulates count/amount changes per rollup key before they are applied."""
+
+    def __init__(self):
+        self.changes: Dict[RollupKey, list] = {}
+
+    def add(self, machine_id, created_at: datetime, method: str, status: str, amount, sign: int = 1) -> None:
+        if not isinstance(machine_id, uuid.UUID):
+            machine_id = uuid.UUID(str(machine_id))
+        key = (machine_id, ist_date(created_at), method, status)
+        entry = self.changes.setdefault(key, [0, Decimal("0")])
+        entry[0] += sign
+        entry[1] += sign * Decimal(str(amount))
+
+    def add_payment(self, payment: Payment, sign: int = 1) -> None:
+        self.add(payment.machine_id, payment.created_at, payment.method, payment.status, payment.amount, sign)
+
+    def apply(self, db: Session) -> None:
+        """Upsert all accumulated deltas in one statement. Does not commit."""
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "machine_id": machine_id,
+                "day": day,
+                "method": method,
+                "status": status,
+                "txn_count": count,
+                "amount": amount,
+                "updated_at": datetime.now(timezone.utc),
+            }
+            for (machine_id, day, method, status), (count, amount) in self.changes.items()
+            if count or amount
+        ]
+        if not rows:
+            return
+        # Waits while a rebuild of these machines is running
+        _lock_rollups(db, [_ALL_MACHINES], exclusive=False)
+        _lock_rollups(db, {row["machine_id"] for row in rows}, exclusive=False)
+        invalidate_closed_days(db, closed_days_by_machine(
+            (row["machine_id"], row["day"]) for row in rows
+        ))
+        table = PaymentDailyRollup.__table__
+        stmt = pg_insert(table).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["machine_id", "day", "method", "status"],
+            set_={
+                "txn_count": table.c.txn_count + stmt.excluded.txn_count,
+                "amount": table.c.amount + stmt.excluded.amount,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        ))
+        self.changes = {}
+
+
+def record_payments(db: Session, payments: Iterable) -> None:
+    """Add newly inserted payments to the rollups (same transaction, no commit)."""
+    delta = RollupDelta()
+    for payment in payments:
+        delta.add(payment.machine_id, payment.created_at, payment.method, payment.status, payment.amount)
+    delta.apply(db)
+
+
+def rebuild_rollups(db: Session, start: date, end: date, machine_id: Optional[str] = None) -> int:
+    """
+    Recompute rollups for IST dates start..end (inclusive) from `payments`
+    and commit. Returns the number of rollup rows written.
+
+    Holds the rollup locks of the machines rebuilt (all of them without
+    machine_id) from before payments are read until the commit, so
+    concurrent payment writes wait for the rebuild instead of racing it.
+    """
+    if machine_id:
+        _lock_rollups(db, [_ALL_MACHINES], exclusive=False)
+        _lock_rollups(db, [machine_id], exclusive=True)
+    else:
+        _lock_rollups(db, [_ALL_MACHINES], exclusive=True)
+
+    day_col = ist_date_expr(db, Payment.created_at).label("day")
+    query = db.query(
+        Payment.machine_id,
+        day_col,
+        Payment.method,
+        Payment.status,
+        func.count(Payment.id),
+        func.coalesce(func.sum(Payment.amount), 0),
+    ).filter(
+        Payment.created_at >= ist_day_start_utc(start),
+        Payment.created_at < ist_day_start_utc(end + timedelta(days=1)),
+    )
+    stale = db.query(PaymentDailyRollup).filter(
+        PaymentDailyRollup.day >= start,
+        PaymentDailyRollup.day <= end,
+    )
+    if machine_id:
+        query = query.filter(Payment.machine_id == machine_id)
+        stale = stale.filter(PaymentDailyRollup.machine_id == machine_id)
+
+    groups = query.group_by(
+        Payment.machine_id, literal_column("day"), Payment.method, Payment.status
+    ).all()
+
+    touched = stale.with_entities(PaymentDailyRollup.machine_id, PaymentDailyRollup.day).distinct().all()
+
+    try:
+        invalidate_closed_days(db, closed_days_by_machine(
+            touched + [
+                (row_machine_id, day if isinstance(day, date) else date.fromisoformat(day))
+                for row_machine_id, day, *_ in groups
+            ]
+        ))
+        stale.delete(synchronize_session=False)
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "machine_id": row_machine_id,
+                "day": day if isinstance(day, date) else date.fromisoformat(day),
+                "method": method,
+                "status": status,
+                "txn_count": count,
+                "amount": amount,
+                "updated_at": now,
+            }
+            for row_machine_id, day, method, status, count, amount in groups
+        ]
+        if rows:
+            db.execute(PaymentDailyRollup.__table__.insert(), rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows)
+
+
+def rollups_complete(db: Session) -> bool:
+    """
+    True once the history backfill has completed. Before that the rollups
+    only hold payments written since the deploy, and readers must
+    aggregate `payments` instead.
+    """
+    global _backfill_complete
+    if not _backfill_complete:
+        _backfill_complete = db.query(PaymentRollupBackfill.completed_at).filter(
+            PaymentRollupBackfill.id == 1
+        ).scalar() is not None
+    return _backfill_complete
+
+
+def _save_backfill_progress(db: Session, through: date, completed: bool) -> None:
+    now = datetime.now(timezone.utc)
+    values = {"backfilled_through": through, "completed_at": now if completed else None, "updated_at": now}
+    stmt = pg_insert(PaymentRollupBackfill.__table__).values(id=1, **values)
+    db.execute(stmt.on_conflict_do_update(index_elements=["id"], set_=values))
+    db.commit()
+
+
+def backfill_all_rollups(db: Session) -> Optional[int]:
+    """
+    Build rollups for the whole payment history, oldest chunk first,
+    resuming after the last chunk recorded in payment_rollup_backfill. Run
+    it only after the deploy has cut over. Returns the number of rollup rows
+    written, or None if another instance holds the backfill lock.
+    """
+    global _backfill_complete
+    bind = db.get_bind()
+    postgres = bind.dialect.name == "postgresql"
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if postgres and not conn.execute(text(_BACKFILL_LOCK)).scalar():
+            return None
+        try:
+            state = db.query(PaymentRollupBackfill).filter(PaymentRollupBackfill.id == 1).first()
+            if state and state.completed_at:
+                _backfill_complete = True
+                return 0
+            if state and state.backfilled_through:
+                day = state.backfilled_through + timedelta(days=1)
+            else:
+                first = db.query(func.min(Payment.created_at)).scalar()
+                day = ist_date(first) if first is not None else datetime.now(IST).date()
+
+            written = 0
+            # Re-read "today" per chunk: a backfill running past midnight covers the new day too
+            while day <= datetime.now(IST).date():
+                end = min(day + timedelta(days=BACKFILL_CHUNK_DAYS - 1), datetime.now(IST).date())
+                written += rebuild_rollups(db, day, end)
+                _save_backfill_progress(db, end, completed=False)
+                day = end + timedelta(days=1)
+            # Days after this one only ever see payments written by rollup-aware code
+            _save_backfill_progress(db, day - timedelta(days=1), completed=True)
+            _backfill_complete = True
+            return written
+        finally:
+            if postgres:
+                conn.execute(text(_BACKFILL_UNLOCK))
+
+
+def _backfill_once() -> Optional[int]:
+    db = SessionLocal()
+    try:
+        return backfill_all_rollups(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_rollup_backfill() -> None:
+    """
+    Background task: backfill the rollups ROLLUP_BACKFILL_DELAY_SECONDS after
+    startup, retrying on that interval while another instance holds the
+    lock or the backfill fails, until it has completed.
+    """
+    while True:
+        await asyncio.sleep(settings.ROLLUP_BACKFILL_DELAY_SECONDS)
+        try:
+            written = await asyncio.to_thread(_backfill_once)
+        except Exception as e:
+            log_error("Rollup backfill failed", e)
+            continue
+        if written is not None:
+            if written:
+                logger.info(f"📊 ROLLUP BACKFILL DONE | rows={written}")
+            return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild payment_daily_rollups for an IST date range")
+    parser.add_argument("--all", action="store_true", help="backfill the whole payment history")
+    parser.add_argument("--start", type=date.fromisoformat, help="first IST date (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last IST date (YYYY-MM-DD)")
+    parser.add_argument("--machine-id", default=None)
+    args = parser.parse_args()
+    if not args.all and not (args.start and args.end):
+        parser.error("pass --all, or --start and --end")
+
+    session = SessionLocal()
+    try:
+        if args.all:
+            written = backfill_all_rollups(session)
+            if written is None:
+                print("⚠️  Another instance is running the rollup backfill")
+            else:
+                print(f"✅ Backfilled rollups for the whole payment history: {written} rows")
+        else:
+            written = rebuild_rollups(session, args.start, args.end, args.machine_id)
+            print(f"✅ Rebuilt rollups {args.start}..{args.end}: {written} rows")
+    finally:
+        session.close()
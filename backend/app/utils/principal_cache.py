@@ -0,0 +1,112 @@
+"""
+Authenticated-principal cache for get_current_user.
+
+Every authenticated request used to load the User (or Machine) behind its
+token from the database, sometimes twice for mislabeled machine tokens.
+Terminals make dozens of calls a minute, so about half of all round trips
+were these lookups. The principal is now cached per process, keyed by token
+type and subject, for PRINCIPAL_CACHE_TTL_SECONDS (bounded LRU of
+PRINCIPAL_CACHE_MAX_ENTRIES).
+
+What a request gets is a snapshot: a new transient (session-less) User or
+Machine carrying only the fields handlers read from current_user. It is a
+fresh instance on every request, so per-request changes to it (e.g. the
+heartbeat on /auth/me) never leak into the cache, and it is never bound to
+a session, so nothing about it is ever written back.
+
+Writes that change those fields invalidate the entry in this process:
+toggle_admin_status, machine update / status / delete, and heartbeat
+flushes. Other API processes pick the change up when their entry expires,
+so the TTL is the bound on how long a deactivated admin stays signed in
+elsewhere.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple, Type, Union
+
+from app.core.config import settings
+from app.models.machine import Machine
+from app.models.user import User
+
+# Fields copied into the snapshot; everything handlers read from current_user
+SNAPSHOT_FIELDS: Dict[type, Tuple[str, ...]] = {
+    User: ("id", "username", "email", "role", "is_active", "created_at"),
+    Machine: ("id", "user_id", "name", "username", "status", "last_sync"),
+}
+
+TOKEN_TYPES = ("access", "machine")
+
+
+def snapshot(entity: Union[User, Machine]) -> Union[User, Machine]:
+    """Transient copy of the snapshot fields of a loaded User or Machine."""
+    model = type(entity)
+    return model(**{field: getattr(entity, field) for field in SNAPSHOT_FIELDS[model]})
+
+
+class PrincipalCache:
+    """Thread-safe TTL + LRU cache of principal snapshots."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Type, tuple, float]]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        """Take before loading a principal from the database; pass it to put()."""
+        with self._lock:
+            return self._generation
+
+    def get(self, token_type: str, entity_id: str) -> Optional[Union[User, Machine]]:
+        key = (token_type, str(entity_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            model, values, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return model(**dict(zip(SNAPSHOT_FIELDS[model], values)))
+
+    def put(self, token_type: str, entity_id: str, entity: Union[User, Machine], generation: int) -> None:
+        """
+        Cache a principal loaded from the database. Skipped if anything was
+        invalidated since generation was taken, since the loaded row may
+        predate that write.
+        """
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        model = type(entity)
+        values = tuple(getattr(entity, field) for field in SNAPSHOT_FIELDS[model])
+        key = (token_type, str(entity_id))
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (model, values, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, entity_ids: Iterable) -> None:
+        """Drop the cached principals for these user / machine ids (any token type)."""
+        with self._lock:
+            self._generation += 1
+            for entity_id in entity_ids:
+                for token_type in TOKEN_TYPES:
+                    self._entries.pop((token_type, str(entity_id)), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+principals = PrincipalCache(settings.PRINCIPAL_CACHE_TTL_SECONDS, settings.PRINCIPAL_CACHE_MAX_ENTRIES)
@@ -0,0 +1,144 @@
+"""
+Single-pass aggregation for the end-of-day payment reports.
+
+The payments report, transaction summary and sales summary all need the same
+figures for one day: count/sum/min/max per method and status, hourly buckets,
+the largest bills and the median bill. PaymentReportAccumulator collects all
+of them in one pass over the day's payments. Each row is looked at once, its
+method lowercased once, and nothing is sorted or copied: the top bills are
+kept in a bounded heap and the median comes from a selection over the
+successful amounts. CPU is linear in the number of bills.
+
+Rows only need bill_number, amount, method, status and created_at, so callers
+can feed light column rows (select(...)) instead of ORM objects.
+"""
+import heapq
+import random
+from datetime import timezone
+from typing import Dict, List, Optional
+
+# IST is a fixed UTC+05:30 (no DST), so the IST hour is plain arithmetic
+_IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60
+
+
+class AmountStats:
+    """Count, sum, min and max of a group of amounts."""
+
+    __slots__ = ("count", "amount", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.amount = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, amount: float) -> None:
+        self.count += 1
+        self.amount += amount
+        if self.min is None or amount < self.min:
+            self.min = amount
+        if self.max is None or amount > self.max:
+            self.max = amount
+
+    @property
+    def average(self) -> float:
+        return self.amount / self.count if self.count else 0.0
+
+
+_EMPTY = AmountStats()
+
+# Private generator so median pivots never disturb the global random state
+_rng = random.Random()
+
+
+def _select(values: List[float], k: int) -> float:
+    """k-th smallest value (0-based) by quickselect; expected linear time."""
+    while True:
+        pivot = values[_rng.randrange(len(values))]
+        lower = [v for v in values if v < pivot]
+        if k < len(lower):
+            values = lower
+            continue
+        equal_count = sum(1 for v in values if v == pivot)
+        if k < len(lower) + equal_count:
+            return pivot
+        k -= len(lower) + equal_count
+        values = [v for v in values if v > pivot]
+
+
+class PaymentReportAccumulator:
+    """
+    Feed a day's payments (in created_at order) through add(), then read the
+    aggregates. "success" is status == 'success'; every other status counts
+    as failed, matching the printed reports.
+    """
+
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self.successful = AmountStats()
+        self.failed = AmountStats()
+        self._by_method: Dict[bool, Dict[str, AmountStats]] = {True: {}, False: {}}
+        self.hourly: Dict[int, AmountStats] = {}
+        self._top: list = []
+        self._success_amounts: List[float] = []
+        self._seq = 0
+        self.first_bill: Optional[str] = None
+        self.last_bill: Optional[str] = None
+
+    @property
+    def total_count(self) -> int:
+        return self.successful.count + self.failed.count
+
+    def add(self, payment) -> None:
+        amount = float(payment.amount)
+        method = payment.method.lower()
+        success = payment.status == "success"
+
+        if self.first_bill is None:
+            self.first_bill = payment.bill_number
+        self.last_bill = payment.bill_number
+
+        (self.successful if success else self.failed).add(amount)
+        group = self._by_method[success]
+        stats = group.get(method)
+        if stats is None:
+            stats = group[method] = AmountStats()
+        stats.add(amount)
+
+        if not success:
+            return
+
+        created_at = payment.created_at
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        hour = int((created_at.timestamp() + _IST_OFFSET_SECONDS) // 3600) % 24
+        bucket = self.hourly.get(hour)
+        if bucket is None:
+            bucket = self.hourly[hour] = AmountStats()
+        bucket.add(amount)
+
+        self._success_amounts.append(amount)
+
+        if not self.top_k:
+            return
+        # Min-heap of the top_k largest bills; ties keep the earlier bill
+        self._seq += 1
+        entry = (amount, -self._seq, payment)
+        if len(self._top) < self.top_k:
+            heapq.heappush(self._top, entry)
+        elif entry > self._top[0]:
+            heapq.heapreplace(self._top, entry)
+
+    def method_stats(self, method: str, success: bool = True) -> AmountStats:
+        """Stats for a lowercase method name; empty stats when it had no bills."""
+        return self._by_method[success].get(method, _EMPTY)
+
+    def top_payments(self) -> list:
+        """The largest successful bills, highest first."""
+        return [payment for _, _, payment in sorted(self._top, reverse=True)]
+
+    def median(self) -> Optional[float]:
+        """Median successful amount (upper median for an even count), or None."""
+        if not self._success_amounts:
+            return None
+        return _select(self._success_amounts, len(self._success_amounts) // 2)
@@ -0,0 +1,143 @@
+"""
+Cache for end-of-day reports of closed IST days.
+
+Terminals reprint yesterday's transaction/sales summary many times, and each
+reprint used to rescan that day's payments. Once an IST day is over its
+reports only change if a payment for that day arrives late (an offline
+terminal syncing the next morning) or a payment of that day changes status.
+Both go through RollupDelta.apply (app/utils/payment_rollups.py), which calls
+invalidate_closed_days() in the same transaction. Today's report is always
+computed live and never cached.
+
+Entries live in the report_cache table, so every API process sees the same
+entries and the same invalidations. Each row carries a generation counter.
+Invalidation clears the payload and increments the generation (leaving a
+marker row rather than deleting), and a reader takes the generation together
+with its cache miss, before it reads payments. store_report() is a
+compare-and-swap: it only fills the row if the generation is still the one
+the reader saw.
+
+Comparing versions rather than timestamps matters because invalidations run
+inside the payment writer's transaction, which may stay open for a while
+(sync_push commits once after all batches). A report that starts in that
+window cannot see the new payment, but the invalidation's uncommitted
+increment is not visible either. Its store then waits on the row lock, sees
+the committed generation and is skipped, so a stale report is never cached.
+"""
+import uuid
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.logger import log_error
+from app.models.report_cache import ReportCache
+from app.utils.ist import ist_date
+
+REPORT_TYPES = ("transaction_summary", "sales_summary", "payments_report")
+
+ALL_MACHINES_SCOPE = "all"
+
+
+def report_scope(machine_id: Optional[str]) -> str:
+    """Cache scope for a report filtered to machine_id (None = all machines)."""
+    if not machine_id:
+        return ALL_MACHINES_SCOPE
+    try:
+        machine_id = uuid.UUID(str(machine_id))
+    except ValueError:
+        pass
+    return f"machine:{machine_id}"
+
+
+def is_closed_day(day: date) -> bool:
+    """True once the IST calendar day is over, i.e. its reports can no longer grow on their own."""
+    return day < ist_date(datetime.now(timezone.utc))
+
+
+def get_cached_report(db: Session, scope: str, day: date, report_type: str) -> Tuple[Optional[str], int]:
+    """
+    (payload, generation) for a closed day. payload is None on a miss or
+    after an invalidation; pass generation to store_report() after computing.
+    Call before reading payments.
+    """
+    row = db.query(ReportCache.payload, ReportCache.generation).filter(
+        ReportCache.scope == scope,
+        ReportCache.day == day,
+        ReportCache.report_type == report_type
+    ).first()
+    return (row.payload, row.generation) if row else (None, 0)
+
+
+def store_report(db: Session, scope: str, day: date, report_type: str, payload: str, generation: int) -> None:
+    """
+    Cache a freshly computed report, only if the entry is still at the
+    generation get_cached_report() returned (no invalidation since). Commits;
+    a failure is logged and otherwise ignored.
+    """
+    table = ReportCache.__table__
+    stmt = pg_insert(table).values(
+        id=uuid.uuid4(),
+        scope=scope,
+        day=day,
+        report_type=report_type,
+        payload=payload,
+        generation=generation,
+        computed_at=datetime.now(timezone.utc),
+    )
+    try:
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["scope", "day", "report_type"],
+            set_={"payload": stmt.excluded.payload, "computed_at": stmt.excluded.computed_at},
+            where=table.c.generation == generation,
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        log_error("Report cache store failed", e)
+
+
+def invalidate_closed_days(db: Session, machine_days: Dict[str, Set[date]]) -> None:
+    """
+    Mark the cached reports of closed days as stale for the given machines
+    and for the all-machines scope. Does not commit; call it in the same
+    transaction as the payment change.
+    """
+    now = datetime.now(timezone.utc)
+    keys = set()
+    for machine_id, days in machine_days.items():
+        for day in days:
+            if not is_closed_day(day):
+                continue
+            for scope in (report_scope(machine_id), ALL_MACHINES_SCOPE):
+                for report_type in REPORT_TYPES:
+                    keys.add((scope, day, report_type))
+    if not keys:
+        return
+
+    # A new marker starts at generation 1, so a reader that saw no row (0)
+    # cannot store over it either
+    table = ReportCache.__table__
+    stmt = pg_insert(table).values([
+        {"id": uuid.uuid4(), "scope": scope, "day": day, "report_type": report_type,
+         "payload": None, "generation": 1, "computed_at": None, "invalidated_at": now}
+        for scope, day, report_type in sorted(keys)
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["scope", "day", "report_type"],
+        set_={
+            "payload": None,
+            "generation": table.c.generation + 1,
+            "invalidated_at": stmt.excluded.invalidated_at,
+        },
+    ))
+
+
+def closed_days_by_machine(keys: Iterable) -> Dict[str, Set[date]]:
+    """Group (machine_id, day, ...) rollup keys into {machine_id: {closed days}}."""
+    machine_days: Dict[str, Set[date]] = {}
+    for machine_id, day, *_ in keys:
+        if is_closed_day(day):
+            machine_days.setdefault(str(machine_id), set()).add(day)
+    return machine_days
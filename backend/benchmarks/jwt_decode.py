@@ -0,0 +1,78 @@
+"""
+Token validation micro-benchmark.
+
+Times every JWT backend in app.core.security.JWT_BACKENDS on the same
+tokens decode_token sees in production (an admin access token and a machine
+token), plus decode_token itself on a verified-claims cache hit, and checks
+that every backend returns the same claims. Use it to pick JWT_BACKEND; the
+callers only ever see decode_token, so switching is a config change.
+
+Runs in-process, no server or database needed (settings still have to load,
+so placeholder DATABASE_URL / SECRET_KEY are set if missing).
+
+Usage:
+    python -m benchmarks.jwt_decode --iterations 20000
+"""
+import argparse
+import os
+import timeit
+import uuid
+
+os.environ.setdefault("DATABASE_URL", "postgresql://benchmark@localhost/benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from app.core import security  # noqa: E402
+
+
+def _tokens():
+    machine_id = str(uuid.uuid4())
+    return {
+        "access": security.create_access_token(
+            data={"sub": str(uuid.uuid4()), "username": "admin", "role": "admin"}
+        ),
+        "machine": security.create_access_token(
+            data={"sub": machine_id, "username": "pos01", "type": "machine", "machine_id": machine_id}
+        ),
+    }
+
+
+def _per_call_us(fn, token: str, iterations: int) -> float:
+    return min(timeit.repeat(lambda: fn(token), number=iterations, repeat=3)) / iterations * 1e6
+
+
+def run(args) -> None:
+    rows = []
+    for kind, token in _tokens().items():
+        expected = None
+        for name, factory in security.JWT_BACKENDS.items():
+            try:
+                decode = factory()
+            except ImportError as e:
+                rows.append((kind, name, f"not installed ({e.name})", ""))
+                continue
+            claims = decode(token)
+            expected = expected or claims
+            same = "yes" if claims == expected else "NO"
+            rows.append((kind, name, f"{_per_call_us(decode, token, args.iterations):.1f}", same))
+
+        security.verified_claims.clear()
+        security.decode_token(token)  # warm the cache
+        same = "yes" if security.decode_token(token) == expected else "NO"
+        rows.append((kind, "decode_token (cached)", f"{_per_call_us(security.decode_token, token, args.iterations):.1f}", same))
+
+    header = ("token", "backend", "us/call", "same claims")
+    widths = [max(len(header[i]), *(len(row[i]) for row in rows)) for i in range(len(header))]
+    print("  ".join(h.ljust(w) for h, w in zip(header, widths)))
+    for row in rows:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+    print(f"\nJWT_BACKEND in use: {security.settings.JWT_BACKEND}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000, help="decodes per timing run")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Login storm benchmark.
+
+Simulates a shift start: many terminals hitting POST /v1/auth/machine-login
+at once while a few admin dashboards keep polling a regular endpoint
+(GET /v1/dashboard/stats). Runs a short baseline with the dashboards alone,
+then the storm, and prints throughput and latency percentiles for logins and
+for the dashboard requests in both phases. With bcrypt on the capped hashing
+pool the dashboard p99 during the storm should stay close to the baseline;
+logins beyond PASSWORD_HASH_MAX_PENDING are refused with 503 and retried
+after Retry-After, as a terminal would.
+
+Uses machine-login for the storm because /v1/auth/login is rate limited per
+client. Pool counters from /health are printed at the end.
+
+Usage:
+    python -m benchmarks.login_storm --base-url http://localhost:8000 \\
+        --admin admin:admin --machine pos01:secret \\
+        --terminals 300 --dashboards 4 --baseline 10 --duration 30
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.mixed_load import _login, _percentile
+
+
+async def _dashboard_worker(client, token, deadline, samples, errors):
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        resp = await client.get("/v1/dashboard/stats", headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        if resp.status_code != 200:
+            errors.append(resp.status_code)
+
+
+async def _terminal(client, credentials, deadline, samples, rejected, errors):
+    username, password = credentials.split(":", 1)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        resp = await client.post("/v1/auth/machine-login", json={"username": username, "password": password})
+        elapsed = (time.perf_counter() - start) * 1000
+        if resp.status_code == 503:
+            rejected.append(elapsed)
+            await asyncio.sleep(float(resp.headers.get("Retry-After", "1")))
+            continue
+        samples.append(elapsed)
+        if resp.status_code != 200:
+            errors.append(resp.status_code)
+
+
+def _summary(name: str, samples: List[float], errors: list, duration: float, rejected: int = 0) -> Dict[str, str]:
+    return {
+        "load": name,
+        "requests": str(len(samples)),
+        "req/s": f"{len(samples) / duration:.1f}",
+        "p50 ms": f"{_percentile(samples, 50):.1f}",
+        "p99 ms": f"{_percentile(samples, 99):.1f}",
+        "mean ms": f"{statistics.fmean(samples):.1f}" if samples else "0.0",
+        "503s": str(rejected),
+        "errors": str(len(errors)),
+    }
+
+
+async def _dashboards(client, token, workers: int, duration: float):
+    samples, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*[_dashboard_worker(client, token, deadline, samples, errors) for _ in range(workers)])
+    return samples, errors
+
+
+async def run(args) -> None:
+    limits = httpx.Limits(max_connections=args.terminals + args.dashboards + 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120.0, limits=limits) as client:
+        admin_token = await _login(client, "/v1/auth/login", args.admin)
+
+        # Phase 1: dashboards alone
+        started = time.perf_counter()
+        base_samples, base_errors = await _dashboards(client, admin_token, args.dashboards, args.baseline)
+        base_elapsed = time.perf_counter() - started
+
+        # Phase 2: the same dashboards while every terminal logs in repeatedly
+        login_samples, login_rejected, login_errors = [], [], []
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+        storm = [
+            _terminal(client, args.machine, deadline, login_samples, login_rejected, login_errors)
+            for _ in range(args.terminals)
+        ]
+        (storm_samples, storm_errors), *_ = await asyncio.gather(
+            _dashboards(client, admin_token, args.dashboards, args.duration), *storm
+        )
+        elapsed = time.perf_counter() - started
+
+        health = (await client.get("/health")).json()["data"].get("password_hashing")
+
+    rows = [
+        _summary("dashboard (baseline)", base_samples, base_errors, base_elapsed),
+        _summary("dashboard (storm)", storm_samples, storm_errors, elapsed),
+        _summary("machine-login", login_samples, login_errors, elapsed, len(login_rejected)),
+    ]
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(r[c]) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(row[c].ljust(widths[c]) for c in columns))
+    print(f"\nPassword hashing pool: {health}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--admin", required=True, help="admin username:password")
+    parser.add_argument("--machine", required=True, help="machine username:password")
+    parser.add_argument("--terminals", type=int, default=300, help="concurrent logging-in terminals")
+    parser.add_argument("--dashboards", type=int, default=4, help="concurrent dashboard pollers")
+    parser.add_argument("--baseline", type=float, default=10.0, help="seconds of dashboards-only load")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of storm")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
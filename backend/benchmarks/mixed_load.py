@@ -0,0 +1,141 @@
+"""
+Mixed report + payment load benchmark.
+
+Drives a running API with two kinds of concurrent clients:
+  * report workers — admin token, GET /v1/analytics/revenue?period=year
+  * payment workers — machine token, reserve a bill number then POST /v1/payments
+
+and prints throughput and latency percentiles for each. Run it against a
+build with blocking `async def` handlers and against the current one (DB
+work in the threadpool) to see how payment latency holds up while reports
+are running.
+
+Usage:
+    python -m benchmarks.mixed_load --base-url http://localhost:8000 \\
+        --admin admin:admin --machine pos01:secret --machine-id <uuid> \\
+        --report-workers 4 --payment-workers 16 --duration 30
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _login(client: httpx.AsyncClient, path: str, credentials: str) -> str:
+    username, password = credentials.split(":", 1)
+    resp = await client.post(path, json={"username": username, "password": password})
+    resp.raise_for_status()
+    return resp.json()["data"]["token"]
+
+
+async def _report_worker(client, token, deadline, samples, errors):
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        resp = await client.get("/v1/analytics/revenue", params={"period": "year"}, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        if resp.status_code != 200:
+            errors.append(resp.status_code)
+
+
+async def _payment_worker(client, token, machine_id, posid, deadline, samples, errors):
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        reserve = await client.post(
+            "/v1/payments/reserve-bill-number",
+            json={"machine_id": machine_id, "posid": posid},
+            headers=headers,
+        )
+        if reserve.status_code != 200:
+            errors.append(reserve.status_code)
+            continue
+        resp = await client.post(
+            "/v1/payments",
+            json={
+                "machine_id": machine_id,
+                "bill_number": reserve.json()["data"]["bill_number"],
+                "amount": 10,
+                "method": "CASH",
+            },
+            headers=headers,
+        )
+        samples.append((time.perf_counter() - start) * 1000)
+        if resp.status_code != 201:
+            errors.append(resp.status_code)
+
+
+def _summary(name: str, samples: List[float], errors: list, duration: float) -> Dict[str, str]:
+    return {
+        "load": name,
+        "requests": str(len(samples)),
+        "req/s": f"{len(samples) / duration:.1f}",
+        "p50 ms": f"{_percentile(samples, 50):.1f}",
+        "p99 ms": f"{_percentile(samples, 99):.1f}",
+        "mean ms": f"{statistics.fmean(samples):.1f}" if samples else "0.0",
+        "errors": str(len(errors)),
+    }
+
+
+async def run(args) -> None:
+    limits = httpx.Limits(max_connections=args.report_workers + args.payment_workers + 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120.0, limits=limits) as client:
+        admin_token = await _login(client, "/v1/auth/login", args.admin)
+        machine_token = await _login(client, "/v1/auth/machine-login", args.machine)
+
+        # Separate POSID per run so the bill series never collides with real data
+        posid = f"BENCH{uuid.uuid4().hex[:6].upper()}"
+        deadline = time.perf_counter() + args.duration
+        report_samples, report_errors = [], []
+        payment_samples, payment_errors = [], []
+
+        tasks = [
+            _report_worker(client, admin_token, deadline, report_samples, report_errors)
+            for _ in range(args.report_workers)
+        ] + [
+            _payment_worker(client, machine_token, args.machine_id, posid, deadline,
+                            payment_samples, payment_errors)
+            for _ in range(args.payment_workers)
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    rows = [
+        _summary("reports", report_samples, report_errors, elapsed),
+        _summary("payments", payment_samples, payment_errors, elapsed),
+    ]
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(r[c]) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(row[c].ljust(widths[c]) for c in columns))
+    print(f"\nPOSID used: {posid} ({elapsed:.1f}s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--admin", required=True, help="admin username:password")
+    parser.add_argument("--machine", required=True, help="machine username:password")
+    parser.add_argument("--machine-id", required=True)
+    parser.add_argument("--report-workers", type=int, default=4)
+    parser.add_argument("--payment-workers", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+-- Migration: Composite indexes for hot query shapes
+-- Description: Indexes matching the filters the API actually runs (list pages,
+--              dashboard counts, catalog pulls, UPI approval queue). The app also
+--              builds missing or INVALID ones in a background task after startup;
+--              this file is for applying them ahead of a deploy without blocking
+--              writes.
+-- Date: 2026-10-18
+--
+-- CONCURRENTLY cannot run inside a transaction block: run this file with
+-- autocommit (psql default), not wrapped in BEGIN/COMMIT.
+--
+-- A failed CONCURRENTLY build leaves an INVALID index that IF NOT EXISTS then
+-- skips. Verify afterwards with:  python -m app.utils.index_advisor
+-- (rebuild invalid ones with --ensure-indexes).
+
+-- Payments: per-machine history and keyset pagination; also serves the
+-- plain (machine_id, created_at) date-range filters as a prefix.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_payments_machine_created_id
+    ON payments(machine_id, created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_payments_created_id
+    ON payments(created_at, id);
+-- Payments: status-filtered listings and dashboard counts over a date range
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_payments_status_created
+    ON payments(status, created_at);
+
+-- Logs: per-machine history and keyset pagination (prefix covers machine_id, created_at)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_logs_machine_created_id
+    ON logs(machine_id, created_at, id);
+
+-- Machines: owner's machines by status (dashboard, alerts, scoping)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_machines_user_status
+    ON machines(user_id, status);
+
+-- Services: a machine's active catalog (sync pull, service lists)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_services_machine_status
+    ON services(machine_id, status);
+
+-- UPI change requests: superadmin pending queue, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_upi_change_requests_status_created
+    ON upi_change_requests(status, created_at);
+
+-- Alerts and audit logs: keyset pagination
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_system_alerts_created_id
+    ON system_alerts(created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audit_logs_created_id
+    ON audit_logs(created_at, id);
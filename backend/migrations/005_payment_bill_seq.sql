@@ -0,0 +1,23 @@
+-- Migration: Split bill numbers into posid + bill_seq on payments
+-- Description: Stores the "POSID/123" halves as real columns so the highest used
+--              number for a series is an index-only MAX(bill_seq) instead of a
+--              regex scan over every bill the machine has recorded. The app runs
+--              the same steps at startup if the columns are missing; apply this
+--              file ahead of a deploy to keep the backfill out of startup.
+-- Date: 2026-10-18
+--
+-- The index is built CONCURRENTLY: run with autocommit (psql default).
+
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS posid VARCHAR(100);
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS bill_seq INTEGER;
+
+-- Backfill. POSID is everything before the last slash; numbers beyond
+-- INTEGER range are left NULL, same as the application does.
+UPDATE payments
+SET posid = substring(bill_number from '^(.+)/[0-9]{1,9}$'),
+    bill_seq = CAST(substring(bill_number from '/([0-9]{1,9})$') AS INTEGER)
+WHERE bill_seq IS NULL
+  AND bill_number ~ '^.+/[0-9]{1,9}$';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_payments_machine_posid_seq
+    ON payments(machine_id, posid, bill_seq);
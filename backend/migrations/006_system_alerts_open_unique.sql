@@ -0,0 +1,23 @@
+-- Migration: One unresolved alert per machine and title
+-- Description: Alerts used to be deduplicated with a SELECT before the INSERT,
+--              which let concurrent callers open the same alert twice. The
+--              partial unique index below lets alert writes use
+--              INSERT ... ON CONFLICT DO NOTHING instead. Duplicate open
+--              alerts are resolved first, keeping the oldest. The app runs
+--              the same steps at startup if the index is missing.
+-- Date: 2026-10-18
+
+UPDATE system_alerts
+SET resolved = true, resolved_at = NOW()
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id,
+               ROW_NUMBER() OVER (PARTITION BY machine_id, title ORDER BY created_at) AS rn
+        FROM system_alerts
+        WHERE resolved = false
+    ) subq
+    WHERE rn > 1
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_system_alerts_open_machine_title
+    ON system_alerts(machine_id, title) WHERE resolved = false;